@@ -1,26 +1,39 @@
 import sys
 import os
+import shutil
+import tempfile
 import pandas as pd
 import numpy as np
 from PyQt6.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, 
-                             QListWidget, QTableWidget, QTableWidgetItem, QPushButton, 
+                             QListWidget, QTableView, QHeaderView, QPushButton, 
                              QLabel, QComboBox, QProgressBar, QTextEdit, QFileDialog, 
                              QMessageBox, QInputDialog, QDialog, QCheckBox, QListWidgetItem, 
                              QScrollArea, QLineEdit, QDialogButtonBox, QMenu, QStyle, QFrame)
 from PyQt6.QtCore import Qt, QThread, pyqtSignal, QSettings, QMutex
 from PyQt6.QtGui import QDragEnterEvent, QDropEvent, QIcon
 import logging
+import time
 from datetime import datetime
 import configparser
-from reportlab.lib import colors
-from reportlab.lib.pagesizes import letter, landscape
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph
-from reportlab.lib.styles import getSampleStyleSheet
 
 from help_dialog import HelpDialog
 from settings_dialog import SettingsDialog
 from updater import Updater, show_update_dialog, show_update_completed_dialog
 from welcome_dialog import WelcomeDialog
+from dataframe_model import DataFrameModel
+from result_exporter import export_dataframe, ExportCancelled, DEFAULT_NA_REP
+from lookup_engine import vlookup, match_cache_key, LookupCancelled
+from index_cache import IndexCache, DEFAULT_CACHE_DIR
+from match_cache import MatchCache
+from parse_cache import ParseCache, DEFAULT_PARSE_CACHE_DIR, read_frame
+from workbook_loader import scan_workbook, apply_header, detect_header_row, file_signature, LoadCancelled
+from parallel_parser import parse_sheets_parallel, default_worker_count
+from run_timing import StageTimer
+from key_normalizer import KeyRules
+from fuzzy_match import FuzzyMatch
+from range_match import RangeMatch, RANGE_LE, RANGE_GE
+from out_of_core import TableSource, out_of_core_vlookup
+from workspace import Workspace, WorkspaceError, save_workspace, WORKSPACE_EXTENSION
 
 class AdvancedVLOOKUPTool(QMainWindow):
     def __init__(self):
@@ -44,10 +57,22 @@ class AdvancedVLOOKUPTool(QMainWindow):
 
         self.file_load_progress = QProgressBar()
         self.file_load_progress.setVisible(False)  # 初始化文件加载进度条
+        self.file_load_threads = {}  # 正在加载的文件 -> FileLoadThread
+        self.pending_file_loads = []  # 等待加载的文件队列
+        self.file_load_percent = {}
+        self.parse_thread = None  # 后台解析工作表的 ParseSheetsThread
+        self.sheet_parse_queue = []  # 等待提交的 (文件路径, 工作表名, 检测到的表头行)
+        self.pending_sheet_parses = set()  # 已排队或正在解析的 (文件路径, 工作表名)
 
         self.recent_files = []
         self.settings = QSettings("YourCompany", "AdvancedVLOOKUPTool")
         self.config = self.load_config()  # 初始化最近使用的文件列表和设置
+        self.index_cache = IndexCache(
+            self.config.get('DEFAULT', 'IndexCacheDir', fallback=DEFAULT_CACHE_DIR),
+            int(self.config.get('DEFAULT', 'IndexCacheMaxSize', fallback=512)) * 1024 * 1024)  # 查找索引磁盘缓存（MB）
+        self.match_cache = MatchCache(
+            int(self.config.get('DEFAULT', 'MatchCacheMaxSize', fallback=256)) * 1024 * 1024)  # 匹配结果内存缓存（MB）
+        self.sheet_version_counter = 0  # 工作表数据版本号，数据变化时递增
         
         self.setup_ui()
         self.setup_menu()
@@ -56,6 +81,9 @@ class AdvancedVLOOKUPTool(QMainWindow):
         self.loaded_files = {}
         self.main_table = None
         self.lookup_tables = []  # 初始化文件和表格相关变量
+        self.last_result = None
+        self.workspace_result = None  # 从工作区打开、尚未完整读取的结果所在的工作区
+        self.profiled_timer = None  # 最近一次采集了 cProfile 数据的运行
 
         self.setAcceptDrops(True)  # 允许拖放操作
 
@@ -123,8 +151,14 @@ class AdvancedVLOOKUPTool(QMainWindow):
         else:
             config['DEFAULT'] = {
                 'ChunkSize': '100000',
+                'ParseWorkers': '0',
                 'MaxRecentFiles': '5',
-                'DefaultSaveFormat': 'xlsx'
+                'DefaultSaveFormat': 'xlsx',
+                'MaxLoadThreads': '4',
+                'IndexCacheDir': DEFAULT_CACHE_DIR,
+                'IndexCacheMaxSize': '512',
+                'MatchCacheMaxSize': '256',
+                'OutOfCoreMemoryMB': '1024'
             }
             with open(config_file, 'w') as configfile:
                 config.write(configfile)  # 如果配置文件不存在，创建默认配置
@@ -147,16 +181,20 @@ class AdvancedVLOOKUPTool(QMainWindow):
         self.recent_files_button.clicked.connect(self.show_recent_files)
         self.delete_file_button = QPushButton("删除文件")
         self.delete_file_button.clicked.connect(self.delete_selected_file)
+        self.cancel_load_button = QPushButton("取消加载")
+        self.cancel_load_button.clicked.connect(self.cancel_selected_load)
         file_buttons_layout.addWidget(self.select_file_button)
         file_buttons_layout.addWidget(self.recent_files_button)
         file_buttons_layout.addWidget(self.delete_file_button)
+        file_buttons_layout.addWidget(self.cancel_load_button)
         file_list_layout.addLayout(file_buttons_layout)
 
         left_layout.addWidget(QLabel("已加载文件:"))
         left_layout.addLayout(file_list_layout)
+        left_layout.addWidget(self.file_load_progress)
 
         # 预览表格
-        self.preview_table = QTableWidget()
+        self.preview_table = self.create_table_view()
         left_layout.addWidget(QLabel("文件预览:"))
         left_layout.addWidget(self.preview_table)
 
@@ -171,6 +209,13 @@ class AdvancedVLOOKUPTool(QMainWindow):
         right_layout.addWidget(QLabel("选择主列:"))
         right_layout.addWidget(self.main_column_combo)
 
+        # 组合键的附加主列：勾选后按 (主列, 附加列...) 多列组合匹配
+        self.main_key_list = QListWidget()
+        self.main_key_list.setMaximumHeight(100)
+        self.main_key_list.itemChanged.connect(self.update_lookup_column_combos)
+        right_layout.addWidget(QLabel("附加键列（组合键，可选）:"))
+        right_layout.addWidget(self.main_key_list)
+
         # 查找表选择
         self.lookup_table_list = QListWidget()
         self.lookup_table_list.itemChanged.connect(self.update_lookup_column_combos)
@@ -179,6 +224,9 @@ class AdvancedVLOOKUPTool(QMainWindow):
 
         # 查找列选择
         self.lookup_column_combos = {}
+        self.lookup_extra_key_combos = {}  # 每个查找表与附加主列对应的查找列
+        self.lookup_mode_combos = {}  # 每个查找表的匹配方式
+        self.lookup_group_combos = {}  # 区间匹配的分组列（主表和查找表中同名的列）
         self.lookup_column_widget = QWidget()
         self.lookup_column_layout = QVBoxLayout(self.lookup_column_widget)
         right_layout.addWidget(QLabel("选择查找列:"))
@@ -196,23 +244,56 @@ class AdvancedVLOOKUPTool(QMainWindow):
         right_layout.addWidget(self.return_columns_filter)
 
         # 执行按钮
+        execute_layout = QHBoxLayout()
         self.execute_button = QPushButton("执行VLOOKUP")
         self.execute_button.clicked.connect(self.execute_vlookup)
-        right_layout.addWidget(self.execute_button)
+        execute_layout.addWidget(self.execute_button)
+        self.cancel_vlookup_button = QPushButton("取消查找")
+        self.cancel_vlookup_button.setEnabled(False)
+        self.cancel_vlookup_button.clicked.connect(self.cancel_vlookup)
+        execute_layout.addWidget(self.cancel_vlookup_button)
+        self.out_of_core_checkbox = QCheckBox("磁盘分区模式")
+        self.out_of_core_checkbox.setToolTip("主表或查找表超出内存时使用：按键分区溢写到磁盘后逐个分区查找，"
+                                             "结果直接流式写入文件（只支持精确匹配）")
+        execute_layout.addWidget(self.out_of_core_checkbox)
+        right_layout.addLayout(execute_layout)
 
         # 进度条
         self.progress_bar = QProgressBar()
         right_layout.addWidget(self.progress_bar)
+        self.vlookup_status_label = QLabel()  # 查找进度：已处理行数和预计剩余时间
+        right_layout.addWidget(self.vlookup_status_label)
+
+        # 运行摘要：各阶段耗时和行数，可选采集 cProfile 数据
+        profile_layout = QHBoxLayout()
+        self.profile_checkbox = QCheckBox("下次运行采集性能分析")
+        profile_layout.addWidget(self.profile_checkbox)
+        self.save_profile_button = QPushButton("保存性能分析")
+        self.save_profile_button.setEnabled(False)
+        self.save_profile_button.clicked.connect(self.save_profile)
+        profile_layout.addWidget(self.save_profile_button)
+        self.run_summary = QTextEdit()
+        self.run_summary.setReadOnly(True)
+        self.run_summary.setMaximumHeight(120)
+        right_layout.addWidget(QLabel("运行摘要:"))
+        right_layout.addWidget(self.run_summary)
+        right_layout.addLayout(profile_layout)
 
         # 结果表格
-        self.result_table = QTableWidget()
+        self.result_table = self.create_table_view()
         right_layout.addWidget(QLabel("VLOOKUP结果:"))
         right_layout.addWidget(self.result_table)
 
         # 保存结果按钮
+        save_layout = QHBoxLayout()
         self.save_button = QPushButton("保存结果")
         self.save_button.clicked.connect(self.save_results)
-        right_layout.addWidget(self.save_button)
+        save_layout.addWidget(self.save_button)
+        self.cancel_export_button = QPushButton("取消导出")
+        self.cancel_export_button.setEnabled(False)
+        self.cancel_export_button.clicked.connect(self.cancel_export)
+        save_layout.addWidget(self.cancel_export_button)
+        right_layout.addLayout(save_layout)
 
         # 日志文本框
         self.log_text = QTextEdit()
@@ -239,6 +320,12 @@ class AdvancedVLOOKUPTool(QMainWindow):
         main_layout.addLayout(right_layout)
         self.setCentralWidget(main_widget)
 
+    def create_table_view(self):
+        table_view = QTableView()
+        table_view.verticalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Fixed)  # 固定行高，避免逐行计算尺寸
+        table_view.setWordWrap(False)
+        return table_view
+
     def setup_menu(self):
         menubar = self.menuBar()
 
@@ -251,6 +338,12 @@ class AdvancedVLOOKUPTool(QMainWindow):
         
         clear_action = self.file_menu.addAction('清除所有文件')
         clear_action.triggered.connect(self.clear_files)
+
+        self.file_menu.addSeparator()
+        open_workspace_action = self.file_menu.addAction('打开工作区')
+        open_workspace_action.triggered.connect(self.open_workspace)
+        save_workspace_action = self.file_menu.addAction('保存工作区')
+        save_workspace_action.triggered.connect(self.save_workspace)
         
         self.file_menu.addSeparator()
         exit_action = self.file_menu.addAction('退出')
@@ -260,6 +353,8 @@ class AdvancedVLOOKUPTool(QMainWindow):
         tools_menu = menubar.addMenu('工具')
         clean_data_action = tools_menu.addAction('数据清理')
         clean_data_action.triggered.connect(self.clean_data)
+        parse_all_action = tools_menu.addAction('并行解析所有工作表')
+        parse_all_action.triggered.connect(self.parse_all_sheets)
 
         # 设置菜单
         settings_menu = menubar.addMenu('设置')
@@ -276,7 +371,25 @@ class AdvancedVLOOKUPTool(QMainWindow):
     def load_settings(self):
         self.auto_update_check = self.settings.value("auto_update_check", True, type=bool)
         self.default_save_format = self.settings.value("default_save_format", "xlsx")
+        self.pdf_max_rows = self.settings.value("pdf_max_rows", 50000, type=int)  # 0 表示不限制
+        self.pdf_sample_rows = self.settings.value("pdf_sample_rows", False, type=bool)
+        self.na_rep = self.settings.value("na_rep", DEFAULT_NA_REP)  # 未匹配单元格的显示和导出文本
+        self.xlsx_keep_empty = self.settings.value("xlsx_keep_empty", False, type=bool)
         self.max_recent_files = int(self.config.get('DEFAULT', 'MaxRecentFiles', fallback=5))
+        self.max_load_threads = max(1, int(self.config.get('DEFAULT', 'MaxLoadThreads', fallback=4)))
+        self.chunk_size = max(1, int(self.config.get('DEFAULT', 'ChunkSize', fallback=100000)))  # 流式解析每块行数
+        self.parse_workers = int(self.config.get('DEFAULT', 'ParseWorkers', fallback=0))  # 0 表示使用全部核心
+        self.out_of_core_memory_mb = max(1, int(self.config.get('DEFAULT', 'OutOfCoreMemoryMB', fallback=1024)))  # 磁盘分区模式内存预算
+        self.parse_cache_enabled = self.settings.value("parse_cache_enabled", True, type=bool)
+        self.parse_cache = ParseCache(
+            self.settings.value("parse_cache_dir", "") or DEFAULT_PARSE_CACHE_DIR,
+            self.settings.value("parse_cache_max_mb", 2048, type=int) * 1024 * 1024)  # 解析缓存位置和大小上限
+        self.key_rules = KeyRules(
+            trim=self.settings.value("key_trim", True, type=bool),
+            casefold=self.settings.value("key_casefold", False, type=bool),
+            fold_width=self.settings.value("key_fold_width", False, type=bool),
+            canonical_numbers=self.settings.value("key_canonical_numbers", True, type=bool))  # 查找键比较规则
+        self.fuzzy_threshold = self.settings.value("fuzzy_threshold", 80, type=int) / 100  # 模糊匹配最低相似度
         
         recent_files = self.settings.value("recent_files", [])
         self.recent_files = []
@@ -317,33 +430,263 @@ class AdvancedVLOOKUPTool(QMainWindow):
             self.load_file(file_path)
 
     def load_file(self, file_path):
-        try:
+        # 文件在后台线程中加载，超过并发上限的文件进入等待队列
+        if file_path in self.file_load_threads or file_path in self.pending_file_loads:
+            return
+        item = self.find_file_item(file_path)
+        if item is None:
+            item = QListWidgetItem()
+            item.setData(Qt.ItemDataRole.UserRole, file_path)
+            self.file_list.addItem(item)
+        item.setText(f"{os.path.basename(file_path)} (等待加载)")
+        self.pending_file_loads.append(file_path)
+        self.file_load_percent[file_path] = 0
+        self.start_pending_loads()
+
+    def start_pending_loads(self):
+        while self.pending_file_loads and len(self.file_load_threads) < self.max_load_threads:
+            file_path = self.pending_file_loads.pop(0)
+            thread = FileLoadThread(file_path, self.parse_cache if self.parse_cache_enabled else None)
+            thread.progress_update.connect(self.on_file_load_progress)
+            thread.load_finished.connect(self.on_file_loaded)
+            thread.error_occurred.connect(self.on_file_load_error)
+            thread.load_cancelled.connect(self.on_file_load_cancelled)
+            thread.finished.connect(lambda path=file_path: self.on_file_load_thread_finished(path))
+            self.file_load_threads[file_path] = thread
+            thread.start()
+        self.update_file_load_progress()
+
+    def find_file_item(self, file_path):
+        for i in range(self.file_list.count()):
+            item = self.file_list.item(i)
+            if item.data(Qt.ItemDataRole.UserRole) == file_path:
+                return item
+        return None
+
+    def set_file_status(self, file_path, status=None):
+        item = self.find_file_item(file_path)
+        if item is not None:
             file_name = os.path.basename(file_path)
-            engine = 'openpyxl' if file_path.endswith('.xlsx') else 'xlrd'
-            xl = pd.ExcelFile(file_path, engine=engine)
-            sheet_to_df_map = {}
-            
-            for sheet_name in xl.sheet_names:
-                df = xl.parse(sheet_name)
-                detected_header = self.detect_header_row(df)
-                if detected_header > 0:
-                    df.columns = df.iloc[detected_header].astype(str)
-                    df = df.drop(df.index[detected_header]).reset_index(drop=True)
-                else:
-                    df.columns = df.columns.astype(str)
-                sheet_to_df_map[sheet_name] = {
-                    'data': df,
-                    'detected_header': detected_header
-                }
+            item.setText(f"{file_name} ({status})" if status else file_name)
 
-            self.loaded_files[file_path] = sheet_to_df_map
-            self.file_list.addItem(file_name)
-            self.log(f"已加载文件：{file_name}")
-            self.update_table_combos()
-            self.update_recent_files(file_path)
-        except Exception as e:
-            self.log(f"加载文件 {file_path} 时发生错误: {str(e)}", logging.ERROR)
-            QMessageBox.warning(self, "加载失败", f"文件 {file_name} 加载失败：{str(e)}")
+    def update_file_load_progress(self):
+        if not self.file_load_percent:
+            self.file_load_progress.setVisible(False)
+            return
+        self.file_load_progress.setVisible(True)
+        self.file_load_progress.setValue(int(sum(self.file_load_percent.values()) / len(self.file_load_percent)))
+
+    def on_file_load_progress(self, file_path, percent):
+        self.file_load_percent[file_path] = percent
+        self.set_file_status(file_path, f"加载中 {percent}%")
+        self.update_file_load_progress()
+
+    def on_file_loaded(self, file_path, scan, from_cache, timer):
+        file_name = os.path.basename(file_path)
+        sheet_to_df_map = {}
+        for sheet_name, sheet_scan in scan.items():
+            sheet_to_df_map[sheet_name] = {
+                'raw': None,  # 原始行，表头切换不会修改
+                'data': None,  # 按当前表头行得到的视图
+                'detected_header': sheet_scan['detected_header'],
+                'header_row': sheet_scan['detected_header'],
+                'cleaned': False,
+                'dimensions': sheet_scan['dimensions'],
+                'preview': sheet_scan['preview']
+            }
+            self.bump_sheet_version(sheet_to_df_map[sheet_name])
+
+        self.loaded_files[file_path] = sheet_to_df_map
+        self.set_file_status(file_path)
+        if from_cache:
+            self.log(f"从解析缓存读取文件：{file_name}")
+        self.log(f"已加载文件：{file_name}")
+        self.show_run_summary(timer)
+        # 工作表不在此时解析：被选为主表或查找表时才由 ensure_sheet_loaded 读取缓存或提交到后台进程池解析
+        self.update_table_combos()
+        self.update_recent_files(file_path)
+
+    def on_file_load_error(self, file_path, error_message):
+        file_name = os.path.basename(file_path)
+        self.remove_file_item(file_path)
+        self.log(f"加载文件 {file_path} 时发生错误: {error_message}", logging.ERROR)
+        QMessageBox.warning(self, "加载失败", f"文件 {file_name} 加载失败：{error_message}")
+
+    def on_file_load_cancelled(self, file_path):
+        self.remove_file_item(file_path)
+        self.log(f"已取消加载文件：{os.path.basename(file_path)}")
+
+    def on_file_load_thread_finished(self, file_path):
+        self.file_load_threads.pop(file_path, None)
+        self.file_load_percent.pop(file_path, None)
+        self.start_pending_loads()
+
+    def remove_file_item(self, file_path):
+        if file_path in self.loaded_files:
+            self.set_file_status(file_path)  # 之前已加载的版本仍然保留
+            return
+        item = self.find_file_item(file_path)
+        if item is not None:
+            self.file_list.takeItem(self.file_list.row(item))
+
+    def cancel_selected_load(self):
+        current_item = self.file_list.currentItem()
+        file_path = current_item.data(Qt.ItemDataRole.UserRole) if current_item is not None else None
+        if file_path in self.pending_file_loads:
+            self.pending_file_loads.remove(file_path)
+            self.file_load_percent.pop(file_path, None)
+            self.on_file_load_cancelled(file_path)
+            self.update_file_load_progress()
+        elif file_path in self.file_load_threads:
+            self.file_load_threads[file_path].requestInterruption()
+            self.set_file_status(file_path, "正在取消")
+        else:
+            QMessageBox.warning(self, "警告", "请先选择正在加载的文件")
+
+    def ensure_sheet_loaded(self, file_path, sheet_name):
+        # 工作表在工作区或解析缓存中时直接读取（列文件内存映射，不解析 Excel）；
+        # 否则提交到后台解析并返回 None，解析完成后 on_sheet_parse_thread_finished 会刷新相关控件
+        sheet_info = self.loaded_files[file_path][sheet_name]
+        if sheet_info['data'] is not None:
+            return sheet_info
+        if (file_path, sheet_name) in self.pending_sheet_parses:
+            return None
+
+        timer = StageTimer(f"读取工作表 {os.path.basename(file_path)} - {sheet_name}")
+        cached = None
+        if sheet_info.get('snapshot') is not None:
+            with timer.stage("读取工作区"):
+                cached = sheet_info['snapshot'].load_sheet(file_path, sheet_name)
+                signature = sheet_info['snapshot'].signatures.get(file_path)
+        if cached is None and self.parse_cache_enabled:
+            with timer.stage("读取解析缓存"):
+                signature = file_signature(file_path)  # 在读取之前记录
+                cached = self.parse_cache.load_sheet(file_path, sheet_name)
+        if cached is None:
+            self.request_sheet_parses([(file_path, sheet_name)])
+            return None
+
+        raw, detected_header = cached
+        with timer.stage("应用表头", len(raw)):
+            self.set_sheet_raw(sheet_info, raw, detected_header, signature)
+        self.log(f"已读取工作表：{os.path.basename(file_path)} - {sheet_name}")
+        self.show_run_summary(timer.finish())
+        return sheet_info
+
+    def request_sheet_parses(self, sheets):
+        # 把尚未解析的工作表加入后台解析队列；解析期间依赖列名的控件和执行按钮不可用
+        for file_path, sheet_name in sheets:
+            sheet_info = self.loaded_files.get(file_path, {}).get(sheet_name)
+            if sheet_info is None or sheet_info['data'] is not None or (file_path, sheet_name) in self.pending_sheet_parses:
+                continue
+            self.pending_sheet_parses.add((file_path, sheet_name))
+            self.sheet_parse_queue.append((file_path, sheet_name, sheet_info['detected_header']))
+        self.start_sheet_parses()
+        self.update_parse_state()
+
+    def start_sheet_parses(self):
+        # 同一时间只运行一个解析线程，运行期间新加入的工作表在其结束后作为下一批提交；较大的工作表优先
+        if not self.sheet_parse_queue or (self.parse_thread is not None and self.parse_thread.isRunning()):
+            return
+        jobs, self.sheet_parse_queue = self.sheet_parse_queue, []
+        jobs.sort(key=lambda job: -((self.loaded_files[job[0]][job[1]]['dimensions'][0] or 0) *
+                                    (self.loaded_files[job[0]][job[1]]['dimensions'][1] or 0)))
+        self.parse_thread = ParseSheetsThread(jobs, self.parse_workers,
+                                              self.parse_cache if self.parse_cache_enabled else None, self.chunk_size)
+        self.parse_thread.progress_update.connect(self.file_load_progress.setValue)
+        self.parse_thread.sheet_parsed.connect(self.on_sheet_parsed)
+        self.parse_thread.error_occurred.connect(self.on_sheet_parse_error)
+        self.parse_thread.finished.connect(self.on_sheet_parse_thread_finished)
+        self.file_load_progress.setVisible(True)
+        self.file_load_progress.setValue(0)
+        self.log(f"开始后台解析 {len(jobs)} 个工作表")
+        self.parse_thread.start()
+
+    def selected_sheets_pending(self):
+        # 主表或勾选的查找表仍在排队或解析中
+        pending = {(os.path.basename(file_path), sheet_name) for file_path, sheet_name in self.pending_sheet_parses}
+        main_table = tuple(self.main_table_combo.currentText().split(" - ")) if self.main_table_combo.currentText() else None
+        return main_table in pending or bool(pending & set(self.checked_lookup_tables()))
+
+    def update_parse_state(self):
+        # 只有主表或勾选的查找表尚未解析完成时才禁用依赖列名的控件，其他工作表在后台解析不影响操作
+        parsing = self.selected_sheets_pending()
+        for widget in (self.main_column_combo, self.main_key_list, self.lookup_column_widget, self.return_columns_list):
+            widget.setEnabled(not parsing)
+        vlookup_running = getattr(self, 'vlookup_thread', None) is not None and self.vlookup_thread.isRunning()
+        self.execute_button.setEnabled(not parsing and not vlookup_running)
+        if parsing:
+            self.vlookup_status_label.setText(f"正在解析 {len(self.pending_sheet_parses)} 个工作表...")
+
+    def set_sheet_raw(self, sheet_info, raw, detected_header, signature):
+        # 手动选择过的表头行（如从工作区恢复的选择）保持不变，否则使用检测结果；
+        # signature 为读取数据之前源文件的 file_signature，索引缓存按它区分，而不是按查找时的文件状态
+        header_row = detected_header if sheet_info['header_row'] == sheet_info['detected_header'] else sheet_info['header_row']
+        if sheet_info['header_row'] != header_row:
+            self.bump_sheet_version(sheet_info)
+        sheet_info['raw'] = raw
+        sheet_info['signature'] = signature
+        sheet_info['detected_header'] = detected_header
+        sheet_info['header_row'] = header_row
+        self.refresh_sheet_view(sheet_info)
+
+    def bump_sheet_version(self, sheet_info):
+        # 工作表数据变化（载入文件、切换表头、清理）时分配新版本号，基于旧版本的匹配结果不再复用
+        if 'version' in sheet_info:
+            self.match_cache.discard_version(sheet_info['version'])
+        self.sheet_version_counter += 1
+        sheet_info['version'] = self.sheet_version_counter
+
+    def refresh_sheet_view(self, sheet_info):
+        # 根据当前表头行从原始行生成数据视图，已执行过的数据清理会重新应用
+        df = apply_header(sheet_info['raw'], sheet_info['header_row'])
+        if sheet_info['cleaned']:
+            df = self.clean_dataframe(df)
+        sheet_info['data'] = df
+
+    def parse_all_sheets(self):
+        # 在后台进程池中并行解析所有尚未解析的工作表
+        sheets = [(file_path, sheet_name)
+                  for file_path, sheet_data in self.loaded_files.items()
+                  for sheet_name, sheet_info in sheet_data.items() if sheet_info['data'] is None]
+        if not sheets:
+            QMessageBox.information(self, "提示", "所有工作表均已解析")
+            return
+        self.request_sheet_parses(sheets)
+
+    def on_sheet_parsed(self, file_path, sheet_name, df, detected_header, signature):
+        self.pending_sheet_parses.discard((file_path, sheet_name))
+        sheet_info = self.loaded_files.get(file_path, {}).get(sheet_name)
+        if sheet_info is None or sheet_info['data'] is not None:
+            return
+        self.set_sheet_raw(sheet_info, df, detected_header, signature)
+        self.log(f"已解析工作表：{os.path.basename(file_path)} - {sheet_name}")
+
+    def on_sheet_parse_error(self, file_path, sheet_name, error_message):
+        self.pending_sheet_parses.discard((file_path, sheet_name))
+        self.log(f"解析工作表 {os.path.basename(file_path)} - {sheet_name} 时发生错误: {error_message}", logging.ERROR)
+
+    def on_sheet_parse_thread_finished(self):
+        # 本批中未产出结果的工作表（取消或整体出错）不再等待；有排队的工作表时继续下一批
+        finished_jobs = {(file_path, sheet_name) for file_path, sheet_name, _ in self.parse_thread.jobs}
+        self.pending_sheet_parses -= finished_jobs - {(f, s) for f, s, _ in self.sheet_parse_queue}
+        self.file_load_progress.setVisible(bool(self.file_load_percent))
+        self.start_sheet_parses()
+        self.update_parse_state()
+        if not self.selected_sheets_pending():
+            self.vlookup_status_label.clear()
+        # 主表或勾选的查找表的列名现在可用时，重新生成依赖列名的控件
+        finished = {(os.path.basename(file_path), sheet_name) for file_path, sheet_name in finished_jobs}
+        main_table = tuple(self.main_table_combo.currentText().split(" - ")) if self.main_table_combo.currentText() else None
+        if main_table in finished:
+            self.update_main_column_combo()
+        elif finished & set(self.checked_lookup_tables()):
+            self.update_lookup_column_combos()
+
+    def checked_lookup_tables(self):
+        return [tuple(item.text().split(" - ")) for item in
+                (self.lookup_table_list.item(i) for i in range(self.lookup_table_list.count()))
+                if item.checkState() == Qt.CheckState.Checked]
 
     def delete_selected_file(self):
         current_item = self.file_list.currentItem()
@@ -351,7 +694,11 @@ class AdvancedVLOOKUPTool(QMainWindow):
             QMessageBox.warning(self, "警告", "请先选择要删除的文件")
             return
         
-        file_name = current_item.text()
+        file_path = current_item.data(Qt.ItemDataRole.UserRole)
+        file_name = os.path.basename(file_path)
+        if file_path in self.file_load_threads or file_path in self.pending_file_loads:
+            QMessageBox.warning(self, "警告", "文件正在加载，请先取消加载")
+            return
         reply = QMessageBox.question(self, '确认删除', 
                                      f"是否确定要删除文件 {file_name}？",
                                      QMessageBox.StandardButton.Yes | 
@@ -359,15 +706,15 @@ class AdvancedVLOOKUPTool(QMainWindow):
                                      QMessageBox.StandardButton.No)
 
         if reply == QMessageBox.StandardButton.Yes:
-            for file_path in list(self.loaded_files.keys()):
-                if os.path.basename(file_path) == file_name:
-                    del self.loaded_files[file_path]
-                    self.file_list.takeItem(self.file_list.row(current_item))
-                    self.log(f"已删除文件：{file_name}")
-                    self.update_table_combos()
-                    break
+            self.loaded_files.pop(file_path, None)
+            self.file_list.takeItem(self.file_list.row(current_item))
+            self.log(f"已删除文件：{file_name}")
+            self.update_table_combos()
 
     def clear_files(self):
+        self.pending_file_loads.clear()
+        for thread in self.file_load_threads.values():
+            thread.requestInterruption()
         self.loaded_files.clear()
         self.file_list.clear()
         self.main_table_combo.clear()
@@ -415,14 +762,23 @@ class AdvancedVLOOKUPTool(QMainWindow):
                 item = QListWidgetItem(item_text)
                 item.setFlags(item.flags() | Qt.ItemFlag.ItemIsUserCheckable)
                 item.setCheckState(Qt.CheckState.Unchecked)
+                rows, columns = sheet_info['dimensions']
+                item.setToolTip(f"{rows} 行 × {columns} 列")
                 self.lookup_table_list.addItem(item)
 
                 # 添加表头选择下拉框
                 header_combo = QComboBox()
-                header_combo.addItem(f"智能检测 (行 {sheet_info['detected_header'] + 1})")
-                for i in range(min(10, sheet_info['data'].shape[0])):
+                if sheet_info['detected_header'] is not None:
+                    header_combo.addItem(f"智能检测 (行 {sheet_info['detected_header'] + 1})")
+                else:
+                    header_combo.addItem("智能检测")
+                for i in range(min(10, rows or 0)):
                     header_combo.addItem(f"行 {i + 1}")
-                header_combo.setCurrentIndex(0)
+                # 显示当前的表头选择（如从工作区恢复的手动选择），设置时不触发表头切换
+                if sheet_info['header_row'] != sheet_info['detected_header'] and sheet_info['header_row'] + 1 < header_combo.count():
+                    header_combo.setCurrentIndex(sheet_info['header_row'] + 1)
+                else:
+                    header_combo.setCurrentIndex(0)
                 header_combo.currentIndexChanged.connect(lambda idx, s=sheet_name, f=file_path: self.update_sheet_header(s, f, idx))
                 
                 header_layout = QHBoxLayout()
@@ -436,37 +792,71 @@ class AdvancedVLOOKUPTool(QMainWindow):
 
     def update_main_column_combo(self):
         self.main_column_combo.clear()
-        if self.main_table_combo.currentText():
-            df = self.get_dataframe(*self.main_table_combo.currentText().split(" - "))
-            if df is not None and isinstance(df, pd.DataFrame):
-                # 将所有列名转换为字符串
-                df.columns = df.columns.astype(str)
-                self.main_column_combo.addItems(df.columns.tolist())
+        self.main_column_combo.addItems(self.main_table_columns())
+        self.main_key_list.blockSignals(True)
+        self.main_key_list.clear()
+        for column in self.main_table_columns():
+            item = QListWidgetItem(str(column), self.main_key_list)
+            item.setFlags(item.flags() | Qt.ItemFlag.ItemIsUserCheckable)
+            item.setCheckState(Qt.CheckState.Unchecked)
+        self.main_key_list.blockSignals(False)
         self.update_lookup_column_combos()
 
+    def extra_main_keys(self):
+        main_column = self.main_column_combo.currentText()
+        return [item.text() for item in (self.main_key_list.item(i) for i in range(self.main_key_list.count()))
+                if item.checkState() == Qt.CheckState.Checked and item.text() != main_column]
+
     def update_lookup_column_combos(self):
         for i in reversed(range(self.lookup_column_layout.count())): 
             self.lookup_column_layout.itemAt(i).widget().setParent(None)
         
         self.lookup_column_combos.clear()
+        self.lookup_extra_key_combos.clear()
+        self.lookup_mode_combos.clear()
+        self.lookup_group_combos.clear()
+        extra_keys = self.extra_main_keys()
 
         for i in range(self.lookup_table_list.count()):
             item = self.lookup_table_list.item(i)
             if item.checkState() == Qt.CheckState.Checked:
                 file_name, sheet_name = item.text().split(" - ")
-                df = self.get_dataframe(file_name, sheet_name)
-                if df is not None and isinstance(df, pd.DataFrame):
+                columns = self.sheet_columns(file_name, sheet_name)
+                if columns:
                     combo = QComboBox()
-                    # 将所有列名转换为字符串
-                    df.columns = df.columns.astype(str)
-                    combo.addItems(df.columns.tolist())
+                    combo.addItems(columns)
                     main_column = self.main_column_combo.currentText()
-                    if main_column in df.columns:
+                    if main_column in columns:
                         combo.setCurrentText(main_column)
                     self.lookup_column_combos[item.text()] = combo
+                    mode_combo = QComboBox()
+                    mode_combo.addItems(["精确匹配", "模糊匹配", "区间匹配（不大于的最大值）", "区间匹配（不小于的最小值）"])
+                    self.lookup_mode_combos[item.text()] = mode_combo
+                    group_combo = QComboBox()
+                    group_combo.addItem("（不分组）")
+                    group_combo.addItems([col for col in self.main_table_columns() if col in columns])
+                    group_combo.setEnabled(False)
+                    mode_combo.currentTextChanged.connect(
+                        lambda text, group_combo=group_combo: group_combo.setEnabled(text.startswith("区间匹配")))
+                    self.lookup_group_combos[item.text()] = group_combo
                     self.lookup_column_layout.addWidget(QLabel(f"查找列 ({item.text()}):"))
                     self.lookup_column_layout.addWidget(combo)
+                    self.lookup_column_layout.addWidget(mode_combo)
+                    self.lookup_column_layout.addWidget(group_combo)
+                    extra_combos = []
+                    for extra_key in extra_keys:
+                        extra_combo = QComboBox()
+                        extra_combo.addItems(columns)
+                        if extra_key in columns:
+                            extra_combo.setCurrentText(extra_key)
+                        self.lookup_column_layout.addWidget(QLabel(f"对应 {extra_key} 的查找列:"))
+                        self.lookup_column_layout.addWidget(extra_combo)
+                        extra_combos.append(extra_combo)
+                    self.lookup_extra_key_combos[item.text()] = extra_combos
+                    # 组合键只支持精确匹配
+                    mode_combo.setEnabled(not extra_keys)
         self.update_return_columns()
+        self.update_parse_state()
 
     def update_return_columns(self):
         self.return_columns_list.clear()
@@ -474,14 +864,10 @@ class AdvancedVLOOKUPTool(QMainWindow):
             item = self.lookup_table_list.item(i)
             if item.checkState() == Qt.CheckState.Checked:
                 file_name, sheet_name = item.text().split(" - ")
-                df = self.get_dataframe(file_name, sheet_name)
-                if df is not None and isinstance(df, pd.DataFrame):
-                    # 将所有列名转换为字符串
-                    df.columns = df.columns.astype(str)
-                    for column in df.columns:
-                        list_item = QListWidgetItem(self.return_columns_list)
-                        checkbox = QCheckBox(str(column))
-                        self.return_columns_list.setItemWidget(list_item, checkbox)
+                for column in self.sheet_columns(file_name, sheet_name):
+                    list_item = QListWidgetItem(self.return_columns_list)
+                    checkbox = QCheckBox(str(column))
+                    self.return_columns_list.setItemWidget(list_item, checkbox)
 
     def filter_return_columns(self, text):
         for i in range(self.return_columns_list.count()):
@@ -490,23 +876,169 @@ class AdvancedVLOOKUPTool(QMainWindow):
             if isinstance(widget, QCheckBox):
                 item.setHidden(text.lower() not in widget.text().lower())
 
-    def get_dataframe(self, file_name, sheet_name):
+    def get_dataframe(self, file_name, sheet_name, columns=None):
+        # columns 为需要的列名：工作表尚未载入内存时只从解析缓存读取这些列，否则从已加载的数据中选取
         for file_path, sheet_data in self.loaded_files.items():
             if os.path.basename(file_path) == file_name:
-                return sheet_data[sheet_name]['data']
+                sheet_info = sheet_data[sheet_name]
+                if columns is not None and sheet_info['data'] is None and not sheet_info['cleaned']:
+                    # 清理需要整表的数据，已清理的表总是完整载入
+                    for store in self.sheet_stores(sheet_info):
+                        df = store.load_sheet_columns(file_path, sheet_name, sheet_info['header_row'], columns)
+                        if df is not None:
+                            return df
+                sheet_info = self.ensure_sheet_loaded(file_path, sheet_name)
+                if sheet_info is None:
+                    return None  # 正在后台解析
+                df = sheet_info['data']
+                if columns is not None:
+                    df = df[[col for col in dict.fromkeys(columns) if col in df.columns]]
+                return df
         return None
 
+    def sheet_stores(self, sheet_info):
+        # 尚未载入内存的工作表可按列读取的来源：从工作区恢复的表优先读工作区，其次是解析缓存
+        stores = []
+        if sheet_info.get('snapshot') is not None:
+            stores.append(sheet_info['snapshot'])
+        if self.parse_cache_enabled:
+            stores.append(self.parse_cache)
+        return stores
+
+    def sheet_columns(self, file_name, sheet_name):
+        # 列名优先取自已加载的数据或解析缓存中记录的表头，不必为了列名读取整个工作表
+        for file_path, sheet_data in self.loaded_files.items():
+            if os.path.basename(file_path) == file_name:
+                sheet_info = sheet_data[sheet_name]
+                if sheet_info['data'] is None:
+                    for store in self.sheet_stores(sheet_info):
+                        names = store.header_names(file_path, sheet_name, sheet_info['header_row'])
+                        if names is not None:
+                            return names
+                sheet_info = self.ensure_sheet_loaded(file_path, sheet_name)
+                # 正在后台解析的工作表暂无列名，解析完成后控件会重新生成
+                return [str(col) for col in sheet_info['data'].columns] if sheet_info is not None else []
+        return []
+
+    def main_table_columns(self):
+        if not self.main_table_combo.currentText():
+            return []
+        return self.sheet_columns(*self.main_table_combo.currentText().split(" - "))
+
     def execute_vlookup(self):
+        # 同一时间只允许一次查找运行，只有当前运行的结果会写入 last_result
+        if getattr(self, 'vlookup_thread', None) is not None and self.vlookup_thread.isRunning():
+            self.log("已有查找正在运行，请等待完成或先取消")
+            return
         if not self.validate_vlookup_inputs():
             return
+        if self.out_of_core_checkbox.isChecked():
+            self.execute_out_of_core()
+            return
 
-        main_df, main_column, lookup_tables, return_columns = self.get_vlookup_parameters()
-        self.vlookup_thread = VLOOKUPThread(main_df, main_column, lookup_tables, return_columns)
+        started = time.perf_counter()
+        main_df, main_column, lookup_tables, return_columns, match_options, table_versions = self.get_vlookup_parameters()
+        if main_df is None or any(lookup_df is None for lookup_df, _, _ in lookup_tables):
+            # 所需工作表的缓存已失效，已提交后台重新解析
+            QMessageBox.information(self, "提示", "正在后台解析所需的工作表，请在解析完成后再执行")
+            return
+        self.vlookup_thread = VLOOKUPThread(main_df, main_column, lookup_tables, return_columns, self.index_cache,
+                                            profile=self.profile_checkbox.isChecked(), key_rules=self.key_rules,
+                                            match_options=match_options, chunk_rows=self.chunk_size,
+                                            match_cache=self.match_cache, table_versions=table_versions)
+        self.vlookup_thread.timer.add(f"读取所需列 ({sum(df.shape[1] for df, _, _ in lookup_tables) + 1} 列)",
+                                      time.perf_counter() - started, len(main_df))
         self.vlookup_thread.progress_update.connect(self.progress_bar.setValue)
+        self.vlookup_thread.rows_progress.connect(self.show_vlookup_progress)
         self.vlookup_thread.result_ready.connect(self.display_results)
         self.vlookup_thread.error_occurred.connect(self.handle_vlookup_error)
+        self.vlookup_thread.lookup_cancelled.connect(self.on_vlookup_cancelled)
+        self.vlookup_thread.finished.connect(self.on_vlookup_thread_finished)
+        self.execute_button.setEnabled(False)
+        self.cancel_vlookup_button.setEnabled(True)
+        self.progress_bar.setValue(0)
+        self.vlookup_status_label.setText("正在准备查找...")
         self.vlookup_thread.start()
 
+    def execute_out_of_core(self):
+        # 磁盘分区模式：直接从文件按块读取，结果流式写入用户选择的文件，不载入内存也不显示在结果表中
+        main_file, main_sheet = self.main_table_combo.currentText().split(" - ")
+        main_columns = [self.main_column_combo.currentText()] + self.extra_main_keys()
+        main_source = self.get_sheet_source(main_file, main_sheet)
+        lookup_sources = []
+        for item in (self.lookup_table_list.item(i) for i in range(self.lookup_table_list.count())):
+            if item.checkState() != Qt.CheckState.Checked:
+                continue
+            if self.lookup_mode_combos[item.text()].currentText() != "精确匹配":
+                QMessageBox.warning(self, "警告", "磁盘分区模式只支持精确匹配")
+                return
+            lookup_columns = [self.lookup_column_combos[item.text()].currentText()] + [
+                combo.currentText() for combo in self.lookup_extra_key_combos[item.text()]]
+            lookup_sources.append((self.get_sheet_source(*item.text().split(" - ")),
+                                   lookup_columns if len(lookup_columns) > 1 else lookup_columns[0]))
+        if main_source is None or any(source is None for source, _ in lookup_sources):
+            QMessageBox.warning(self, "警告", "已清理或与源文件不一致的工作表只在内存或工作区中，不能使用磁盘分区模式")
+            return
+
+        save_format = self.default_save_format if self.default_save_format in ('xlsx', 'csv') else 'xlsx'
+        file_path, _ = QFileDialog.getSaveFileName(self, "保存查找结果", f"vlookup_result.{save_format}",
+                                                   "XLSX Files (*.xlsx);;CSV Files (*.csv)")
+        if not file_path:
+            return
+        self.vlookup_thread = OutOfCoreThread(
+            self.table_source(main_source), main_columns if len(main_columns) > 1 else main_columns[0],
+            [(self.table_source(source), lookup_column) for source, lookup_column in lookup_sources],
+            self.get_selected_return_columns(), file_path, self.out_of_core_memory_mb * 1024 * 1024,
+            self.chunk_size, self.key_rules, self.na_rep, self.xlsx_keep_empty,
+            profile=self.profile_checkbox.isChecked())
+        self.vlookup_thread.progress_update.connect(self.progress_bar.setValue)
+        self.vlookup_thread.stage_progress.connect(self.show_out_of_core_progress)
+        self.vlookup_thread.output_ready.connect(self.on_out_of_core_finished)
+        self.vlookup_thread.error_occurred.connect(self.handle_vlookup_error)
+        self.vlookup_thread.lookup_cancelled.connect(self.on_vlookup_cancelled)
+        self.vlookup_thread.finished.connect(self.on_vlookup_thread_finished)
+        self.execute_button.setEnabled(False)
+        self.cancel_vlookup_button.setEnabled(True)
+        self.progress_bar.setValue(0)
+        self.vlookup_status_label.setText("正在分区...")
+        self.log(f"开始磁盘分区查找，结果写入：{file_path}")
+        self.vlookup_thread.start()
+
+    def table_source(self, source):
+        return TableSource(source['file_path'], source['sheet_name'], source['header_row'])
+
+    def show_out_of_core_progress(self, stage, done_rows, total_rows):
+        if total_rows < 0:
+            self.vlookup_status_label.setText(f"{stage}：已读取 {done_rows:,} 行")
+        else:
+            self.vlookup_status_label.setText(f"{stage}：{done_rows:,} / {total_rows:,} 行")
+
+    def on_out_of_core_finished(self, file_path, rows):
+        if self.sender() is not self.vlookup_thread:
+            return
+        self.vlookup_status_label.setText(f"完成，共 {rows:,} 行，已写入 {os.path.basename(file_path)}")
+        self.log(f"磁盘分区查找完成，结果已保存至：{file_path}")
+        self.show_run_summary(self.vlookup_thread.timer.finish())
+
+    def cancel_vlookup(self):
+        if getattr(self, 'vlookup_thread', None) is not None and self.vlookup_thread.isRunning():
+            self.vlookup_thread.requestInterruption()
+            self.vlookup_status_label.setText("正在取消...")
+
+    def show_vlookup_progress(self, done_rows, total_rows, eta_seconds):
+        if eta_seconds < 0:
+            self.vlookup_status_label.setText(f"已处理 {done_rows:,} / {total_rows:,} 行")
+        else:
+            self.vlookup_status_label.setText(f"已处理 {done_rows:,} / {total_rows:,} 行，预计剩余 {eta_seconds:.0f} 秒")
+
+    def on_vlookup_cancelled(self):
+        self.vlookup_status_label.setText("查找已取消")
+        self.log("已取消VLOOKUP")
+
+    def on_vlookup_thread_finished(self):
+        self.execute_button.setEnabled(not self.selected_sheets_pending())
+        self.cancel_vlookup_button.setEnabled(False)
+
     def validate_vlookup_inputs(self):
         if not self.main_table_combo.currentText():
             QMessageBox.warning(self, "警告", "请选择主表")
@@ -517,22 +1049,69 @@ class AdvancedVLOOKUPTool(QMainWindow):
         if not self.get_selected_return_columns():
             QMessageBox.warning(self, "警告", "请选择至少一个返回列")
             return False
+        if self.selected_sheets_pending():
+            QMessageBox.information(self, "提示", "正在后台解析工作表，请在解析完成后再执行")
+            return False
         return True
 
     def get_vlookup_parameters(self):
-        file_name, main_sheet = self.main_table_combo.currentText().split(" - ")
-        main_df = self.get_dataframe(file_name, main_sheet)
-        main_column = self.main_column_combo.currentText()
+        # 只读取查找需要的列：主表的主列，以及每个查找表的查找列和选中的返回列
+        main_file, main_sheet = self.main_table_combo.currentText().split(" - ")
+        main_columns = [self.main_column_combo.currentText()] + self.extra_main_keys()
+        main_column = main_columns if len(main_columns) > 1 else main_columns[0]
+        return_columns = self.get_selected_return_columns()
 
-        lookup_tables = [
-            (self.get_dataframe(*item.text().split(" - ")), self.lookup_column_combos[item.text()].currentText())
-            for item in (self.lookup_table_list.item(i) for i in range(self.lookup_table_list.count()))
-            if item.checkState() == Qt.CheckState.Checked
-        ]
+        lookup_tables = []
+        match_options = []
+        group_columns = []
+        lookup_versions = []
+        for item in (self.lookup_table_list.item(i) for i in range(self.lookup_table_list.count())):
+            if item.checkState() == Qt.CheckState.Checked:
+                file_name, sheet_name = item.text().split(" - ")
+                lookup_columns = [self.lookup_column_combos[item.text()].currentText()] + [
+                    combo.currentText() for combo in self.lookup_extra_key_combos[item.text()]]
+                lookup_column = lookup_columns if len(lookup_columns) > 1 else lookup_columns[0]
+                options = self.match_options_for(item.text()) if len(lookup_columns) == 1 else None
+                extra_columns = []
+                if isinstance(options, RangeMatch) and options.group_column:
+                    extra_columns.append(options.lookup_group_column)
+                    group_columns.append(options.group_column)
+                lookup_df = self.get_dataframe(file_name, sheet_name, lookup_columns + extra_columns + return_columns)
+                lookup_tables.append((lookup_df, lookup_column, self.get_sheet_source(file_name, sheet_name)))
+                match_options.append(options)
+                lookup_versions.append(self.get_sheet_version(file_name, sheet_name))
+
+        main_df = self.get_dataframe(main_file, main_sheet, main_columns + group_columns)
+        table_versions = (self.get_sheet_version(main_file, main_sheet), lookup_versions)
+        return main_df, main_column, lookup_tables, return_columns, match_options, table_versions
+
+    def match_options_for(self, item_text):
+        # 根据查找表的匹配方式返回 vlookup 的匹配选项，精确匹配为 None
+        mode = self.lookup_mode_combos[item_text].currentText()
+        if mode == "模糊匹配":
+            return FuzzyMatch(self.fuzzy_threshold)
+        if mode.startswith("区间匹配"):
+            group_combo = self.lookup_group_combos[item_text]
+            group_column = group_combo.currentText() if group_combo.currentIndex() > 0 else None
+            return RangeMatch(RANGE_LE if "不大于" in mode else RANGE_GE, group_column)
+        return None
 
-        return_columns = self.get_selected_return_columns()
+    def get_sheet_version(self, file_name, sheet_name):
+        for file_path, sheet_data in self.loaded_files.items():
+            if os.path.basename(file_path) == file_name:
+                return sheet_data[sheet_name].get('version')
+        return None
 
-        return main_df, main_column, lookup_tables, return_columns
+    def get_sheet_source(self, file_name, sheet_name):
+        # 返回工作表的来源信息，用于索引缓存；数据被清理或改动过、或与源文件不一致的表不使用缓存
+        for file_path, sheet_data in self.loaded_files.items():
+            if os.path.basename(file_path) == file_name:
+                sheet_info = sheet_data[sheet_name]
+                if sheet_info['cleaned'] or sheet_info.get('detached'):
+                    return None
+                return {'file_path': file_path, 'sheet_name': sheet_name, 'header_row': sheet_info['header_row'],
+                        'signature': sheet_info.get('signature')}
+        return None
 
     def get_selected_return_columns(self):
         return [self.return_columns_list.itemWidget(self.return_columns_list.item(i)).text() 
@@ -541,28 +1120,65 @@ class AdvancedVLOOKUPTool(QMainWindow):
                 self.return_columns_list.itemWidget(self.return_columns_list.item(i)).isChecked()]
 
     def display_results(self, df):
+        if self.sender() is not self.vlookup_thread:
+            return  # 已被替换的运行的结果不再写入
         self.last_result = df
-        self.display_dataframe(df, self.result_table)
+        self.workspace_result = None
+        self.vlookup_status_label.setText(f"完成，共 {len(df):,} 行")
+        timer = self.vlookup_thread.timer
+        with timer.stage("渲染结果", len(df)):
+            self.display_dataframe(df, self.result_table, self.na_rep)
         self.log("VLOOKUP执行完成")
+        self.show_run_summary(timer.finish())
+
+    def show_run_summary(self, timer):
+        # 阶段耗时写入日志文件并显示在运行摘要中
+        timer.log()
+        self.run_summary.append(f"{datetime.now().strftime('%H:%M:%S')} {timer.title}")
+        for line in timer.summary_lines():
+            self.run_summary.append(f"    {line}")
+        if timer.profiler is not None:
+            self.profiled_timer = timer
+            self.save_profile_button.setEnabled(True)
+            self.profile_checkbox.setChecked(False)  # 只采集一次运行
+
+    def save_profile(self):
+        if self.profiled_timer is None:
+            return
+        file_path, _ = QFileDialog.getSaveFileName(self, "保存性能分析", "vlookup.prof",
+                                                   "cProfile Files (*.prof);;All Files (*)")
+        if file_path:
+            try:
+                self.profiled_timer.save_profile(file_path)
+                self.log(f"性能分析已保存至：{file_path}")
+            except Exception as e:
+                self.log(f"保存性能分析失败：{str(e)}", logging.ERROR)
+                QMessageBox.warning(self, "保存失败", f"保存性能分析时发生错误：{str(e)}")
 
-    def display_dataframe(self, df, table_widget):
-        table_widget.setRowCount(df.shape[0])
-        table_widget.setColumnCount(df.shape[1])
-        
-        # 将列名转换为字符串
-        column_labels = [str(col) for col in df.columns]
-        table_widget.setHorizontalHeaderLabels(column_labels)
+    def display_dataframe(self, df, table_view, na_rep=None, total_rows=None, row_loader=None):
+        # 模型直接引用 DataFrame 的列数组，只在单元格可见时格式化，缺失值此时才替换为 na_rep
+        # df 只是开头的若干行时，其余行在滚动到时由 row_loader 读取
+        table_view.setModel(DataFrameModel(df, table_view, na_rep, total_rows, row_loader))
 
-        for row in range(df.shape[0]):
-            for col in range(df.shape[1]):
-                table_widget.setItem(row, col, QTableWidgetItem(str(df.iloc[row, col])))
+    def current_result(self):
+        # 从工作区打开的结果在保存或导出时才完整读取
+        if self.last_result is None and self.workspace_result is not None:
+            self.last_result = self.workspace_result.load_result()
+            self.workspace_result = None
+        return self.last_result
 
     def handle_vlookup_error(self, error_message):
         self.log(f"VLOOKUP操作错误: {error_message}", logging.ERROR)
         QMessageBox.critical(self, "错误", f"VLOOKUP操作失败: {error_message}")
 
     def save_results(self):
-        if self.last_result is None:
+        try:
+            result = self.current_result()
+        except (WorkspaceError, OSError, ValueError) as e:
+            self.log(f"读取工作区中的结果失败：{str(e)}", logging.ERROR)
+            QMessageBox.warning(self, "读取失败", f"读取工作区中的结果时发生错误：{str(e)}")
+            return
+        if result is None:
             QMessageBox.warning(self, "警告", "没有可保存的结果")
             return
 
@@ -570,70 +1186,57 @@ class AdvancedVLOOKUPTool(QMainWindow):
                                                    f"{self.default_save_format.upper()} Files (*.{self.default_save_format});;All Files (*)")
         
         if file_path:
-            try:
-                if file_path.endswith('.xlsx'):
-                    self.last_result.to_excel(file_path, index=False)
-                elif file_path.endswith('.csv'):
-                    self.last_result.to_csv(file_path, index=False)
-                elif file_path.endswith('.pdf'):
-                    self.save_as_pdf(file_path, self.last_result)
-                else:
-                    self.last_result.to_excel(file_path + '.xlsx', index=False)
-                
-                self.log(f"结果已成功保存至：{file_path}")
-                QMessageBox.information(self, "保存成功", f"结果已成功保存至：{file_path}")
-            except Exception as e:
-                self.log(f"保存结果失败：{str(e)}", logging.ERROR)
-                QMessageBox.warning(self, "保存失败", f"保存结果时发生错误：{str(e)}")
-
-    def save_as_pdf(self, file_path, df):
-        doc = SimpleDocTemplate(file_path, pagesize=landscape(letter))
-        elements = []
-
-        styles = getSampleStyleSheet()
-        title = Paragraph("VLOOKUP Results", styles['Title'])
-        elements.append(title)
-
-        data = [df.columns.tolist()] + df.values.tolist()
-        t = Table(data)
-        t.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, 0), 14),
-            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-            ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-            ('TEXTCOLOR', (0, 1), (-1, -1), colors.black),
-            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-            ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
-            ('FONTSIZE', (0, 1), (-1, -1), 12),
-            ('TOPPADDING', (0, 1), (-1, -1), 6),
-            ('BOTTOMPADDING', (0, 1), (-1, -1), 6),
-            ('GRID', (0, 0), (-1, -1), 1, colors.black)
-        ]))
-        elements.append(t)
-
-        doc.build(elements)
+            # 在后台线程中分块写出：xlsx 超过行数上限时自动拆分工作表，PDF 逐页绘制
+            self.export_thread = ExportThread(result, file_path, self.chunk_size,
+                                              self.pdf_max_rows or None, self.pdf_sample_rows,
+                                              self.na_rep, self.xlsx_keep_empty)
+            self.export_thread.progress_update.connect(self.progress_bar.setValue)
+            self.export_thread.export_finished.connect(self.on_export_finished)
+            self.export_thread.error_occurred.connect(self.on_export_error)
+            self.export_thread.export_cancelled.connect(self.on_export_cancelled)
+            self.export_thread.finished.connect(self.on_export_thread_finished)
+            self.save_button.setEnabled(False)
+            self.cancel_export_button.setEnabled(True)
+            self.progress_bar.setValue(0)
+            self.log(f"开始导出结果：{file_path}")
+            self.export_thread.start()
+
+    def cancel_export(self):
+        if getattr(self, 'export_thread', None) is not None and self.export_thread.isRunning():
+            self.export_thread.requestInterruption()
+
+    def on_export_finished(self, file_path):
+        self.log(f"结果已成功保存至：{file_path}")
+        self.show_run_summary(self.export_thread.timer.finish())
+        QMessageBox.information(self, "保存成功", f"结果已成功保存至：{file_path}")
+
+    def on_export_error(self, error_message):
+        self.log(f"保存结果失败：{error_message}", logging.ERROR)
+        QMessageBox.warning(self, "保存失败", f"保存结果时发生错误：{error_message}")
+
+    def on_export_cancelled(self):
+        self.log("已取消导出")
+
+    def on_export_thread_finished(self):
+        self.save_button.setEnabled(True)
+        self.cancel_export_button.setEnabled(False)
 
     def log(self, message, level=logging.INFO):
         logging.log(level, message)
         self.log_text.append(f"{datetime.now().strftime('%Y-%m-%d %H:%M:%S')} - {message}")
 
     def preview_file(self, item):
-        file_name = item.text()
+        item_path = item.data(Qt.ItemDataRole.UserRole)
+        file_name = os.path.basename(item_path)
         for file_path, sheet_data in self.loaded_files.items():
-            if os.path.basename(file_path) == file_name:
+            if file_path == item_path:
                 sheet_name = next(iter(sheet_data.keys()))
-                df = sheet_data[sheet_name]['data']  # 获取实际的 DataFrame
-                
-                # 如果第一行是表头，则设置它为列名
-                header_row = sheet_data[sheet_name]['detected_header']
-                if header_row is not None:
-                    df.columns = df.iloc[header_row]
-                    df = df.drop(df.index[header_row])
-                
-                self.display_dataframe(df.head(10), self.preview_table)
+                df = sheet_data[sheet_name]['data']  # 当前表头下的数据视图，表头已应用
+                if df is None:
+                    # 工作表尚未解析时直接显示扫描得到的预览行
+                    self.display_dataframe(sheet_data[sheet_name]['preview'], self.preview_table)
+                else:
+                    self.display_dataframe(df.head(10), self.preview_table)
                 self.log(f"预览文件：{file_name}, 表：{sheet_name}")
                 break
 
@@ -649,20 +1252,171 @@ class AdvancedVLOOKUPTool(QMainWindow):
             sheet_name, ok = QInputDialog.getItem(self, "选择工作表", "请选择要清理的工作表:", 
                                                   list(self.loaded_files[file_path].keys()), 0, False)
             if ok and sheet_name:
-                df = self.loaded_files[file_path][sheet_name]['data']
+                sheet_info = self.ensure_sheet_loaded(file_path, sheet_name)
+                if sheet_info is None:
+                    QMessageBox.information(self, "提示", "工作表正在后台解析，请在解析完成后再清理")
+                    return
                 
-                # 执行数据清理操作
-                df = df.dropna()  # 删除包含空值的行
-                df = df.drop_duplicates()  # 删除重复行
-                
-                # 更新已加载的文件数据
-                self.loaded_files[file_path][sheet_name]['data'] = df
+                # 执行数据清理操作，原始行保持不变，切换表头后会重新应用
+                sheet_info['data'] = self.clean_dataframe(sheet_info['data'])
+                sheet_info['cleaned'] = True
+                self.bump_sheet_version(sheet_info)
                 
                 self.log(f"已清理文件 {file_name} 的 {sheet_name} 工作表")
                 QMessageBox.information(self, "清理完成", f"已成功清理 {file_name} 的 {sheet_name} 工作表")
                 
                 # 更新预览
-                self.preview_file(self.file_list.findItems(file_name, Qt.MatchFlag.MatchExactly)[0])
+                self.preview_file(self.find_file_item(file_path))
+
+    def clean_dataframe(self, df):
+        df = df.dropna()  # 删除包含空值的行
+        df = df.drop_duplicates()  # 删除重复行
+        return df
+
+    def workspace_config(self):
+        # 当前的查找配置：主表、主列、组合键、勾选的查找表及其查找列和匹配方式、勾选的返回列
+        lookups = {}
+        for item in (self.lookup_table_list.item(i) for i in range(self.lookup_table_list.count())):
+            if item.checkState() == Qt.CheckState.Checked and item.text() in self.lookup_column_combos:
+                lookups[item.text()] = {
+                    'column': self.lookup_column_combos[item.text()].currentText(),
+                    'extra_columns': [combo.currentText() for combo in self.lookup_extra_key_combos[item.text()]],
+                    'mode': self.lookup_mode_combos[item.text()].currentText(),
+                    'group_column': self.lookup_group_combos[item.text()].currentText()
+                }
+        return {
+            'main_table': self.main_table_combo.currentText(),
+            'main_column': self.main_column_combo.currentText(),
+            'extra_main_keys': self.extra_main_keys(),
+            'lookups': lookups,
+            'return_columns': self.get_selected_return_columns(),
+            'out_of_core': self.out_of_core_checkbox.isChecked()
+        }
+
+    def apply_workspace_config(self, config):
+        # 按依赖顺序恢复控件：主表决定主列和附加键列，勾选查找表后才会生成查找列和返回列控件
+        self.main_table_combo.setCurrentText(config.get('main_table', ''))
+        self.main_column_combo.setCurrentText(config.get('main_column', ''))
+        extra_keys = set(config.get('extra_main_keys', []))
+        for item in (self.main_key_list.item(i) for i in range(self.main_key_list.count())):
+            if item.text() in extra_keys:
+                item.setCheckState(Qt.CheckState.Checked)
+        lookups = config.get('lookups', {})
+        for item in (self.lookup_table_list.item(i) for i in range(self.lookup_table_list.count())):
+            if item.text() in lookups:
+                item.setCheckState(Qt.CheckState.Checked)
+        for item_text, lookup in lookups.items():
+            if item_text not in self.lookup_column_combos:
+                continue
+            self.lookup_column_combos[item_text].setCurrentText(lookup['column'])
+            for combo, column in zip(self.lookup_extra_key_combos[item_text], lookup['extra_columns']):
+                combo.setCurrentText(column)
+            self.lookup_mode_combos[item_text].setCurrentText(lookup['mode'])
+            self.lookup_group_combos[item_text].setCurrentText(lookup['group_column'])
+        return_columns = set(config.get('return_columns', []))
+        for i in range(self.return_columns_list.count()):
+            checkbox = self.return_columns_list.itemWidget(self.return_columns_list.item(i))
+            checkbox.setChecked(checkbox.text() in return_columns)
+        self.out_of_core_checkbox.setChecked(bool(config.get('out_of_core', False)))
+
+    def save_workspace(self):
+        if not self.loaded_files:
+            QMessageBox.warning(self, "警告", "没有可保存的文件")
+            return
+        if self.file_load_threads or self.pending_file_loads:
+            QMessageBox.warning(self, "警告", "文件正在加载，请等待加载完成后再保存工作区")
+            return
+        file_path, _ = QFileDialog.getSaveFileName(self, "保存工作区", f"workspace{WORKSPACE_EXTENSION}",
+                                                   f"VLOOKUP 工作区 (*{WORKSPACE_EXTENSION})")
+        if not file_path:
+            return
+
+        timer = StageTimer(f"保存工作区 {os.path.basename(file_path)}")
+        try:
+            files = {}
+            signatures = {}
+            with timer.stage("收集工作表"):
+                for source_path, sheet_data in self.loaded_files.items():
+                    files[source_path] = {}
+                    snapshot = next(iter(sheet_data.values())).get('snapshot')
+                    if snapshot is not None:
+                        # 从工作区恢复的文件沿用原来的源文件签名，源文件之后的修改不会被误认为已包含在数据中
+                        signatures[source_path] = snapshot.signatures.get(source_path)
+                    for sheet_name, sheet_info in sheet_data.items():
+                        raw = sheet_info['raw']
+                        if raw is None and sheet_info.get('snapshot') is not None:
+                            # 从工作区恢复但尚未访问的工作表，原样写入新的工作区
+                            loaded = sheet_info['snapshot'].load_sheet(source_path, sheet_name)
+                            raw = loaded[0] if loaded is not None else None
+                        files[source_path][sheet_name] = dict(sheet_info, raw=raw)
+            with timer.stage("读取结果"):
+                result = self.current_result()
+            with timer.stage("写入工作区", len(result) if result is not None else None):
+                file_path = save_workspace(file_path, files, self.workspace_config(), result, signatures)
+        except Exception as e:
+            self.log(f"保存工作区失败：{str(e)}", logging.ERROR)
+            QMessageBox.warning(self, "保存失败", f"保存工作区时发生错误：{str(e)}")
+            return
+        self.log(f"工作区已保存至：{file_path}")
+        self.show_run_summary(timer.finish())
+
+    def open_workspace(self):
+        if self.file_load_threads or self.pending_file_loads:
+            QMessageBox.warning(self, "警告", "文件正在加载，请先取消加载")
+            return
+        file_path, _ = QFileDialog.getOpenFileName(self, "打开工作区", "", f"VLOOKUP 工作区 (*{WORKSPACE_EXTENSION})")
+        if not file_path:
+            return
+
+        # 只读取工作区的元数据和预览行，工作表数据和结果列在访问时才从工作区文件读取
+        timer = StageTimer(f"打开工作区 {os.path.basename(file_path)}")
+        try:
+            with timer.stage("读取元数据"):
+                workspace = Workspace(file_path)
+            with timer.stage("恢复文件列表"):
+                loaded_files = {}
+                for source_path, sheets in workspace.files.items():
+                    loaded_files[source_path] = {}
+                    detached = not workspace.source_unchanged(source_path)  # 源文件已修改或不存在
+                    for sheet_name, state in sheets.items():
+                        sheet_info = {
+                            'raw': None,
+                            'data': None,
+                            'detected_header': state['detected_header'],
+                            'header_row': state['header_row'],
+                            'cleaned': state['cleaned'],
+                            'dimensions': tuple(state['dimensions']),
+                            'preview': workspace.load_preview(source_path, sheet_name),
+                            'snapshot': workspace,
+                            'detached': detached
+                        }
+                        self.bump_sheet_version(sheet_info)
+                        loaded_files[source_path][sheet_name] = sheet_info
+            with timer.stage("读取结果首页"):
+                # 只读取显示第一页所需的行，其余行在滚动到时读取，保存或导出时才读取完整结果
+                result_page = workspace.load_result(0, DataFrameModel.load_batch_size)
+        except (WorkspaceError, OSError, ValueError) as e:
+            self.log(f"打开工作区失败：{str(e)}", logging.ERROR)
+            QMessageBox.warning(self, "打开失败", f"打开工作区时发生错误：{str(e)}")
+            return
+
+        self.clear_files()
+        self.loaded_files = loaded_files
+        for source_path in loaded_files:
+            item = QListWidgetItem(os.path.basename(source_path))
+            item.setData(Qt.ItemDataRole.UserRole, source_path)
+            self.file_list.addItem(item)
+        with timer.stage("恢复查找配置"):
+            self.update_table_combos()
+            self.apply_workspace_config(workspace.config)
+        self.last_result = None
+        self.workspace_result = workspace if result_page is not None else None
+        if result_page is not None:
+            with timer.stage("渲染结果", len(result_page)):
+                self.display_dataframe(result_page, self.result_table, self.na_rep, workspace.result_rows,
+                                       workspace.load_result)
+        self.log(f"已打开工作区：{file_path}")
+        self.show_run_summary(timer.finish())
 
     def show_settings(self):
         dialog = SettingsDialog(self)
@@ -702,85 +1456,41 @@ class AdvancedVLOOKUPTool(QMainWindow):
 
     def closeEvent(self, event):
         reply = QMessageBox.question(self, '确认退出', 
-                                     "是否要退出程序？\n未保存的数据将丢失。",
+                                     "是否要退出程序？\n未保存的数据将丢失（可通过“文件 - 保存工作区”保存当前会话）。",
                                      QMessageBox.StandardButton.Yes | 
                                      QMessageBox.StandardButton.No,
                                      QMessageBox.StandardButton.No)
 
         if reply == QMessageBox.StandardButton.Yes:
+            for thread in list(self.file_load_threads.values()):
+                thread.requestInterruption()
+                thread.wait()
+            if getattr(self, 'vlookup_thread', None) is not None and self.vlookup_thread.isRunning():
+                self.vlookup_thread.requestInterruption()
+                self.vlookup_thread.wait()
+            if self.parse_thread is not None and self.parse_thread.isRunning():
+                self.parse_thread.requestInterruption()
+                self.parse_thread.wait()
             event.accept()
         else:
             event.ignore()
 
     def detect_header_row(self, df, max_rows=10):
-        scores = []
-        common_header_words = ['id', 'name', 'date', 'time', 'value', 'code', 'type', 'category', 'description']
-        
-        for i in range(min(max_rows, len(df))):
-            row = df.iloc[i]
-            score = 0
-        
-            # 对第一行和第二行给予额外分数
-            if i == 0:
-                score += 2
-            elif i == 1:
-                score += 1.5  # 给第二行稍微低一点的额外分数
-        
-            # 检查字符串的比例
-            string_ratio = row.apply(lambda x: isinstance(x, str)).mean()
-            score += string_ratio * 2
-        
-            # 检查空值的比例
-            non_null_ratio = 1 - row.isnull().mean()
-            score += non_null_ratio
-        
-            # 检查数据类型的一致性
-            dtype_consistency = len(set(row.apply(type))) / len(row)
-            score += (1 - dtype_consistency)
-        
-            # 检查长度的一致性和偏好短字符串
-            lengths = row.apply(lambda x: len(str(x)) if x is not None else 0)
-            length_consistency = 1 - (lengths.std() / lengths.mean() if lengths.mean() > 0 else 0)
-            score += length_consistency
-            score += 1 / (lengths.mean() + 1)  # 偏好短字符串
-        
-            # 检查特殊字符或乱码
-            special_char_ratio = row.apply(lambda x: sum(not c.isalnum() and not c.isspace() for c in str(x)) / len(str(x)) if x is not None else 0).mean()
-            score -= special_char_ratio
-        
-            # 检查是否包含常见的列名关键词
-            lower_row = row.astype(str).str.lower()
-            keyword_match = any(lower_row.str.contains(word).any() for word in common_header_words)
-            score += 2 if keyword_match else 0
-        
-            # 检查是否为连续的数字行（可能是数据而不是列名）
-            if row.dtype.name.startswith('int') or row.dtype.name.startswith('float'):
-                score -= 1
-        
-            # 检查是否所有单元格都不为空
-            if not row.isnull().any():
-                score += 0.5
-        
-            # 检查是否有重复值（列名通常不会重复）
-            if row.nunique() == len(row):
-                score += 0.5
-        
-            scores.append(score)
-    
-        best_row = scores.index(max(scores))
-        return best_row
+        return detect_header_row(df, max_rows)
 
     def update_sheet_header(self, sheet_name, file_path, index):
+        sheet_info = self.loaded_files[file_path][sheet_name]
         if index == 0:  # 使用智能检测的结果
-            header_row = self.loaded_files[file_path][sheet_name]['detected_header']
+            header_row = sheet_info['detected_header']
         else:
             header_row = index - 1
         
-        # 更新DataFrame的表头
-        df = self.loaded_files[file_path][sheet_name]['data']
-        df.columns = df.iloc[header_row]
-        df = df.drop(df.index[header_row]).reset_index(drop=True)
-        self.loaded_files[file_path][sheet_name]['data'] = df
+        # 表头只是原始行上的偏移量，切换时不复制也不修改数据行；尚未载入的工作表在读取时应用
+        if sheet_info['header_row'] != header_row:
+            self.bump_sheet_version(sheet_info)
+        sheet_info['header_row'] = header_row
+        if sheet_info['raw'] is not None:
+            self.refresh_sheet_view(sheet_info)
         
         # 更新相关的UI元素
         self.update_main_column_combo()
@@ -798,44 +1508,239 @@ class AdvancedVLOOKUPTool(QMainWindow):
 
 class VLOOKUPThread(QThread):
     progress_update = pyqtSignal(int)
+    rows_progress = pyqtSignal(int, int, float)  # 已处理行数, 总行数, 预计剩余秒数（未知时为 -1）
     result_ready = pyqtSignal(pd.DataFrame)
     error_occurred = pyqtSignal(str)
+    lookup_cancelled = pyqtSignal()
 
-    def __init__(self, main_df, main_column, lookup_tables, return_columns):
+    def __init__(self, main_df, main_column, lookup_tables, return_columns, index_cache=None, profile=False,
+                 key_rules=None, match_options=None, chunk_rows=None, match_cache=None, table_versions=None):
         super().__init__()
         self.main_df = main_df
         self.main_column = main_column
         self.lookup_tables = lookup_tables
         self.return_columns = return_columns
+        self.index_cache = index_cache
+        self.key_rules = key_rules or KeyRules()
+        self.match_options = match_options or [None] * len(lookup_tables)
+        self.chunk_rows = chunk_rows
+        self.match_cache = match_cache
+        self.table_versions = table_versions
+        self.rows_started = None
+        self.timer = StageTimer("VLOOKUP", profile)
+
+    def build_indexes(self):
+        # 对有来源信息的单列精确匹配查找表优先从磁盘缓存读取索引，未命中时构建并写入缓存；
+        # 模糊匹配、区间匹配和组合键的索引在查找时构建
+        indexes = []
+        for i, ((lookup_df, lookup_column, source), options) in enumerate(zip(self.lookup_tables, self.match_options)):
+            if self.index_cache is None or source is None or options is not None or isinstance(lookup_column, list):
+                indexes.append(None)
+                continue
+            cache_key = match_cache_key(self.match_cache, self.table_versions, i, self.main_column, lookup_column,
+                                        self.key_rules, options, len(self.main_df))
+            if cache_key is not None and self.match_cache.get(cache_key) is not None:
+                indexes.append(None)  # 匹配结果可直接复用，不需要索引
+                continue
+            key = self.index_cache.cache_key(source['file_path'], source['sheet_name'], lookup_column, source['header_row'],
+                                             source['signature'], self.key_rules)
+            with self.timer.stage(f"索引缓存 {lookup_column}", len(lookup_df)):
+                indexes.append(self.index_cache.get_or_build(key, lookup_df[lookup_column], self.key_rules))
+            self.report_progress(0, len(self.main_df))
+        return indexes
+
+    def report_progress(self, done_rows, total_rows):
+        # 建索引、匹配唯一键、展开和取值的每一块之后调用一次；请求中断时抛出 LookupCancelled，在当前块结束后停止
+        if self.isInterruptionRequested():
+            raise LookupCancelled()
+        now = time.perf_counter()
+        if done_rows == 0 or self.rows_started is None:
+            self.rows_started = now  # 剩余时间从 vlookup 开始报告进度算起，此前为读取索引缓存阶段
+        elapsed = now - self.rows_started
+        eta = elapsed / done_rows * (total_rows - done_rows) if done_rows and elapsed > 0 else -1.0
+        self.progress_update.emit(int(done_rows / total_rows * 100) if total_rows else 100)
+        self.rows_progress.emit(done_rows, total_rows, eta)
 
     def run(self):
+        self.timer.start_profile()
         try:
-            result_df = self.main_df.copy()
-            total_steps = len(self.lookup_tables)
-            
-            for i, (lookup_df, lookup_column) in enumerate(self.lookup_tables):
-                result_df[self.main_column] = result_df[self.main_column].astype(str)
-                lookup_df[lookup_column] = lookup_df[lookup_column].astype(str)
-                
-                result_df = pd.merge(result_df, 
-                                     lookup_df,
-                                     left_on=self.main_column,
-                                     right_on=lookup_column,
-                                     how='left',
-                                     suffixes=('', f'_table{i}'))
-                
-                result_df = result_df.fillna('N/A')
-                
-                self.progress_update.emit(int((i + 1) / total_steps * 100))
-
-            columns_to_keep = [self.main_column] + [col for col in result_df.columns if col in self.return_columns]
-            result_df = result_df[columns_to_keep]
-
+            lookup_tables = [(lookup_df, lookup_column) for lookup_df, lookup_column, _ in self.lookup_tables]
+            result_df = vlookup(self.main_df, self.main_column, lookup_tables, self.return_columns,
+                                indexes=self.build_indexes(), progress_callback=self.report_progress,
+                                timer=self.timer, key_rules=self.key_rules, match_options=self.match_options,
+                                chunk_rows=self.chunk_rows, match_cache=self.match_cache,
+                                table_versions=self.table_versions)
+            self.timer.stop_profile()
+            self.progress_update.emit(100)
             self.result_ready.emit(result_df)
+        except LookupCancelled:
+            self.lookup_cancelled.emit()
         except Exception as e:
             self.error_occurred.emit(str(e))
         finally:
+            self.timer.stop_profile()
+
+class OutOfCoreThread(QThread):
+    progress_update = pyqtSignal(int)
+    stage_progress = pyqtSignal(str, int, int)  # 阶段, 已处理行数, 总行数（未知时为 -1）
+    output_ready = pyqtSignal(str, int)
+    error_occurred = pyqtSignal(str)
+    lookup_cancelled = pyqtSignal()
+
+    def __init__(self, main_source, main_column, lookup_sources, return_columns, output_path, memory_budget,
+                 chunk_rows=100000, key_rules=None, na_rep=DEFAULT_NA_REP, xlsx_keep_empty=False, profile=False):
+        super().__init__()
+        self.main_source = main_source
+        self.main_column = main_column
+        self.lookup_sources = lookup_sources
+        self.return_columns = return_columns
+        self.output_path = output_path
+        self.memory_budget = memory_budget
+        self.chunk_rows = chunk_rows
+        self.key_rules = key_rules or KeyRules()
+        self.na_rep = na_rep
+        self.xlsx_keep_empty = xlsx_keep_empty
+        self.timer = StageTimer("磁盘分区查找", profile)
+
+    def report_progress(self, stage, done_rows, total_rows):
+        # 分区阶段总行数未知，只报告已读取行数；连接和写出阶段按主表行数报告百分比
+        if self.isInterruptionRequested():
+            raise LookupCancelled()
+        if total_rows is not None:
+            self.progress_update.emit(int(done_rows / total_rows * 100) if total_rows else 100)
+        self.stage_progress.emit(stage, done_rows, -1 if total_rows is None else total_rows)
+
+    def run(self):
+        self.timer.start_profile()
+        try:
+            output_path, rows = out_of_core_vlookup(
+                self.main_source, self.main_column, self.lookup_sources, self.return_columns, self.output_path,
+                memory_budget=self.memory_budget, chunk_rows=self.chunk_rows, key_rules=self.key_rules,
+                progress_callback=self.report_progress, timer=self.timer, na_rep=self.na_rep,
+                xlsx_keep_empty=self.xlsx_keep_empty)
+            self.timer.stop_profile()
             self.progress_update.emit(100)
+            self.output_ready.emit(output_path, rows)
+        except LookupCancelled:
+            self.lookup_cancelled.emit()
+        except Exception as e:
+            self.error_occurred.emit(str(e))
+        finally:
+            self.timer.stop_profile()
+
+class FileLoadThread(QThread):
+    progress_update = pyqtSignal(str, int)
+    load_finished = pyqtSignal(str, dict, bool, object)
+    error_occurred = pyqtSignal(str, str)
+    load_cancelled = pyqtSignal(str)
+
+    def __init__(self, file_path, parse_cache=None):
+        super().__init__()
+        self.file_path = file_path
+        self.parse_cache = parse_cache
+
+    def report_progress(self, percent):
+        if self.isInterruptionRequested():
+            raise LoadCancelled()
+        self.progress_update.emit(self.file_path, percent)
+
+    def run(self):
+        timer = StageTimer(f"加载文件 {os.path.basename(self.file_path)}")
+        try:
+            scan = None
+            if self.parse_cache is not None:
+                with timer.stage("读取扫描缓存"):
+                    scan = self.parse_cache.load_scan(self.file_path)
+            from_cache = scan is not None
+            if scan is None:
+                with timer.stage("扫描工作簿"):
+                    scan = scan_workbook(self.file_path, progress_callback=self.report_progress)
+                if self.parse_cache is not None:
+                    with timer.stage("写入扫描缓存"):
+                        self.parse_cache.save_scan(self.file_path, scan)
+            if self.isInterruptionRequested():
+                raise LoadCancelled()
+            self.load_finished.emit(self.file_path, scan, from_cache, timer.finish())
+        except LoadCancelled:
+            self.load_cancelled.emit(self.file_path)
+        except Exception as e:
+            self.error_occurred.emit(self.file_path, str(e))
+
+class ExportThread(QThread):
+    progress_update = pyqtSignal(int)
+    export_finished = pyqtSignal(str)
+    error_occurred = pyqtSignal(str)
+    export_cancelled = pyqtSignal()
+
+    def __init__(self, df, file_path, chunk_size=100000, pdf_max_rows=None, pdf_sample=False,
+                 na_rep=DEFAULT_NA_REP, xlsx_keep_empty=False):
+        super().__init__()
+        self.df = df
+        self.file_path = file_path
+        self.chunk_size = chunk_size
+        self.pdf_max_rows = pdf_max_rows
+        self.pdf_sample = pdf_sample
+        self.na_rep = na_rep
+        self.xlsx_keep_empty = xlsx_keep_empty
+        self.timer = StageTimer(f"导出 {os.path.basename(file_path)}")
+
+    def report_progress(self, rows_written, total_rows):
+        if self.isInterruptionRequested():
+            raise ExportCancelled()
+        self.progress_update.emit(int(rows_written / total_rows * 100) if total_rows else 100)
+
+    def run(self):
+        try:
+            with self.timer.stage("写出文件", len(self.df)):
+                file_path = export_dataframe(self.df, self.file_path, self.chunk_size, self.report_progress,
+                                             self.pdf_max_rows, self.pdf_sample, self.na_rep, self.xlsx_keep_empty)
+            self.export_finished.emit(file_path)
+        except ExportCancelled:
+            self.export_cancelled.emit()
+        except Exception as e:
+            self.error_occurred.emit(str(e))
+
+class ParseSheetsThread(QThread):
+    progress_update = pyqtSignal(int)
+    sheet_parsed = pyqtSignal(str, str, object, int, object)  # 文件, 工作表, 原始行, 检测到的表头行, 解析前的文件签名
+    error_occurred = pyqtSignal(str, str, str)
+
+    def __init__(self, jobs, workers=0, parse_cache=None, chunk_size=100000):
+        super().__init__()
+        self.jobs = jobs
+        self.workers = workers
+        self.parse_cache = parse_cache
+        self.chunk_size = chunk_size
+
+    def run(self):
+        # 解析结果写到缓存目录（或临时目录）中，主进程只读取列文件；放在缓存目录下可使移入缓存只是一次重命名
+        work_root = self.parse_cache.cache_dir if self.parse_cache is not None else None
+        if work_root is not None:
+            os.makedirs(work_root, exist_ok=True)
+        work_dir = tempfile.mkdtemp(prefix='parse_', dir=work_root)
+        try:
+            workers = min(default_worker_count(self.workers), len(self.jobs))  # 按需解析时通常只有一两个工作表
+            results = parse_sheets_parallel(self.jobs, work_dir, workers, self.isInterruptionRequested,
+                                            self.chunk_size)
+            for done, (file_path, sheet_name, directory, frame_meta, error) in enumerate(results, start=1):
+                if error is not None:
+                    self.error_occurred.emit(file_path, sheet_name, error)
+                else:
+                    cached_dir = self.parse_cache.adopt_sheet(file_path, sheet_name, directory, frame_meta) \
+                        if self.parse_cache is not None else None
+                    if cached_dir is not None:
+                        df = read_frame(cached_dir, frame_meta, mmap=True)
+                    else:
+                        df = read_frame(directory, frame_meta)
+                    self.sheet_parsed.emit(file_path, sheet_name, df, frame_meta['detected_header'],
+                                           frame_meta['signature'])
+                self.progress_update.emit(int(done / len(self.jobs) * 100))
+        except LoadCancelled:
+            pass
+        except Exception as e:
+            self.error_occurred.emit("", "", str(e))
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
 
 class RecentFilesDialog(QDialog):
     def __init__(self, recent_files, parent=None):
@@ -0,0 +1,266 @@
+"""可重复的性能基准：加载、表头检测、查找、结果渲染和导出。
+
+用法:
+    python benchmarks/run_benchmarks.py --sizes 10000,100000 --output results.json
+    python benchmarks/run_benchmarks.py --quick --compare baseline.json --threshold 0.15
+
+所有数据由固定随机种子生成；结果以 JSON 写出，--compare 与保存的基线比较，出现回退时退出码为 1。
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import tempfile
+import configparser
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+from workbook_loader import scan_workbook, parse_sheet, apply_header, detect_header_row  # noqa: E402
+from lookup_engine import vlookup  # noqa: E402
+from result_exporter import export_dataframe, EXCEL_MAX_ROWS  # noqa: E402
+
+DEFAULT_SIZES = [10000, 100000, 1000000, 5000000]
+QUICK_SIZES = [10000, 50000]
+
+# 每个场景描述一组合成数据参数：列数、键基数（占行数比例）、查找表重复键比例、键类型
+SCENARIOS = [
+    {'name': 'numeric_keys', 'columns': 10, 'cardinality': 0.5, 'duplicate_ratio': 0.0, 'key_type': 'int'},
+    {'name': 'string_keys_dup', 'columns': 10, 'cardinality': 0.1, 'duplicate_ratio': 0.2, 'key_type': 'str'},
+    {'name': 'wide_string_keys', 'columns': 50, 'cardinality': 0.5, 'duplicate_ratio': 0.05, 'key_type': 'str'},
+]
+
+
+def make_keys(rng, count, cardinality, key_type):
+    values = rng.integers(0, max(1, cardinality), count)
+    if key_type == 'str':
+        return np.char.add('K', values.astype(str)).astype(object)
+    return values
+
+
+def make_tables(rows, scenario, seed=0):
+    # 生成主表和查找表；查找表的键覆盖主表约一半的键，并按 duplicate_ratio 加入重复键
+    rng = np.random.default_rng(seed)
+    cardinality = max(1, int(rows * scenario['cardinality']))
+    main = {'key': make_keys(rng, rows, cardinality, scenario['key_type'])}
+    for i in range(scenario['columns'] - 1):
+        main[f"m{i}"] = rng.random(rows) if i % 2 else rng.integers(0, 1000, rows)
+    main_df = pd.DataFrame(main)
+
+    lookup_rows = max(1, cardinality)
+    unique_keys = make_keys(np.random.default_rng(seed + 1), lookup_rows, cardinality * 2, scenario['key_type'])
+    duplicates = int(lookup_rows * scenario['duplicate_ratio'])
+    keys = np.concatenate([unique_keys, unique_keys[:duplicates]])
+    lookup = {'key': keys}
+    for i in range(scenario['columns'] - 1):
+        lookup[f"r{i}"] = rng.random(len(keys)) if i % 2 else np.char.add('v', rng.integers(0, 100, len(keys)).astype(str))
+    lookup_df = pd.DataFrame(lookup)
+    return main_df, lookup_df
+
+
+def write_workbook(df, path):
+    # 在数据前加两行标题，使表头检测有实际工作可做
+    from openpyxl import Workbook
+
+    workbook = Workbook(write_only=True)
+    worksheet = workbook.create_sheet('Data')
+    worksheet.append(['Benchmark report'])
+    worksheet.append([])
+    worksheet.append([str(col) for col in df.columns])
+    for row in df.astype(object).itertuples(index=False, name=None):
+        worksheet.append(row)
+    workbook.save(path)
+
+
+def timed(func, repeats):
+    timings = []
+    result = None
+    for _ in range(repeats):
+        started = time.perf_counter()
+        result = func()
+        timings.append(time.perf_counter() - started)
+    return min(timings), timings, result
+
+
+class BenchmarkSuite:
+    def __init__(self, sizes, scenarios, repeats, work_dir, formats, include_render=True):
+        self.sizes = sizes
+        self.scenarios = scenarios
+        self.repeats = repeats
+        self.work_dir = work_dir
+        self.formats = formats
+        self.include_render = include_render
+        self.results = []
+
+    def record(self, name, rows, scenario, seconds, timings, **extra):
+        entry = {'name': name, 'scenario': scenario['name'], 'rows': rows, 'seconds': seconds,
+                 'timings': timings, 'params': {k: v for k, v in scenario.items() if k != 'name'}}
+        entry.update(extra)
+        self.results.append(entry)
+        print(f"{name:<16} {scenario['name']:<18} {rows:>9} 行  {seconds:8.3f} 秒")
+
+    def run(self):
+        for scenario in self.scenarios:
+            for rows in self.sizes:
+                main_df, lookup_df = make_tables(rows, scenario)
+                self.bench_load(main_df, rows, scenario)
+                self.bench_join(main_df, lookup_df, rows, scenario)
+        return self.results
+
+    def bench_load(self, main_df, rows, scenario):
+        if rows + 3 > EXCEL_MAX_ROWS:
+            print(f"load             {scenario['name']:<18} {rows:>9} 行  跳过（超过 Excel 行数上限）")
+            return
+        path = os.path.join(self.work_dir, f"{scenario['name']}_{rows}.xlsx")
+        if not os.path.exists(path):
+            write_workbook(main_df, path)
+
+        def load():
+            scan = scan_workbook(path)
+            raw, header_row = parse_sheet(path, 'Data', detected_header=scan['Data']['detected_header'])
+            return apply_header(raw, header_row)
+
+        seconds, timings, df = timed(load, self.repeats)
+        self.record('load', rows, scenario, seconds, timings)
+        seconds, timings, _ = timed(lambda: detect_header_row(df), self.repeats)
+        self.record('detect_header', rows, scenario, seconds, timings)
+
+    def bench_join(self, main_df, lookup_df, rows, scenario):
+        return_columns = [col for col in lookup_df.columns if col != 'key']
+        seconds, timings, result = timed(
+            lambda: vlookup(main_df, 'key', [(lookup_df, 'key')], return_columns), self.repeats)
+        self.record('join', rows, scenario, seconds, timings, lookup_rows=len(lookup_df))
+        if self.include_render:
+            self.bench_render(result, rows, scenario)
+        self.bench_export(result, rows, scenario)
+
+    def bench_render(self, result, rows, scenario):
+        # 构建表格模型并格式化一屏可见单元格，与 display_dataframe 的工作量相同
+        from dataframe_model import DataFrameModel
+
+        def render():
+            model = DataFrameModel(result)
+            for row in range(min(50, model.rowCount())):
+                for col in range(model.columnCount()):
+                    model.data(model.index(row, col))
+            return model
+
+        seconds, timings, _ = timed(render, self.repeats)
+        self.record('render', rows, scenario, seconds, timings)
+
+    def bench_export(self, result, rows, scenario):
+        for export_format in self.formats:
+            if export_format == 'xlsx' and rows >= EXCEL_MAX_ROWS * 2:
+                continue  # 超大结果的 xlsx 导出耗时过长，只测到拆分为两个工作表的规模
+            path = os.path.join(self.work_dir, f"result.{export_format}")
+            seconds, timings, _ = timed(lambda: export_dataframe(result, path, pdf_max_rows=10000), 1)
+            self.record(f"export_{export_format}", rows, scenario, seconds, timings)
+            os.remove(path)
+
+
+def environment_info():
+    config = configparser.ConfigParser()
+    config.read(os.path.join(REPO_DIR, 'version.ini'))
+    return {
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'version': config.get('VERSION', 'current', fallback='v0.0.0'),
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        'numpy': np.__version__,
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+    }
+
+
+def result_key(entry):
+    return entry['name'], entry['scenario'], entry['rows']
+
+
+def compare(results, baseline, threshold, min_delta=0.01):
+    # 返回耗时超过基线 (1 + threshold) 倍且绝对差值超过 min_delta 秒的项目，避免毫秒级测量噪声误报
+    baseline_map = {result_key(entry): entry for entry in baseline['results']}
+    regressions = []
+    for entry in results:
+        base = baseline_map.get(result_key(entry))
+        if base is None or base['seconds'] <= 0:
+            continue
+        ratio = entry['seconds'] / base['seconds']
+        regressed = ratio > 1 + threshold and entry['seconds'] - base['seconds'] > min_delta
+        status = "回退" if regressed else ("提升" if ratio < 1 - threshold else "持平")
+        print(f"{status} {entry['name']:<16} {entry['scenario']:<18} {entry['rows']:>9} 行  "
+              f"{base['seconds']:.3f} -> {entry['seconds']:.3f} 秒 ({ratio:.2f}x)")
+        if regressed:
+            regressions.append({'key': list(result_key(entry)), 'baseline': base['seconds'],
+                                'current': entry['seconds'], 'ratio': ratio})
+    return regressions
+
+
+def render_available():
+    try:
+        os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+        from PyQt6.QtWidgets import QApplication
+        QApplication.instance() or QApplication([])
+        return True
+    except Exception:
+        return False
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="高级VLOOKUP工具性能基准")
+    parser.add_argument('--sizes', help="逗号分隔的行数列表，默认 10000,100000,1000000,5000000")
+    parser.add_argument('--quick', action='store_true', help="只运行小规模数据")
+    parser.add_argument('--scenarios', help="逗号分隔的场景名称，默认全部")
+    parser.add_argument('--formats', default='csv,xlsx,pdf', help="要测试的导出格式")
+    parser.add_argument('--repeats', type=int, default=3, help="每项重复次数，取最短时间")
+    parser.add_argument('--output', default='benchmark_results.json', help="结果 JSON 文件")
+    parser.add_argument('--compare', help="与之比较的基线 JSON 文件")
+    parser.add_argument('--threshold', type=float, default=0.1, help="判定为回退的相对变慢比例")
+    parser.add_argument('--min-delta', type=float, default=0.01, help="判定为回退的最小绝对变慢秒数")
+    parser.add_argument('--work-dir', help="存放生成的工作簿的目录，默认使用临时目录")
+    args = parser.parse_args(argv)
+
+    sizes = QUICK_SIZES if args.quick else DEFAULT_SIZES
+    if args.sizes:
+        sizes = [int(size) for size in args.sizes.split(',')]
+    scenarios = SCENARIOS
+    if args.scenarios:
+        names = set(args.scenarios.split(','))
+        scenarios = [scenario for scenario in SCENARIOS if scenario['name'] in names]
+
+    include_render = render_available()
+    if not include_render:
+        print("未安装 PyQt6 或无法创建 QApplication，跳过渲染基准")
+
+    work_dir = args.work_dir or tempfile.mkdtemp(prefix='vlookup_bench_')
+    os.makedirs(work_dir, exist_ok=True)
+    try:
+        suite = BenchmarkSuite(sizes, scenarios, args.repeats, work_dir, args.formats.split(','), include_render)
+        results = suite.run()
+    finally:
+        if not args.work_dir:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    report = {'environment': environment_info(), 'results': results}
+    exit_code = 0
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        report['baseline'] = {'file': args.compare, 'environment': baseline.get('environment')}
+        report['regressions'] = compare(results, baseline, args.threshold, args.min_delta)
+        exit_code = 1 if report['regressions'] else 0
+
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"结果已写入 {args.output}")
+    return exit_code
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,82 @@
+import bisect
+import numpy as np
+import pandas as pd
+from PyQt6.QtCore import Qt, QAbstractTableModel, QModelIndex
+
+
+class DataFrameModel(QAbstractTableModel):
+    # 直接基于 DataFrame 列数组的只读表格模型：只格式化可见单元格，并按批次惰性加载行
+    # total_rows 大于 df 的行数时 df 只是开头的若干行，其余行在滚动到时由 row_loader(起始行, 结束行) 分段读取
+    fetch_batch_size = 1000
+    load_batch_size = 50000  # row_loader 每次读取的行数
+
+    def __init__(self, df, parent=None, na_rep=None, total_rows=None, row_loader=None):
+        super().__init__(parent)
+        self.df = df
+        self.na_rep = na_rep  # 缺失值的显示文本，None 表示按原值显示
+        self.row_loader = row_loader
+        self.blocks = [self.column_arrays(df)]  # 已读取的各段行的列数组
+        self.block_starts = [0]
+        self.available_rows = df.shape[0]
+        self.headers = [str(col) for col in df.columns]
+        self.total_rows = df.shape[0] if total_rows is None else total_rows
+        self.loaded_rows = min(self.fetch_batch_size, self.available_rows)
+
+    @staticmethod
+    def column_arrays(df):
+        # 可空整数、日期等扩展类型直接引用其数组，避免整列转换为对象数组
+        columns = []
+        for i in range(df.shape[1]):
+            column = df.iloc[:, i]
+            columns.append(column.to_numpy() if isinstance(column.dtype, np.dtype) else column.array)
+        return columns
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else self.loaded_rows
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.headers)
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid() or role not in (Qt.ItemDataRole.DisplayRole, Qt.ItemDataRole.ToolTipRole):
+            return None
+        row = index.row()
+        block = bisect.bisect_right(self.block_starts, row) - 1
+        return self.format_value(self.blocks[block][index.column()][row - self.block_starts[block]])
+
+    def format_value(self, value):
+        if self.na_rep is not None and pd.api.types.is_scalar(value) and pd.isna(value):
+            return self.na_rep
+        return str(value)
+
+    def headerData(self, section, orientation, role=Qt.ItemDataRole.DisplayRole):
+        if role != Qt.ItemDataRole.DisplayRole:
+            return None
+        if orientation == Qt.Orientation.Horizontal:
+            return self.headers[section] if section < len(self.headers) else None
+        return str(section + 1)
+
+    def canFetchMore(self, parent=QModelIndex()):
+        return not parent.isValid() and self.loaded_rows < self.total_rows
+
+    def fetchMore(self, parent=QModelIndex()):
+        if parent.isValid():
+            return
+        while self.row_loader is not None and self.available_rows < min(self.loaded_rows + self.fetch_batch_size,
+                                                                         self.total_rows):
+            self.load_rows()
+        count = min(self.fetch_batch_size, self.available_rows - self.loaded_rows)
+        if count <= 0:
+            return
+        self.beginInsertRows(QModelIndex(), self.loaded_rows, self.loaded_rows + count - 1)
+        self.loaded_rows += count
+        self.endInsertRows()
+
+    def load_rows(self):
+        df = self.row_loader(self.available_rows, min(self.available_rows + self.load_batch_size, self.total_rows))
+        if len(df) == 0:
+            self.total_rows = self.available_rows  # 数据来源的行数少于声明的行数
+            return
+        self.block_starts.append(self.available_rows)
+        self.blocks.append(self.column_arrays(df))
+        self.available_rows += len(df)
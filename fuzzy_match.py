@@ -0,0 +1,163 @@
+import numpy as np
+import pandas as pd
+
+from key_normalizer import DEFAULT_RULES, encode_keys, expand_codes, keys_as_text
+
+
+class FuzzyMatch:
+    """模糊匹配选项。
+
+    threshold 为最低相似度（0~1，字符三元组的 Dice 系数）；probe_grams 为每个键用于检索候选的最稀有三元组数量；
+    max_postings 为出现在过多键中的三元组的上限，这类三元组不用于检索候选；max_candidates 为每个键参与评分的候选数。
+    """
+
+    def __init__(self, threshold=0.8, probe_grams=8, max_postings=5000, max_candidates=20, chunk_size=20000):
+        self.threshold = threshold
+        self.probe_grams = probe_grams
+        self.max_postings = max_postings
+        self.max_candidates = max_candidates
+        self.chunk_size = chunk_size
+
+    def signature(self):
+        # 用于匹配结果缓存键；chunk_size 只影响分块，不影响结果
+        return ('fuzzy', self.threshold, self.probe_grams, self.max_postings, self.max_candidates)
+
+
+def _gram_lists(texts):
+    # 每个文本的字符三元组集合，前后补空格使首尾字符也能形成三元组
+    grams = []
+    for text in texts:
+        padded = f"  {text} "
+        grams.append(list(dict.fromkeys(padded[i:i + 3] for i in range(len(padded) - 2))))
+    return grams
+
+
+def _flatten(gram_lists):
+    counts = np.fromiter((len(grams) for grams in gram_lists), dtype=np.int64, count=len(gram_lists))
+    owners = np.repeat(np.arange(len(gram_lists), dtype=np.int64), counts)
+    flat = [gram for grams in gram_lists for gram in grams]
+    return flat, owners, counts
+
+
+def _expand(starts, lengths):
+    # 把若干 [start, start + length) 区间展开为一个位置数组
+    total = int(lengths.sum())
+    if total == 0:
+        return np.empty(0, dtype=np.int64)
+    offsets = np.repeat(starts - np.concatenate(([0], np.cumsum(lengths)[:-1])), lengths)
+    return offsets + np.arange(total, dtype=np.int64)
+
+
+def _top_per_group(groups, scores, limit):
+    # 返回每组得分最高的前 limit 项的位置（组内按得分降序、位置升序）
+    order = np.lexsort((np.arange(len(groups)), -scores, groups))
+    sorted_groups = groups[order]
+    group_starts = np.flatnonzero(np.r_[True, sorted_groups[1:] != sorted_groups[:-1]])
+    ranks = np.arange(len(order)) - np.repeat(group_starts, np.diff(np.r_[group_starts, len(order)]))
+    return order[ranks < limit]
+
+
+class FuzzyIndex:
+    # 查找键的三元组倒排索引：每个三元组 -> 包含它的唯一键；另保存 (键, 三元组) 的有序编码用于精确评分
+
+    def __init__(self, texts, positions, rules=DEFAULT_RULES):
+        self.texts = pd.Index(texts)
+        self.positions = np.asarray(positions, dtype=np.int64)
+        self.rules = rules
+        flat, owners, self.gram_counts = _flatten(_gram_lists(texts))
+        gram_codes, vocabulary = pd.factorize(pd.Index(flat, dtype=object))
+        self.vocabulary = pd.Index(vocabulary)
+        order = np.argsort(gram_codes, kind='stable')
+        self.postings = owners[order]
+        self.document_frequency = np.bincount(gram_codes, minlength=len(vocabulary)).astype(np.int64)
+        self.posting_starts = np.concatenate(([0], np.cumsum(self.document_frequency)[:-1]))
+        self.key_grams = np.sort(owners * len(vocabulary) + gram_codes)
+
+    @classmethod
+    def build(cls, key_values, rules=DEFAULT_RULES):
+        codes, uniques, kind = encode_keys(key_values, rules)
+        valid = codes >= 0
+        _, first_positions = np.unique(codes[valid], return_index=True)
+        first_positions = np.flatnonzero(valid)[first_positions]
+        return cls(keys_as_text(uniques, kind, rules), first_positions, rules)
+
+    def __len__(self):
+        return len(self.texts)
+
+    def match_texts(self, texts, options, progress_callback=None):
+        """返回每个文本的最佳匹配 (查找表行位置, 相似度)，低于阈值或没有候选时位置为 -1。
+
+        需要评分的文本按 options.chunk_size 个一批处理，每批之后调用 progress_callback(已处理文本数, 文本总数)，
+        回调可抛出异常以在批之间中止。
+        """
+        texts = np.asarray(texts, dtype=object)
+        positions = np.full(len(texts), -1, dtype=np.int64)
+        scores = np.full(len(texts), np.nan)
+        if len(texts) == 0 or len(self.texts) == 0:
+            return positions, scores
+
+        # 完全相同的键直接匹配，相似度为 1
+        exact = self.texts.get_indexer(texts)
+        positions[exact >= 0] = self.positions[exact[exact >= 0]]
+        scores[exact >= 0] = 1.0
+        pending = np.flatnonzero(exact < 0)
+        if progress_callback is not None:
+            progress_callback(len(texts) - len(pending), len(texts))
+        for start in range(0, len(pending), options.chunk_size):
+            chunk = pending[start:start + options.chunk_size]
+            best_keys, best_scores = self._match_chunk(texts[chunk], options)
+            matched = best_keys >= 0
+            positions[chunk[matched]] = self.positions[best_keys[matched]]
+            scores[chunk[matched]] = best_scores[matched]
+            if progress_callback is not None:
+                progress_callback(len(texts) - len(pending) + start + len(chunk), len(texts))
+        return positions, scores
+
+    def _match_chunk(self, texts, options):
+        best_keys = np.full(len(texts), -1, dtype=np.int64)
+        best_scores = np.zeros(len(texts))
+        flat, owners, gram_counts = _flatten(_gram_lists(texts))
+        gram_ids = self.vocabulary.get_indexer(pd.Index(flat, dtype=object))
+        known = gram_ids >= 0
+        owners, gram_ids = owners[known], gram_ids[known]
+
+        # 每个键用最稀有的若干三元组检索候选，过于常见的三元组不参与检索
+        frequency = self.document_frequency[gram_ids]
+        usable = frequency <= options.max_postings
+        probes = _top_per_group(owners[usable], -frequency[usable].astype(np.float64), options.probe_grams)
+        probe_owners = owners[usable][probes]
+        probe_grams = gram_ids[usable][probes]
+        lengths = self.document_frequency[probe_grams]
+        candidates = self.postings[_expand(self.posting_starts[probe_grams], lengths)]
+        if len(candidates) == 0:
+            return best_keys, best_scores
+        pairs, hits = np.unique(np.repeat(probe_owners, lengths) * len(self.texts) + candidates, return_counts=True)
+        pair_owners, pair_keys = np.divmod(pairs, len(self.texts))
+        kept = _top_per_group(pair_owners, hits.astype(np.float64), options.max_candidates)
+        pair_owners, pair_keys = pair_owners[kept], pair_keys[kept]
+
+        # 精确评分：统计每个候选对共有的三元组数，计算 Dice 系数 2|A∩B| / (|A| + |B|)
+        owner_starts = np.concatenate(([0], np.cumsum(np.bincount(owners, minlength=len(texts)))[:-1]))
+        owner_lengths = np.bincount(owners, minlength=len(texts))
+        pair_index = np.repeat(np.arange(len(pair_owners)), owner_lengths[pair_owners])
+        grams = gram_ids[_expand(owner_starts[pair_owners], owner_lengths[pair_owners])]
+        codes = pair_keys[pair_index] * len(self.vocabulary) + grams
+        found = np.searchsorted(self.key_grams, codes)
+        found = (found < len(self.key_grams)) & (self.key_grams[np.minimum(found, len(self.key_grams) - 1)] == codes)
+        shared = np.bincount(pair_index, weights=found, minlength=len(pair_owners))
+        similarity = 2 * shared / (gram_counts[pair_owners] + self.gram_counts[pair_keys])
+
+        best = _top_per_group(pair_owners, similarity, 1)
+        accepted = best[similarity[best] >= options.threshold]
+        best_keys[pair_owners[accepted]] = pair_keys[accepted]
+        best_scores[pair_owners[accepted]] = similarity[accepted]
+        return best_keys, best_scores
+
+    def match_uniques(self, uniques, kind, options, progress_callback=None):
+        # 返回每个主表唯一键的 (查找表行位置, 相似度)
+        return self.match_texts(keys_as_text(uniques, kind, self.rules), options, progress_callback)
+
+    def resolve_encoded(self, codes, uniques, kind, options):
+        # 只对主表唯一键做模糊匹配，再按编码展开到每一行；返回 (行位置, 相似度)
+        unique_positions, unique_scores = self.match_uniques(uniques, kind, options)
+        return expand_codes(codes, unique_positions), expand_codes(codes, unique_scores, np.nan)
@@ -0,0 +1,94 @@
+import os
+import hashlib
+import logging
+import numpy as np
+
+from lookup_engine import LookupIndex
+from key_normalizer import DEFAULT_RULES, KIND_TEXT
+
+INDEX_FORMAT_VERSION = 2  # 索引保存格式或键规范化方式变化时递增，使旧缓存失效
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser('~'), '.advanced_vlookup_tool', 'index_cache')
+
+
+class IndexCache:
+    # 查找表键索引的磁盘缓存，按文件路径、工作表、查找列、表头行、键比较规则及文件修改时间/大小区分，按总大小做 LRU 淘汰
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_bytes=512 * 1024 * 1024):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+
+    def cache_key(self, file_path, sheet_name, lookup_column, header_row, signature, rules=DEFAULT_RULES):
+        # signature 为读取工作表数据之前记录的 file_signature，而不是现在的文件状态：
+        # 数据读入后源文件被修改时，按旧数据建立的索引不会以新文件的修改时间/大小保存；未知时不使用缓存
+        if signature is None:
+            return None
+        parts = [os.path.abspath(file_path), str(sheet_name), str(lookup_column), str(header_row),
+                 str(signature['mtime_ns']), str(signature['size']), rules.signature(), str(INDEX_FORMAT_VERSION)]
+        return hashlib.sha1('\x1f'.join(parts).encode('utf-8')).hexdigest()
+
+    def _entry_path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.npz")
+
+    def get(self, key, expected_rows=None, rules=DEFAULT_RULES):
+        if key is None:
+            return None
+        path = self._entry_path(key)
+        if not os.path.exists(path):
+            return None
+        try:
+            with np.load(path, allow_pickle=False) as entry:
+                if expected_rows is not None and int(entry['rows']) != expected_rows:
+                    return None
+                keys = entry['keys']
+                kind = str(entry['kind'])
+                index = LookupIndex(keys.astype(object) if kind == KIND_TEXT else keys, entry['positions'], kind, rules)
+            os.utime(path)  # 更新访问时间，用于 LRU 淘汰
+            return index
+        except Exception as e:
+            logging.warning(f"读取索引缓存 {path} 失败: {str(e)}")
+            return None
+
+    def put(self, key, index, rows):
+        if key is None:
+            return
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            path = self._entry_path(key)
+            tmp_path = path + '.tmp'
+            with open(tmp_path, 'wb') as f:
+                keys = index.keys.to_numpy()
+                np.savez(f, keys=keys.astype(str) if index.kind == KIND_TEXT else keys, positions=index.positions,
+                         kind=np.str_(index.kind), rows=np.int64(rows))
+            os.replace(tmp_path, path)
+            self.evict()
+        except Exception as e:
+            logging.warning(f"写入索引缓存失败: {str(e)}")
+
+    def get_or_build(self, key, key_values, rules=DEFAULT_RULES):
+        index = self.get(key, expected_rows=len(key_values), rules=rules)
+        if index is None:
+            index = LookupIndex.build(key_values, rules)
+            self.put(key, index, len(key_values))
+        return index
+
+    def evict(self):
+        if not os.path.isdir(self.cache_dir):
+            return
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if name.endswith('.npz'):
+                stat = os.stat(os.path.join(self.cache_dir, name))
+                entries.append((stat.st_mtime, stat.st_size, name))
+        total = sum(size for _, size, _ in entries)
+        for _, size, name in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            os.remove(os.path.join(self.cache_dir, name))
+            total -= size
+
+    def clear(self):
+        if os.path.isdir(self.cache_dir):
+            for name in os.listdir(self.cache_dir):
+                if name.endswith('.npz'):
+                    os.remove(os.path.join(self.cache_dir, name))
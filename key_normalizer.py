@@ -0,0 +1,174 @@
+import datetime
+import unicodedata
+import numpy as np
+import pandas as pd
+
+# 键的原生类型：整数、浮点数、日期（datetime64[ns]）和规范化后的字符串
+KIND_INT = 'int'
+KIND_FLOAT = 'float'
+KIND_DATE = 'date'
+KIND_TEXT = 'text'
+NUMERIC_KINDS = (KIND_INT, KIND_FLOAT)
+
+_MAX_EXACT_INT = 2 ** 53  # float64 能精确表示的最大整数
+
+
+class KeyRules:
+    """查找键的比较规则。
+
+    trim 去除首尾空白；casefold 忽略大小写；fold_width 把全角字母、数字和符号折叠为半角（NFKC）；
+    canonical_numbers 把整数值的浮点数视为整数，使 1 与 1.0 匹配。
+    """
+
+    def __init__(self, trim=True, casefold=False, fold_width=False, canonical_numbers=True):
+        self.trim = trim
+        self.casefold = casefold
+        self.fold_width = fold_width
+        self.canonical_numbers = canonical_numbers
+
+    @classmethod
+    def from_dict(cls, values):
+        values = values or {}
+        return cls(**{name: bool(values[name]) for name in ('trim', 'casefold', 'fold_width', 'canonical_numbers')
+                      if name in values})
+
+    def to_dict(self):
+        return {'trim': self.trim, 'casefold': self.casefold, 'fold_width': self.fold_width,
+                'canonical_numbers': self.canonical_numbers}
+
+    def signature(self):
+        # 用于索引缓存键，规则不同的索引不能混用
+        return ''.join('1' if value else '0' for value in self.to_dict().values())
+
+    def __eq__(self, other):
+        return isinstance(other, KeyRules) and self.to_dict() == other.to_dict()
+
+    def __repr__(self):
+        return f"KeyRules({', '.join(f'{k}={v}' for k, v in self.to_dict().items())})"
+
+
+DEFAULT_RULES = KeyRules()
+
+
+def _number_text(value, canonical=True):
+    # 数字的规范文本：canonical 时整数值的浮点数不带小数部分
+    if canonical and isinstance(value, (float, np.floating)) and value.is_integer() and abs(value) < _MAX_EXACT_INT:
+        return str(int(value))
+    return str(value)
+
+
+def _date_text(value):
+    value = pd.Timestamp(value)
+    return value.strftime('%Y-%m-%d') if value == value.normalize() else value.isoformat()
+
+
+def _value_text(value, canonical=True):
+    if isinstance(value, str):
+        return value
+    if isinstance(value, (bool, np.bool_)):
+        return str(bool(value))
+    if isinstance(value, (int, float, np.integer, np.floating)):
+        return _number_text(value, canonical)
+    if isinstance(value, (pd.Timestamp, np.datetime64, datetime.date)):
+        return _date_text(value)
+    return str(value)
+
+
+def _texts(values, canonical=True):
+    return np.frompyfunc(lambda value: _value_text(value, canonical), 1, 1)(np.asarray(values, dtype=object))
+
+
+def _apply_text_rules(texts, rules):
+    texts = pd.Series(texts, dtype=object)
+    if rules.fold_width:
+        texts = texts.map(lambda text: unicodedata.normalize('NFKC', text))
+    if rules.trim:
+        texts = texts.str.strip()
+    if rules.casefold:
+        texts = texts.str.casefold()
+    texts = np.array(texts, dtype=object)
+    texts[texts == ''] = None  # 空键不参与匹配
+    return texts
+
+
+def _canonical_numbers(uniques, rules):
+    # 浮点键全部为整数值时转为 int64，避免 1.0 与 1 被当作不同的键
+    if uniques.dtype.kind in 'iu':
+        return uniques.astype(np.int64), KIND_INT
+    values = uniques.astype(np.float64)
+    if rules.canonical_numbers and np.all(np.mod(values, 1) == 0) and np.all(np.abs(values) < _MAX_EXACT_INT):
+        return values.astype(np.int64), KIND_INT
+    return values, KIND_FLOAT
+
+
+def _refactorize(codes, uniques):
+    # 规范化后的多个原始键可能合并为同一个键，重新编码并映射原来的编码
+    new_codes, new_uniques = pd.factorize(uniques)
+    codes = expand_codes(codes, new_codes.astype(np.int64))
+    return codes, np.asarray(new_uniques, dtype=uniques.dtype)
+
+
+def encode_keys(values, rules=DEFAULT_RULES):
+    """把一列键字典编码为整数编码，返回 (codes, uniques, kind)。
+
+    codes 为每行在 uniques 中的位置，缺失或空键为 -1；uniques 为规范化后的原生类型键（int64、float64、
+    datetime64 或字符串）。先对原始值编码，规则只作用在唯一值上，输入数据不会被修改。
+    """
+    series = values if isinstance(values, pd.Series) else pd.Series(values)
+    codes, uniques = pd.factorize(series)
+    codes = codes.astype(np.int64)
+    uniques = np.asarray(uniques)
+    dtype = series.dtype
+
+    if pd.api.types.is_numeric_dtype(dtype) and not pd.api.types.is_bool_dtype(dtype):
+        return (codes, *_canonical_numbers(uniques, rules))
+    if pd.api.types.is_datetime64_dtype(dtype):
+        return codes, uniques.astype('datetime64[ns]'), KIND_DATE
+
+    uniques = uniques.astype(object)
+    inferred = pd.api.types.infer_dtype(uniques, skipna=True) if len(uniques) else 'string'
+    if inferred in ('integer', 'floating', 'mixed-integer-float'):
+        return (codes, *_canonical_numbers(uniques.astype(np.float64), rules))
+    if inferred in ('datetime', 'datetime64', 'date'):
+        try:
+            dates = np.asarray(pd.to_datetime(uniques).tz_localize(None), dtype='datetime64[ns]')
+            return (*_refactorize(codes, dates), KIND_DATE)
+        except (ValueError, TypeError):
+            pass
+
+    texts = uniques if inferred == 'string' else _texts(uniques, rules.canonical_numbers)
+    texts = _apply_text_rules(texts, rules)
+    return (*_refactorize(codes, texts), KIND_TEXT)
+
+
+def expand_codes(codes, unique_values, fill=-1):
+    # 把按唯一键计算的结果按编码展开到每一行，缺失键（编码 -1）填充为 fill
+    if len(unique_values) == 0:
+        return np.full(len(codes), fill, dtype=np.asarray(unique_values).dtype)
+    return np.where(codes >= 0, unique_values.take(np.maximum(codes, 0)), fill)
+
+
+def keys_as_text(uniques, kind, rules=DEFAULT_RULES):
+    # 不同类型的键比较时统一转为规范文本（文本键已按规则规范化）
+    if kind == KIND_TEXT:
+        return uniques
+    if kind == KIND_DATE:
+        return np.asarray([_date_text(value) for value in uniques], dtype=object)
+    return _apply_text_rules(_texts(uniques, rules.canonical_numbers), rules)
+
+
+def common_kind(left_kind, right_kind, rules=DEFAULT_RULES):
+    # 整数和浮点键按数值比较；canonical_numbers 关闭时按文本比较，1 与 1.0 不匹配
+    if left_kind == right_kind:
+        return left_kind
+    if left_kind in NUMERIC_KINDS and right_kind in NUMERIC_KINDS and rules.canonical_numbers:
+        return KIND_FLOAT
+    return KIND_TEXT
+
+
+def keys_as_kind(uniques, kind, target_kind, rules=DEFAULT_RULES):
+    if kind == target_kind:
+        return uniques
+    if target_kind == KIND_FLOAT:
+        return np.asarray(uniques, dtype=np.float64)
+    return keys_as_text(uniques, kind, rules)
@@ -0,0 +1,424 @@
+from functools import partial
+
+import numpy as np
+import pandas as pd
+
+from run_timing import timed_stage
+from key_normalizer import DEFAULT_RULES, KIND_TEXT, encode_keys, expand_codes, keys_as_kind, common_kind
+from fuzzy_match import FuzzyIndex, FuzzyMatch
+from range_match import RangeMatch, SortedKeyIndex
+
+
+class LookupCancelled(Exception):
+    pass
+
+
+class LookupIndex:
+    # 查找表的键索引：每个唯一键 -> 该键第一次出现的行位置（与 Excel VLOOKUP 一致的首个匹配语义）
+    # 键按 KeyRules 规范化为原生类型（整数、浮点数、日期或文本）后保存
+
+    def __init__(self, keys, positions, kind=KIND_TEXT, rules=DEFAULT_RULES):
+        self.keys = keys if isinstance(keys, pd.Index) else pd.Index(keys)
+        self.positions = np.asarray(positions, dtype=np.int64)
+        self.kind = kind
+        self.rules = rules
+        self._converted_keys = {}
+
+    @classmethod
+    def build(cls, key_values, rules=DEFAULT_RULES):
+        codes, uniques, kind = encode_keys(key_values, rules)
+        # 编码按出现顺序分配，np.unique 的 return_index 即每个键的首次出现位置
+        valid = codes >= 0
+        _, first_positions = np.unique(codes[valid], return_index=True)
+        first_positions = np.flatnonzero(valid)[first_positions]
+        return cls(uniques, first_positions, kind, rules)
+
+    def __len__(self):
+        return len(self.keys)
+
+    @property
+    def nbytes(self):
+        return int(self.keys.memory_usage(deep=True) + self.positions.nbytes)
+
+    def _keys_as(self, kind):
+        # 与不同类型的主表键比较时，把索引键转换为共同类型（按类型缓存）
+        if kind == self.kind:
+            return self.keys
+        if kind not in self._converted_keys:
+            self._converted_keys[kind] = pd.Index(keys_as_kind(self.keys.to_numpy(), self.kind, kind, self.rules))
+        return self._converted_keys[kind]
+
+    def match(self, uniques, kind):
+        # 返回每个主表唯一键对应的查找表行位置，未匹配为 -1；查找表为空或键全部为空白时全部未匹配
+        if len(self.positions) == 0:
+            return np.full(len(uniques), -1, dtype=np.int64)
+        target = common_kind(self.kind, kind, self.rules)
+        codes = self._keys_as(target).get_indexer(keys_as_kind(uniques, kind, target, self.rules))
+        return np.where(codes >= 0, self.positions.take(np.maximum(codes, 0)), -1)
+
+    def resolve(self, main_values):
+        # 返回主表每一行对应的查找表行位置，未匹配为 -1
+        return self.resolve_encoded(*encode_keys(main_values, self.rules))
+
+    def resolve_encoded(self, codes, uniques, kind):
+        # 主表键已编码为整数，只需匹配唯一键，再按编码展开到每一行
+        if len(uniques) == 0:
+            return np.full(len(codes), -1, dtype=np.int64)
+        return expand_codes(codes, self.match(uniques, kind))
+
+
+class CompositeIndex:
+    # 多列组合键索引：每列先字典编码为整数，再逐列把 (已合并编码, 本列编码) 合成一个整数并重新编码，
+    # 全程只处理整数数组，不拼接字符串；最终每个组合键 -> 第一次出现的行位置
+
+    def __init__(self, column_indexes, steps, positions, rules=DEFAULT_RULES):
+        self.column_indexes = column_indexes  # 每列的 LookupIndex：唯一键 -> 该列编码
+        self.steps = steps  # 第 2 列起每一步合并后的唯一整数编码（pd.Index）
+        self.positions = np.asarray(positions, dtype=np.int64)
+        self.rules = rules
+
+    @classmethod
+    def build(cls, key_columns, rules=DEFAULT_RULES):
+        column_indexes, steps = [], []
+        combined = None
+        for values in key_columns:
+            codes, uniques, kind = encode_keys(values, rules)
+            column_indexes.append(LookupIndex(uniques, np.arange(len(uniques)), kind, rules))
+            if combined is None:
+                combined = codes
+                continue
+            valid = (combined >= 0) & (codes >= 0)
+            step_codes, step_uniques = pd.factorize(combined[valid] * len(uniques) + codes[valid])
+            combined = np.full(len(codes), -1, dtype=np.int64)
+            combined[valid] = step_codes
+            steps.append(pd.Index(step_uniques))
+        valid = combined >= 0
+        _, first_positions = np.unique(combined[valid], return_index=True)
+        return cls(column_indexes, steps, np.flatnonzero(valid)[first_positions], rules)
+
+    def __len__(self):
+        return len(self.positions)
+
+    def match_columns(self, encoded_columns):
+        # encoded_columns 为主表各键列的 encode_keys 结果；返回每列主表唯一键在查找表该列中的编码，没有的为 -1
+        return [column_index.match(uniques, kind) if len(uniques) else np.empty(0, dtype=np.int64)
+                for column_index, (_, uniques, kind) in zip(self.column_indexes, encoded_columns)]
+
+    def resolve_encoded(self, encoded_columns):
+        # 先把每列映射到查找表该列的编码，再按建索引时相同的步骤合并
+        column_codes = [expand_codes(codes, unique_codes)
+                        for (codes, _, _), unique_codes in zip(encoded_columns, self.match_columns(encoded_columns))]
+        return self.resolve_codes(column_codes)
+
+    def resolve_codes(self, column_codes):
+        # column_codes 为每行在查找表各键列中的编码
+        if len(self.positions) == 0:
+            return np.full(len(column_codes[0]), -1, dtype=np.int64)
+        combined = None
+        for column_index, step, codes in zip(self.column_indexes, [None] + self.steps, column_codes):
+            if combined is None:
+                combined = codes
+                continue
+            valid = (combined >= 0) & (codes >= 0)
+            combined = np.where(valid, combined * len(column_index) + codes, -1)
+            combined[valid] = step.get_indexer(combined[valid])
+        return np.where(combined >= 0, self.positions.take(np.maximum(combined, 0)), -1)
+
+
+def key_columns(column):
+    # 键列可以是单个列名，也可以是组合键的列名列表
+    return list(column) if isinstance(column, (list, tuple)) else [column]
+
+
+def _fillable_array(column, positions):
+    # 整数和布尔列在有缺失（-1 位置）时转为可空类型，保持原有数据类型
+    column = column if isinstance(column, pd.Series) else pd.Series(column)
+    dtype = column.dtype
+    if isinstance(dtype, np.dtype) and dtype.kind in 'iub' and (positions < 0).any():
+        nullable = {'b': 'boolean', 'i': f"Int{dtype.itemsize * 8}", 'u': f"UInt{dtype.itemsize * 8}"}[dtype.kind]
+        column = column.astype(nullable)
+    return column.array
+
+
+def match_cache_key(match_cache, table_versions, table, main_column, lookup_column, rules, options, rows):
+    # 第 table 个查找表的匹配结果缓存键；vlookup 和预先准备索引的调用方共用，不缓存时为 None
+    if match_cache is None or table_versions is None:
+        return None
+    return match_cache.cache_key(table_versions[0], key_columns(main_column), table_versions[1][table],
+                                 key_columns(lookup_column), rules, options, rows)
+
+
+def gather(column, positions):
+    # 按行位置向量化取值，-1 位置填充为缺失值
+    return _fillable_array(column, positions).take(positions, allow_fill=True)
+
+
+def _gather_chunks(column, positions, chunk_rows, progress):
+    # 与 gather 结果相同，但按 chunk_rows 行一块取值，每块之后报告进度，可在块之间取消
+    array = _fillable_array(column, positions)
+    if len(positions) <= chunk_rows:
+        values = array.take(positions, allow_fill=True)
+        progress.advance(len(positions) * progress.TAKE_WEIGHT)
+        return values
+    parts = []
+    for start in range(0, len(positions), chunk_rows):
+        parts.append(pd.Series(array.take(positions[start:start + chunk_rows], allow_fill=True), copy=False))
+        progress.advance(len(parts[-1]) * progress.TAKE_WEIGHT)
+    return pd.concat(parts, ignore_index=True).array
+
+
+def _match_slices(match, uniques, slice_size, progress):
+    # 主表唯一键按 slice_size 个一片交给 match 匹配，每片之后报告进度，可在片之间取消
+    parts = [np.empty(0, dtype=np.int64)]
+    for start in range(0, len(uniques), slice_size):
+        part = uniques[start:start + slice_size]
+        parts.append(match(part))
+        progress.advance(len(part))
+    return parts[-1] if len(parts) <= 2 else np.concatenate(parts)
+
+
+def _result_name(name, result):
+    # 附加列（匹配键、相似度）与已有列重名时追加序号
+    candidate, suffix = name, 1
+    while candidate in result:
+        suffix += 1
+        candidate = f"{name}.{suffix}"
+    return candidate
+
+
+# 以下函数把主表一个行块解析为 (查找表行位置, 相似度或 None)，唯一键的匹配结果已预先算好
+def _exact_chunk(codes, unique_positions, rows):
+    return expand_codes(codes[rows], unique_positions), None
+
+
+def _fuzzy_chunk(codes, unique_positions, unique_scores, rows):
+    return expand_codes(codes[rows], unique_positions), expand_codes(codes[rows], unique_scores, np.nan)
+
+
+def _range_chunk(index, codes, unique_ranks, group_codes, options, rows):
+    return index.resolve_ranks(codes[rows], unique_ranks, group_codes[rows] if group_codes is not None else None,
+                               options), None
+
+
+def _composite_chunk(index, column_codes, unique_codes, rows):
+    return index.resolve_codes([expand_codes(codes[rows], column_unique_codes)
+                                for codes, column_unique_codes in zip(column_codes, unique_codes)]), None
+
+
+def _report(progress_callback, done_rows, total_rows):
+    # progress_callback(已处理主表行数, 总行数) 可抛出 LookupCancelled 以中止查找
+    if progress_callback is not None:
+        progress_callback(done_rows, total_rows)
+
+
+class _Progress:
+    # 各步骤的工作量以行数计（键编码和建索引为表的行数，匹配为唯一键数，展开为主表行数，取值为主表行数乘以列数），
+    # 完成比例折算为主表行数报告，使进度和剩余时间覆盖整个查找而不只是展开阶段
+    TAKE_WEIGHT = 0.05  # 展开和取值只按位置取数组元素，每行耗时约为编码、建索引或匹配的 1/20
+
+    def __init__(self, progress_callback, total_rows):
+        self.progress_callback = progress_callback
+        self.total_rows = total_rows
+        self.planned = 0
+        self.done = 0
+
+    def plan(self, units):
+        self.planned += units
+
+    def revise(self, estimated, actual):
+        # 匹配前按行数估计的唯一键数，编码后按实际数量修正
+        self.planned -= estimated - actual
+
+    def advance(self, units):
+        self.done += units
+        self.report()
+
+    def tracker(self):
+        # 返回 (已完成数, 总数) 形式的回调，按两次调用之间的差值推进
+        reported = [0]
+
+        def callback(done, total):
+            self.advance(done - reported[0])
+            reported[0] = done
+        return callback
+
+    def report(self):
+        done_rows = int(self.total_rows * min(self.done, self.planned) / self.planned) if self.planned else 0
+        if self.done > 0 and self.total_rows:
+            done_rows = max(done_rows, 1)  # 0 行表示重新开始计时
+        _report(self.progress_callback, done_rows, self.total_rows)
+
+
+def vlookup(main_df, main_column, lookup_tables, return_columns, indexes=None, progress_callback=None, timer=None,
+            key_rules=None, match_options=None, chunk_rows=None, match_cache=None, table_versions=None):
+    """对主表执行多表 VLOOKUP，每个主表行只返回一行（首个匹配）。
+
+    lookup_tables 为 (lookup_df, lookup_column) 列表；indexes 可传入预先构建的 LookupIndex 列表。
+    main_column 和 lookup_column 可以是列名列表，表示按多列组合键精确匹配，两边的列数必须相同。
+    key_rules 为键比较规则（key_normalizer.KeyRules），主表键只编码一次，各查找表共用。
+    match_options 与 lookup_tables 一一对应，None 表示精确匹配，FuzzyMatch 表示模糊匹配，RangeMatch 表示区间匹配；
+    模糊匹配时结果中追加该查找表的匹配键和相似度两列，区间匹配时追加匹配键一列。
+    先为每个查找表匹配主表的唯一键，再展开到主表各行并取返回列；匹配唯一键、展开和取值都按 chunk_rows
+    行（或唯一键）一块进行（None 时整表一块），每块之后调用 progress_callback(已处理行数, 总行数)，
+    已处理行数为各步骤完成的工作量折算的主表行数；回调抛出 LookupCancelled 时在当前块结束后中止。
+    match_cache 为 match_cache.MatchCache 时，table_versions = (主表版本, [各查找表版本]) 用于复用之前的匹配结果：
+    配置未变的查找表只需按缓存的行位置取返回列，版本为 None 的表不缓存。
+    timer 为 run_timing.StageTimer 时记录各阶段耗时。输入的 DataFrame 不会被修改。
+    """
+    rules = key_rules or DEFAULT_RULES
+    main_columns = key_columns(main_column)
+    total_rows = len(main_df)
+    chunk_rows = chunk_rows or max(total_rows, 1)
+    progress = _Progress(progress_callback, total_rows)
+    encoded_columns = {}
+
+    def encoded(col):
+        # 主表各键列只编码一次，各查找表共用
+        if col not in encoded_columns:
+            with timed_stage(timer, f"主表键编码 {col}", total_rows):
+                encoded_columns[col] = encode_keys(main_df[col], rules)
+            progress.advance(total_rows)
+        return encoded_columns[col]
+
+    # 第一阶段：确定每个查找表取哪些返回列并检查匹配结果缓存，按各步骤的行数估计总工作量
+    tables = []
+    claimed = set(main_columns)
+    planned_columns = set()
+    for i, (lookup_df, lookup_column) in enumerate(lookup_tables):
+        options = match_options[i] if match_options is not None else None
+        lookup_columns = key_columns(lookup_column)
+        if len(lookup_columns) != len(main_columns):
+            raise ValueError(f"查找列数量（{len(lookup_columns)}）与主列数量（{len(main_columns)}）不一致")
+        if len(lookup_columns) > 1 and options is not None:
+            raise ValueError("组合键只支持精确匹配")
+        wanted = [col for col in lookup_df.columns if col in return_columns and col not in claimed]
+        claimed.update(wanted)
+        if not wanted and options is None:
+            continue
+        cache_key = match_cache_key(match_cache, table_versions, i, main_columns, lookup_columns, rules, options,
+                                    total_rows)
+        cached = match_cache.get(cache_key) if match_cache is not None else None
+        if cached is None:
+            match_columns = main_columns if len(lookup_columns) > 1 else main_columns[:1]
+            progress.plan(len(lookup_df))  # 建索引
+            for col in match_columns:
+                if col not in planned_columns:
+                    planned_columns.add(col)
+                    progress.plan(total_rows)  # 主表键编码
+            progress.plan(total_rows * len(match_columns))  # 匹配唯一键，编码后按实际唯一键数修正
+            if isinstance(options, RangeMatch) and options.group_column:
+                progress.plan(total_rows)  # 分组列编码
+            progress.plan(total_rows * progress.TAKE_WEIGHT)  # 展开到主表各行
+        progress.plan(total_rows * (len(wanted) + (options is not None)) * progress.TAKE_WEIGHT)  # 取返回列
+        tables.append((i, lookup_df, lookup_columns, options, wanted, cache_key, cached))
+    progress.report()
+
+    # 第二阶段：构建索引并按片匹配主表唯一键，得到每个查找表按行块解析位置的函数
+    plans = []
+    for i, lookup_df, lookup_columns, options, wanted, cache_key, cached in tables:
+        label = ' + '.join(str(col) for col in lookup_columns)
+        if cached is not None:
+            with timed_stage(timer, f"复用匹配结果 {label}", total_rows):
+                plans.append((lookup_df, lookup_columns, options, wanted, None, cache_key, cached))
+            continue
+        index = indexes[i] if indexes is not None else None
+        if isinstance(options, FuzzyMatch):
+            if not isinstance(index, FuzzyIndex) or index.rules != rules:
+                with timed_stage(timer, f"构建三元组索引 {label}", len(lookup_df)):
+                    index = FuzzyIndex.build(lookup_df[lookup_columns[0]], rules)
+            progress.advance(len(lookup_df))
+            codes, uniques, kind = encoded(main_columns[0])
+            progress.revise(total_rows, len(uniques))
+            track = progress.tracker()
+            with timed_stage(timer, f"模糊匹配 {label}", len(uniques)):
+                unique_positions, unique_scores = index.match_uniques(uniques, kind, options, track)
+            track(len(uniques), len(uniques))
+            resolve_chunk = partial(_fuzzy_chunk, codes, unique_positions, unique_scores)
+        elif isinstance(options, RangeMatch):
+            group_values = lookup_df[options.lookup_group_column] if options.group_column else None
+            if not isinstance(index, SortedKeyIndex) or index.rules != rules:
+                with timed_stage(timer, f"排序查找键 {label}", len(lookup_df)):
+                    index = SortedKeyIndex.build(lookup_df[lookup_columns[0]], group_values, rules)
+            progress.advance(len(lookup_df))
+            codes, uniques, kind = encoded(main_columns[0])
+            progress.revise(total_rows, len(uniques))
+            with timed_stage(timer, f"区间匹配 {label}", len(uniques)):
+                unique_ranks = _match_slices(partial(index.unique_ranks, kind=kind, options=options), uniques,
+                                             chunk_rows, progress)
+                group_codes = None
+                if options.group_column:
+                    group_codes = index.group_codes(main_df[options.group_column])
+                    progress.advance(total_rows)
+            resolve_chunk = partial(_range_chunk, index, codes, unique_ranks, group_codes, options)
+        elif len(lookup_columns) > 1:
+            if not isinstance(index, CompositeIndex) or index.rules != rules:
+                with timed_stage(timer, f"构建组合键索引 {label}", len(lookup_df)):
+                    index = CompositeIndex.build([lookup_df[col] for col in lookup_columns], rules)
+            progress.advance(len(lookup_df))
+            main_encoded = [encoded(col) for col in main_columns]
+            progress.revise(total_rows * len(main_columns), sum(len(uniques) for _, uniques, _ in main_encoded))
+            with timed_stage(timer, f"匹配唯一键 {label}", sum(len(uniques) for _, uniques, _ in main_encoded)):
+                unique_codes = [_match_slices(partial(column_index.match, kind=kind), uniques, chunk_rows, progress)
+                                for column_index, (_, uniques, kind) in zip(index.column_indexes, main_encoded)]
+            resolve_chunk = partial(_composite_chunk, index, [codes for codes, _, _ in main_encoded], unique_codes)
+        else:
+            if not isinstance(index, LookupIndex) or index.rules != rules:
+                with timed_stage(timer, f"构建索引 {label}", len(lookup_df)):
+                    index = LookupIndex.build(lookup_df[lookup_columns[0]], rules)
+            progress.advance(len(lookup_df))
+            codes, uniques, kind = encoded(main_columns[0])
+            progress.revise(total_rows, len(uniques))
+            with timed_stage(timer, f"匹配唯一键 {label}", len(uniques)):
+                unique_positions = _match_slices(partial(index.match, kind=kind), uniques, chunk_rows, progress)
+            resolve_chunk = partial(_exact_chunk, codes, unique_positions)
+        plans.append((lookup_df, lookup_columns, options, wanted, resolve_chunk, cache_key, None))
+
+    # 第三阶段：按行块展开到主表各行，每块之后报告进度，可在块之间取消；已缓存的查找表跳过
+    positions, scores = [], []
+    for plan in plans:
+        if plan[4] is None:
+            positions.append(plan[6][0])
+            scores.append(plan[6][1])
+        else:
+            positions.append(np.full(total_rows, -1, dtype=np.int64))
+            scores.append(np.full(total_rows, np.nan) if isinstance(plan[2], FuzzyMatch) else None)
+    pending = [i for i, plan in enumerate(plans) if plan[4] is not None]
+    if pending:
+        with timed_stage(timer, f"逐块匹配 ({-(-total_rows // chunk_rows)} 块)", total_rows):
+            for start in range(0, total_rows, chunk_rows):
+                rows = slice(start, min(start + chunk_rows, total_rows))
+                for i in pending:
+                    positions[i][rows], chunk_scores = plans[i][4](rows)
+                    if scores[i] is not None:
+                        scores[i][rows] = chunk_scores
+                    progress.advance((rows.stop - rows.start) * progress.TAKE_WEIGHT)
+        if match_cache is not None:
+            for i in pending:
+                match_cache.put(plans[i][5], positions[i], scores[i])
+
+    # 第四阶段：按位置分块取返回列
+    result = {col: main_df[col].array for col in main_columns}
+    column_order = list(main_columns)
+    for plan_positions, plan_scores, (lookup_df, lookup_columns, options, wanted, _, _, _) in zip(positions, scores, plans):
+        label = ' + '.join(str(col) for col in lookup_columns)
+        with timed_stage(timer, f"取返回列 {label} ({len(wanted)} 列)", total_rows):
+            if options is not None:
+                matched_name = _result_name(f"{lookup_columns[0]}_匹配键", result)
+                result[matched_name] = _gather_chunks(lookup_df[lookup_columns[0]], plan_positions, chunk_rows, progress)
+                column_order.append(matched_name)
+            if plan_scores is not None:
+                score_name = _result_name(f"{lookup_columns[0]}_相似度", result)
+                result[score_name] = np.round(plan_scores, 4)
+                column_order.append(score_name)
+            for col in wanted:
+                if col not in result:
+                    result[col] = _gather_chunks(lookup_df[col], plan_positions, chunk_rows, progress)
+                    column_order.append(col)
+                else:
+                    progress.advance(total_rows * progress.TAKE_WEIGHT)
+    _report(progress_callback, total_rows, total_rows)
+
+    # 结果列保持原生类型，未匹配为缺失值；'N/A' 等缺失标记只在显示和导出时应用
+    with timed_stage(timer, "组装结果", total_rows):
+        result_df = pd.DataFrame(result, columns=column_order)
+    return result_df
@@ -0,0 +1,66 @@
+import threading
+from collections import OrderedDict
+
+
+class MatchCache:
+    # 查找结果（主表行 -> 查找表行位置，模糊匹配另有相似度）的内存缓存，按总大小做 LRU 淘汰
+    # 缓存键包含主表和查找表的版本、键列、键比较规则和匹配选项，任一变化都会重新匹配
+    # 界面线程（丢弃版本）和查找线程（读取、写入）同时使用，所有操作在锁内进行
+
+    def __init__(self, max_bytes=256 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.total_bytes = 0
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def cache_key(main_version, main_columns, lookup_version, lookup_columns, rules, options, rows):
+        if main_version is None or lookup_version is None:
+            return None
+        return (main_version, tuple(main_columns), lookup_version, tuple(lookup_columns), rules.signature(),
+                options.signature() if options is not None else 'exact', rows)
+
+    def get(self, key):
+        if key is None:
+            return None
+        with self.lock:
+            if key not in self.entries:
+                return None
+            self.entries.move_to_end(key)
+            return self.entries[key]
+
+    def put(self, key, positions, scores=None):
+        if key is None:
+            return
+        # 缓存的数组设为只读，复用时不会被意外修改
+        positions.flags.writeable = False
+        if scores is not None:
+            scores.flags.writeable = False
+        with self.lock:
+            if key in self.entries:
+                self.total_bytes -= self._entry_bytes(self.entries.pop(key))
+            self.entries[key] = (positions, scores)
+            self.total_bytes += self._entry_bytes(self.entries[key])
+            while self.total_bytes > self.max_bytes and len(self.entries) > 1:
+                _, entry = self.entries.popitem(last=False)
+                self.total_bytes -= self._entry_bytes(entry)
+
+    @staticmethod
+    def _entry_bytes(entry):
+        positions, scores = entry
+        return positions.nbytes + (scores.nbytes if scores is not None else 0)
+
+    def discard_version(self, version):
+        # 表的数据变化后丢弃与该版本相关的结果（主表或查找表）
+        with self.lock:
+            for key in [key for key in self.entries if version in (key[0], key[2])]:
+                self.total_bytes -= self._entry_bytes(self.entries.pop(key))
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.total_bytes = 0
+
+    def __len__(self):
+        with self.lock:
+            return len(self.entries)
@@ -0,0 +1,297 @@
+import os
+import math
+import time
+import shutil
+import logging
+import tempfile
+import numpy as np
+import pandas as pd
+
+from key_normalizer import DEFAULT_RULES, encode_keys, keys_as_text
+from lookup_engine import vlookup, key_columns
+from parse_cache import write_frame, read_frame
+from workbook_loader import iter_sheet_frames, sheet_header_names
+from result_exporter import StreamingWriter, DEFAULT_NA_REP
+from run_timing import timed_stage
+
+ROW_COLUMN = '__行号__'  # 溢写文件中记录主表原始行号的列，用于按原顺序写出结果
+MEMORY_EXPANSION = 4  # 文件大小到内存中 DataFrame 大小的粗略倍数，用于估算分区数
+MAX_PARTITIONS = 4096
+_HASH_MULTIPLIER = np.uint64(1000003)
+
+
+class TableSource:
+    """磁盘分区查找的输入表：Excel 工作表或 CSV 文件，只按块读取需要的列。
+
+    Excel 的 header_row 与 apply_header 相同；CSV 的 header_row 为表头所在的行号（从 0 开始）。
+    """
+
+    def __init__(self, file_path, sheet_name=None, header_row=0):
+        self.file_path = file_path
+        self.sheet_name = sheet_name
+        self.header_row = header_row
+
+    @property
+    def is_csv(self):
+        return self.file_path.lower().endswith('.csv')
+
+    def size_bytes(self):
+        return os.path.getsize(self.file_path)
+
+    def columns(self):
+        # 只读取表头，返回与 iter_frames 相同的列名
+        if self.is_csv:
+            return [str(col) for col in pd.read_csv(self.file_path, header=self.header_row, nrows=0).columns]
+        return sheet_header_names(self.file_path, self.sheet_name, self.header_row)
+
+    def require_columns(self, columns):
+        available = self.columns()
+        missing = [col for col in columns if col not in available]
+        if missing:
+            raise ValueError(f"{os.path.basename(self.file_path)} 中没有列 {', '.join(map(str, missing))}")
+        return available
+
+    def iter_frames(self, columns, chunk_rows):
+        wanted = list(dict.fromkeys(columns))
+        if self.is_csv:
+            frames = pd.read_csv(self.file_path, header=self.header_row, usecols=lambda name: name in wanted,
+                                 chunksize=chunk_rows)
+        else:
+            frames = iter_sheet_frames(self.file_path, self.sheet_name, self.header_row, chunk_rows)
+        for frame in frames:
+            missing = [col for col in wanted if col not in frame.columns]
+            if missing:
+                raise ValueError(f"{os.path.basename(self.file_path)} 中没有列 {', '.join(map(str, missing))}")
+            yield frame[wanted].reset_index(drop=True)
+
+
+def partition_ids(frame, columns, partitions, rules=DEFAULT_RULES):
+    # 按键的规范文本计算哈希分区：键比较规则下相等的键（如 1 与 1.0、大小写折叠后的文本）总是落在同一分区
+    # 键缺失的行不会匹配，统一放在 0 号分区
+    hashes = np.zeros(len(frame), dtype=np.uint64)
+    valid = np.ones(len(frame), dtype=bool)
+    for col in columns:
+        codes, uniques, kind = encode_keys(frame[col], rules)
+        texts = np.asarray(keys_as_text(uniques, kind, rules), dtype=object)
+        unique_hashes = pd.util.hash_array(texts) if len(texts) else np.empty(0, dtype=np.uint64)
+        valid &= codes >= 0
+        row_hashes = unique_hashes.take(np.maximum(codes, 0)) if len(texts) else np.zeros(len(frame), dtype=np.uint64)
+        hashes = (hashes * _HASH_MULTIPLIER) ^ row_hashes
+    parts = (hashes % np.uint64(partitions)).astype(np.int64)
+    parts[~valid] = 0
+    return parts
+
+
+class SpillStore:
+    # 分区溢写文件：每个 (表, 分区) 由若干列式块组成，格式与解析缓存相同（数值列可内存映射读取）
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.blocks = {}
+        self.columns = {}
+
+    def set_columns(self, table, columns):
+        # 预先记录表的列名，没有任何行落入的分区读取为带这些列的空表
+        self.columns[table] = [str(col) for col in columns]
+
+    def append(self, table, partition, frame):
+        blocks = self.blocks.setdefault((table, partition), [])
+        path = os.path.join(self.directory, table, f"p{partition}", f"b{len(blocks)}")
+        blocks.append((path, write_frame(path, frame)))
+        self.columns.setdefault(table, [str(col) for col in frame.columns])
+
+    def rows(self, table, partition):
+        return sum(meta['rows'] for _, meta in self.blocks.get((table, partition), []))
+
+    def bytes(self, table, partition):
+        total = 0
+        for path, _ in self.blocks.get((table, partition), []):
+            total += sum(entry.stat().st_size for entry in os.scandir(path))
+        return total
+
+    def iter_blocks(self, table, partition):
+        for path, meta in self.blocks.get((table, partition), []):
+            yield read_frame(path, meta, mmap=True)
+
+    def read(self, table, partition):
+        frames = list(self.iter_blocks(table, partition))
+        if not frames:
+            return pd.DataFrame({col: pd.Series(dtype=object) for col in self.columns.get(table, [])})
+        return pd.concat(frames, ignore_index=True) if len(frames) > 1 else frames[0]
+
+
+class _Partitioner:
+    # 按分区缓冲数据块，缓冲行数达到 flush_rows 时写入溢写文件，内存占用只与 flush_rows 相关
+
+    def __init__(self, store, table, partitions, flush_rows):
+        self.store = store
+        self.table = table
+        self.partitions = partitions
+        self.flush_rows = flush_rows
+        self.buffers = {}
+        self.buffered_rows = 0
+
+    def add(self, frame, parts):
+        order = np.argsort(parts, kind='stable')
+        counts = np.bincount(parts, minlength=self.partitions)
+        ends = np.cumsum(counts)
+        for partition in np.flatnonzero(counts):
+            rows = order[ends[partition] - counts[partition]:ends[partition]]
+            self.buffers.setdefault(int(partition), []).append(frame.take(rows))
+        self.buffered_rows += len(frame)
+        if self.buffered_rows >= self.flush_rows:
+            self.flush()
+
+    def flush(self):
+        for partition, frames in self.buffers.items():
+            self.store.append(self.table, partition, pd.concat(frames, ignore_index=True))
+        self.buffers = {}
+        self.buffered_rows = 0
+
+
+class _OrderedReader:
+    # 顺序读取一个分区的结果块（按主表行号升序），每次取出行号小于给定值的行
+
+    def __init__(self, blocks):
+        self.blocks = blocks
+        self.current = next(self.blocks, None)
+        self.offset = 0
+
+    def take_below(self, limit):
+        pieces = []
+        while self.current is not None:
+            row_numbers = self.current[ROW_COLUMN].to_numpy()
+            end = int(np.searchsorted(row_numbers, limit, side='left'))
+            if end > self.offset:
+                pieces.append(self.current.iloc[self.offset:end])
+            if end < len(self.current):
+                self.offset = end
+                break
+            self.current = next(self.blocks, None)
+            self.offset = 0
+        return pieces
+
+
+def _report(progress_callback, stage, done, total):
+    # progress_callback(阶段, 已完成, 总数) 可抛出 lookup_engine.LookupCancelled 以中止
+    if progress_callback is not None:
+        progress_callback(stage, done, total)
+
+
+def _add_stage(timer, name, started, rows):
+    # 行数在读取结束后才知道的阶段，结束时再记录
+    if timer is not None:
+        timer.add(name, time.perf_counter() - started, rows)
+
+
+def choose_partitions(sources, memory_budget):
+    # 以输入文件大小粗略估算内存占用，使每个分区的查找表和主表键能放入内存预算
+    total_bytes = sum(source.size_bytes() for source in sources)
+    return int(min(MAX_PARTITIONS, max(1, math.ceil(total_bytes * MEMORY_EXPANSION / memory_budget))))
+
+
+def out_of_core_vlookup(main_source, main_column, lookup_sources, return_columns, output_path,
+                        memory_budget=1024 * 1024 * 1024, partitions=None, chunk_rows=100000, spill_dir=None,
+                        key_rules=None, progress_callback=None, timer=None, na_rep=DEFAULT_NA_REP,
+                        xlsx_keep_empty=False):
+    """磁盘分区（Grace 哈希连接）方式的 VLOOKUP，用于主表或查找表超出内存的情况，只支持精确匹配。
+
+    1. 先读取各表的表头，与 vlookup 相同，每个返回列由第一个包含它的查找表提供，不提供任何返回列的查找表跳过；
+       按块读取每个查找表的查找列和它提供的返回列、主表的主列，按键哈希分区写入溢写目录；
+    2. 逐个分区在内存中执行 vlookup，结果按主表行号有序写回溢写目录；
+    3. 按主表原始行顺序归并各分区结果，以 chunk_rows 行一块流式写出到 output_path（csv 或 xlsx）。
+
+    main_source 为 TableSource，lookup_sources 为 (TableSource, lookup_column) 列表，键列可以是组合键列表。
+    partitions 为 None 时按 memory_budget（字节）估算分区数。溢写目录在完成或出错后删除。
+    返回 (实际写入的文件路径, 结果行数)。
+    """
+    rules = key_rules or DEFAULT_RULES
+    main_columns = key_columns(main_column)
+    partitions = partitions or choose_partitions([main_source] + [source for source, _ in lookup_sources],
+                                                 memory_budget)
+    if spill_dir:
+        os.makedirs(spill_dir, exist_ok=True)
+    work_dir = tempfile.mkdtemp(prefix='vlookup_spill_', dir=spill_dir)
+    store = SpillStore(work_dir)
+    logging.info(f"磁盘分区查找：{partitions} 个分区，溢写目录 {work_dir}")
+    try:
+        # 第一阶段：查找表和主表按键哈希分区写入磁盘
+        lookup_tables = []
+        claimed = set(main_columns)
+        result_columns = list(main_columns)
+        main_source.require_columns(main_columns)
+        for i, (source, lookup_column) in enumerate(lookup_sources):
+            lookup_columns = key_columns(lookup_column)
+            if len(lookup_columns) != len(main_columns):
+                raise ValueError(f"查找列数量（{len(lookup_columns)}）与主列数量（{len(main_columns)}）不一致")
+            available = source.require_columns(lookup_columns)
+            wanted = [col for col in available if col in return_columns and col not in claimed]
+            claimed.update(wanted)
+            if not wanted:
+                continue
+            result_columns.extend(wanted)
+            # 按表头中的顺序读取，分区后的查找表与整表读入时的列顺序相同
+            columns = [col for col in available if col in lookup_columns or col in wanted]
+            table = f"lookup{i}"
+            store.set_columns(table, columns)
+            partitioner = _Partitioner(store, table, partitions, chunk_rows)
+            rows = 0
+            started = time.perf_counter()
+            for frame in source.iter_frames(columns, chunk_rows):
+                partitioner.add(frame, partition_ids(frame, lookup_columns, partitions, rules))
+                rows += len(frame)
+                _report(progress_callback, "分区", rows, None)
+            partitioner.flush()
+            _add_stage(timer, f"分区查找表 {os.path.basename(source.file_path)}", started, rows)
+            lookup_tables.append((table, lookup_column))
+
+        total_rows = 0
+        partitioner = _Partitioner(store, 'main', partitions, chunk_rows)
+        started = time.perf_counter()
+        for frame in main_source.iter_frames(main_columns, chunk_rows):
+            frame.insert(len(frame.columns), ROW_COLUMN, np.arange(total_rows, total_rows + len(frame)))
+            partitioner.add(frame, partition_ids(frame, main_columns, partitions, rules))
+            total_rows += len(frame)
+            _report(progress_callback, "分区", total_rows, None)
+        partitioner.flush()
+        _add_stage(timer, f"分区主表 {os.path.basename(main_source.file_path)}", started, total_rows)
+
+        # 第二阶段：逐个分区在内存中连接，结果按行号有序分块写回
+        result_block_rows = max(10000, chunk_rows // partitions)
+        joined_rows = 0
+        with timed_stage(timer, f"分区连接 ({partitions} 个分区)", total_rows):
+            for partition in range(partitions):
+                main_part = store.read('main', partition)
+                if len(main_part) == 0:
+                    continue
+                partition_bytes = sum(store.bytes(table, partition) for table, _ in lookup_tables)
+                if partition_bytes * MEMORY_EXPANSION > memory_budget:
+                    logging.warning(f"分区 {partition} 的查找表约 {partition_bytes / 1024 / 1024:.0f} MB，"
+                                    f"可能超出内存预算，可增加分区数")
+                lookups = [(store.read(table, partition), lookup_column) for table, lookup_column in lookup_tables]
+                result = vlookup(main_part, main_column, lookups, return_columns, key_rules=rules)
+                result.insert(0, ROW_COLUMN, main_part[ROW_COLUMN].to_numpy())
+                for start in range(0, len(result), result_block_rows):
+                    store.append('result', partition, result.iloc[start:start + result_block_rows])
+                joined_rows += len(main_part)
+                _report(progress_callback, "连接", joined_rows, total_rows)
+
+        # 第三阶段：按主表原始行顺序归并各分区结果并流式写出
+        writer = StreamingWriter(output_path, na_rep, xlsx_keep_empty)
+        try:
+            with timed_stage(timer, "归并写出", total_rows):
+                readers = [_OrderedReader(store.iter_blocks('result', partition)) for partition in range(partitions)]
+                for start in range(0, total_rows, chunk_rows):
+                    pieces = [piece for reader in readers for piece in reader.take_below(start + chunk_rows)]
+                    window = pd.concat(pieces, ignore_index=True) if len(pieces) > 1 else pieces[0]
+                    window = window.iloc[np.argsort(window[ROW_COLUMN].to_numpy(), kind='stable')]
+                    writer.write(window.drop(columns=ROW_COLUMN))
+                    _report(progress_callback, "写出", min(start + chunk_rows, total_rows), total_rows)
+                if total_rows == 0:
+                    writer.write(pd.DataFrame(columns=result_columns))
+            return writer.close(), total_rows
+        except BaseException:
+            writer.abort()
+            raise
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
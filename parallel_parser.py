@@ -0,0 +1,53 @@
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from parse_cache import write_frame
+from workbook_loader import parse_sheet, header_names_by_row, file_signature, LoadCancelled
+
+
+def default_worker_count(configured=0):
+    # 配置为 0 或未配置时使用全部 CPU 核心
+    return configured if configured and configured > 0 else (os.cpu_count() or 1)
+
+
+def parse_sheet_to_directory(file_path, sheet_name, directory, chunk_size=100000, detected_header=None):
+    # 在工作进程中执行：解析工作表并按 parse_cache.write_frame 的列编码写入 .npy（不含 pickle 数据），
+    # 只把列描述信息传回主进程
+    # signature 在解析之前记录，解析期间文件被修改时，数据不会被当作新文件的内容缓存
+    signature = file_signature(file_path)
+    df, detected_header = parse_sheet(file_path, sheet_name, chunk_size, detected_header=detected_header)
+    frame_meta = write_frame(directory, df)
+    frame_meta['detected_header'] = int(detected_header)
+    frame_meta['header_names'] = header_names_by_row(df)
+    frame_meta['signature'] = signature
+    return frame_meta
+
+
+def parse_sheets_parallel(jobs, work_dir, workers=None, is_cancelled=None, chunk_size=100000):
+    """在进程池中并行解析多个 (文件路径, 工作表名, 扫描时检测到的表头行) 任务。
+
+    逐个产出 (file_path, sheet_name, directory, frame_meta, error)，列数据保存在 directory 中，
+    由主进程以 allow_pickle=False 按需内存映射读取；进程之间只传递 frame_meta 这样的列描述信息，
+    不传输 DataFrame，文本列也不经过 pickle。
+    """
+    os.makedirs(work_dir, exist_ok=True)
+    executor = ProcessPoolExecutor(max_workers=default_worker_count(workers))
+    try:
+        futures = {}
+        for i, (file_path, sheet_name, detected_header) in enumerate(jobs):
+            directory = os.path.join(work_dir, f"job{i}")
+            future = executor.submit(parse_sheet_to_directory, file_path, sheet_name, directory, chunk_size,
+                                     detected_header)
+            futures[future] = (file_path, sheet_name, directory)
+
+        for future in as_completed(futures):
+            if is_cancelled is not None and is_cancelled():
+                raise LoadCancelled()
+            file_path, sheet_name, directory = futures[future]
+            try:
+                frame_meta, error = future.result(), None
+            except Exception as e:
+                frame_meta, error = None, str(e)
+            yield file_path, sheet_name, directory, frame_meta, error
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)  # 取消时只等待正在解析的工作表结束
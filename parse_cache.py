@@ -0,0 +1,369 @@
+import os
+import json
+import datetime
+import shutil
+import hashlib
+import logging
+import numpy as np
+import pandas as pd
+
+from workbook_loader import apply_header, header_names_by_row, file_signature
+
+DEFAULT_PARSE_CACHE_DIR = os.path.join(os.path.expanduser('~'), '.advanced_vlookup_tool', 'parse_cache')
+CACHE_FORMAT_VERSION = 5
+
+# 对象列中的缺失值种类，掩码中按位置加 1 记录，0 表示有值
+MISSING_VALUES = (None, np.nan, pd.NA, pd.NaT)
+
+
+def missing_code(value):
+    for code, missing in enumerate(MISSING_VALUES, 1):
+        if value is missing or (missing is np.nan and isinstance(value, float) and value != value):
+            return code
+    return 0
+
+
+def encode_value(value):
+    # 混合类型列中的单元格编码为带类型标记的 JSON，只还原为基本类型，读取时不会执行任何代码
+    code = missing_code(value)
+    if code:
+        return json.dumps(['missing', code])
+    if isinstance(value, str):
+        return json.dumps(['s', value], ensure_ascii=False)
+    if isinstance(value, (bool, np.bool_)):
+        return json.dumps(['b', bool(value)])
+    if isinstance(value, (int, np.integer)):
+        return json.dumps(['i', int(value)])
+    if isinstance(value, (float, np.floating)):
+        return json.dumps(['f', float(value)])
+    if isinstance(value, pd.Timestamp):
+        return json.dumps(['ts', value.isoformat()])
+    if isinstance(value, datetime.datetime):
+        return json.dumps(['dt', value.isoformat()])
+    if isinstance(value, datetime.date):
+        return json.dumps(['d', value.isoformat()])
+    if isinstance(value, datetime.time):
+        return json.dumps(['tm', value.isoformat()])
+    if isinstance(value, (datetime.timedelta, np.timedelta64)):
+        return json.dumps(['td', pd.Timedelta(value).value])
+    return json.dumps(['s', str(value)], ensure_ascii=False)  # 其他类型按文本保存
+
+
+_VALUE_DECODERS = {
+    'missing': lambda code: MISSING_VALUES[code - 1],
+    's': str,
+    'b': bool,
+    'i': int,
+    'f': float,
+    'ts': pd.Timestamp,
+    'dt': datetime.datetime.fromisoformat,
+    'd': datetime.date.fromisoformat,
+    'tm': datetime.time.fromisoformat,
+    'td': pd.Timedelta,
+}
+
+
+def decode_value(text):
+    tag, payload = json.loads(text)
+    if tag not in _VALUE_DECODERS:
+        raise ValueError(f"不支持的值类型: {tag}")
+    return _VALUE_DECODERS[tag](payload)
+
+
+def is_masked(dtype):
+    # pandas 的可空数值和布尔类型（Int64、Float64、boolean 等）
+    return (isinstance(dtype, pd.api.extensions.ExtensionDtype) and dtype.kind in 'iufb'
+            and isinstance(getattr(dtype, 'numpy_dtype', None), np.dtype))
+
+
+def encode_texts(texts):
+    # 文本按 UTF-8 连续存放，另存每行的字节偏移（行数 + 1 个 int64），可按行范围读取
+    encoded = [text.encode('utf-8') for text in texts]
+    offsets = np.zeros(len(encoded) + 1, dtype='<i8')
+    np.cumsum([len(data) for data in encoded], out=offsets[1:])
+    return {'offsets': offsets, 'data': np.frombuffer(b''.join(encoded), dtype=np.uint8)}
+
+
+def decode_texts(offsets, data):
+    # offsets 为若干连续行的字节偏移（行数 + 1 个），data 为从 offsets[0] 开始的 UTF-8 字节
+    data = bytes(data)
+    offsets = (np.asarray(offsets) - offsets[0]).tolist()
+    text = data.decode('utf-8')
+    if len(text) == len(data):  # 全部为单字节字符时字节偏移即字符偏移，整段解码一次
+        return [text[a:b] for a, b in zip(offsets[:-1], offsets[1:])]
+    return [data[a:b].decode('utf-8') for a, b in zip(offsets[:-1], offsets[1:])]
+
+
+def encode_column(column):
+    """把一列编码为若干不含 Python 对象的数组，返回 (存储方式, {部件名: 数组})。
+
+    native：数值和日期列原样保存（values）；masked：可空整数、浮点数和布尔列保存数值和缺失掩码（values、mask）；
+    text：字符串列保存缺失值种类（mask）和 UTF-8 文本（offsets、data）；values：其他对象列每个单元格保存为
+    带类型标记的 JSON 文本（offsets、data）。读取时只还原为基本类型，不使用 pickle。
+    """
+    dtype = column.dtype
+    if isinstance(dtype, np.dtype) and dtype.kind != 'O':
+        return 'native', {'values': np.ascontiguousarray(column.to_numpy())}
+    if is_masked(dtype):
+        return 'masked', {'values': np.ascontiguousarray(column.to_numpy(dtype=dtype.numpy_dtype, na_value=0)),
+                          'mask': np.ascontiguousarray(column.isna().to_numpy())}
+    values = column.to_numpy(dtype=object)
+    missing = np.zeros(len(values), dtype=np.uint8)
+    is_missing = pd.isna(values)
+    missing[is_missing] = [missing_code(value) for value in values[is_missing]]
+    if pd.api.types.infer_dtype(values[missing == 0], skipna=False) in ('string', 'empty'):
+        return 'text', dict(encode_texts(np.where(missing == 0, values, '')), mask=missing)
+    return 'values', encode_texts([encode_value(value) for value in values])
+
+
+def decode_column(storage, dtype, parts):
+    # parts 为 encode_column 的部件（可以只是其中一段连续的行），按原 dtype 还原；未知的存储方式抛出 ValueError
+    if storage == 'native':
+        values = parts['values']
+    elif storage == 'masked':
+        values = pd.array(np.asarray(parts['values']), dtype=dtype)
+        values[np.asarray(parts['mask'], dtype=bool)] = pd.NA
+    elif storage in ('text', 'values'):
+        texts = decode_texts(parts['offsets'], parts['data'])
+        values = np.empty(len(texts), dtype=object)
+        if storage == 'text':
+            values[:] = texts
+            missing = np.asarray(parts['mask'])
+            for code in np.unique(missing[missing > 0]):
+                values[missing == code] = MISSING_VALUES[code - 1]
+        else:
+            values[:] = [decode_value(text) for text in texts]
+        values = restore_dtype(values, dtype)
+    else:
+        raise ValueError(f"不支持的列存储方式: {storage}")
+    if dtype == 'object':
+        values = pd.Series(values, dtype=object, copy=False)  # 避免全为文本的对象列被推断为 str 类型
+    return values
+
+
+def write_frame(directory, df):
+    # 每列按 encode_column 的部件写为 .npy 文件，数值/日期列可直接内存映射读取；不写入任何 pickle 数据
+    os.makedirs(directory, exist_ok=True)
+    columns = []
+    for i in range(df.shape[1]):
+        column = df.iloc[:, i]
+        storage, parts = encode_column(column)
+        for part, values in parts.items():
+            np.save(os.path.join(directory, f"c{i}_{part}.npy"), values, allow_pickle=False)
+        columns.append({'name': str(df.columns[i]), 'dtype': str(column.dtype), 'storage': storage,
+                        'parts': list(parts)})
+    return {'columns': columns, 'rows': int(df.shape[0])}
+
+
+def restore_dtype(values, dtype):
+    # 以对象数组读取的列（如 str、category）按原 dtype 还原，无法还原时保持对象数组
+    if dtype != 'object':
+        try:
+            return pd.array(values, dtype=dtype)
+        except (TypeError, ValueError):
+            pass
+    return values
+
+
+def read_frame(directory, meta, columns=None, mmap=False):
+    # columns 为要读取的列位置列表，None 表示全部列；.npy 文件一律以 allow_pickle=False 读取
+    positions = range(len(meta['columns'])) if columns is None else columns
+    data = {}
+    names = []
+    for i in positions:
+        info = meta['columns'][i]
+        parts = {part: np.load(os.path.join(directory, f"c{i}_{part}.npy"), mmap_mode='r' if mmap else None,
+                               allow_pickle=False)
+                 for part in info['parts']}
+        data[i] = decode_column(info['storage'], info['dtype'], parts)
+        names.append(info['name'])
+    df = pd.DataFrame(data, index=pd.RangeIndex(meta['rows']), copy=not mmap)
+    df.columns = names
+    return df
+
+
+def directory_size(directory):
+    total = 0
+    for root, _, files in os.walk(directory):
+        for name in files:
+            total += os.path.getsize(os.path.join(root, name))
+    return total
+
+
+class ParseCache:
+    # 工作簿解析结果的列式缓存，按路径 + 修改时间 + 文件大小校验，按总大小做 LRU 淘汰
+
+    def __init__(self, cache_dir=DEFAULT_PARSE_CACHE_DIR, max_bytes=2048 * 1024 * 1024):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+
+    def _entry_dir(self, file_path):
+        return os.path.join(self.cache_dir, hashlib.sha1(os.path.abspath(file_path).encode('utf-8')).hexdigest())
+
+    def _file_signature(self, file_path):
+        stat = os.stat(file_path)
+        return {'path': os.path.abspath(file_path), 'mtime_ns': stat.st_mtime_ns, 'size': stat.st_size,
+                'version': CACHE_FORMAT_VERSION}
+
+    def _meta_path(self, file_path):
+        return os.path.join(self._entry_dir(file_path), 'meta.json')
+
+    def load_meta(self, file_path):
+        meta_path = self._meta_path(file_path)
+        try:
+            with open(meta_path, 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+            if meta.get('signature') != self._file_signature(file_path):
+                return None
+            os.utime(meta_path)  # 更新访问时间，用于 LRU 淘汰
+            return meta
+        except (OSError, ValueError):
+            return None
+
+    def _write_meta(self, file_path, meta):
+        meta_path = self._meta_path(file_path)
+        with open(meta_path + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump(meta, f, ensure_ascii=False)
+        os.replace(meta_path + '.tmp', meta_path)
+
+    def _writable_meta(self, file_path):
+        # 文件已变化或缓存不存在时清空旧条目，重新开始
+        meta = self.load_meta(file_path)
+        if meta is None:
+            entry_dir = self._entry_dir(file_path)
+            shutil.rmtree(entry_dir, ignore_errors=True)
+            os.makedirs(entry_dir)
+            meta = {'signature': self._file_signature(file_path), 'scan': None, 'sheets': {}, 'next_id': 0}
+        return meta
+
+    def _allocate_dir(self, meta):
+        name = f"s{meta['next_id']}"
+        meta['next_id'] += 1
+        return name
+
+    def load_scan(self, file_path):
+        meta = self.load_meta(file_path)
+        if meta is None or meta.get('scan') is None:
+            return None
+        entry_dir = self._entry_dir(file_path)
+        try:
+            return {sheet_name: {'dimensions': tuple(info['dimensions']),
+                                 'preview': read_frame(os.path.join(entry_dir, info['dir']), info['preview']),
+                                 'detected_header': info['detected_header']}
+                    for sheet_name, info in meta['scan'].items()}
+        except Exception as e:
+            logging.warning(f"读取解析缓存 {entry_dir} 失败: {str(e)}")
+            return None
+
+    def save_scan(self, file_path, scan):
+        try:
+            meta = self._writable_meta(file_path)
+            entry_dir = self._entry_dir(file_path)
+            meta['scan'] = {}
+            for sheet_name, info in scan.items():
+                directory = self._allocate_dir(meta)
+                preview_meta = write_frame(os.path.join(entry_dir, directory), info['preview'])
+                meta['scan'][sheet_name] = {'dimensions': list(info['dimensions']), 'dir': directory,
+                                            'preview': preview_meta,
+                                            'detected_header': int(info['detected_header'])}
+            self._write_meta(file_path, meta)
+            self.evict()
+        except Exception as e:
+            logging.warning(f"写入解析缓存失败: {str(e)}")
+
+    def load_sheet(self, file_path, sheet_name, columns=None):
+        # columns 为要读取的原始列位置，None 表示全部列
+        meta = self.load_meta(file_path)
+        if meta is None or sheet_name not in meta['sheets']:
+            return None
+        entry_dir = self._entry_dir(file_path)
+        info = meta['sheets'][sheet_name]
+        try:
+            return read_frame(os.path.join(entry_dir, info['dir']), info, columns), info['detected_header']
+        except Exception as e:
+            logging.warning(f"读取解析缓存 {entry_dir} 失败: {str(e)}")
+            return None
+
+    def header_names(self, file_path, sheet_name, header_row):
+        # 返回缓存的工作表在指定表头行下的列名，未缓存或该表头行没有记录时返回 None
+        meta = self.load_meta(file_path)
+        info = meta['sheets'].get(sheet_name) if meta is not None else None
+        if info is None or 'header_names' not in info:
+            return None
+        header_row = min(header_row, info['rows'])
+        return info['header_names'][header_row] if header_row < len(info['header_names']) else None
+
+    def load_sheet_columns(self, file_path, sheet_name, header_row, column_names):
+        """只读取指定列名对应的列并应用表头，返回 DataFrame；缓存中没有该工作表时返回 None。
+
+        列名按缓存中记录的表头行列名定位，重复列名取第一列；不存在的列名被忽略。
+        """
+        names = self.header_names(file_path, sheet_name, header_row)
+        if names is None:
+            return None
+        positions = []
+        for name in column_names:
+            if name in names and names.index(name) not in positions:
+                positions.append(names.index(name))
+        loaded = self.load_sheet(file_path, sheet_name, positions)
+        if loaded is None:
+            return None
+        return apply_header(loaded[0], header_row)
+
+    def save_sheet(self, file_path, sheet_name, df, detected_header):
+        try:
+            meta = self._writable_meta(file_path)
+            directory = self._allocate_dir(meta)
+            sheet_meta = write_frame(os.path.join(self._entry_dir(file_path), directory), df)
+            sheet_meta['header_names'] = header_names_by_row(df)
+            sheet_meta['dir'] = directory
+            sheet_meta['detected_header'] = int(detected_header)
+            old = meta['sheets'].get(sheet_name)
+            meta['sheets'][sheet_name] = sheet_meta
+            self._write_meta(file_path, meta)
+            if old is not None:
+                shutil.rmtree(os.path.join(self._entry_dir(file_path), old['dir']), ignore_errors=True)
+            self.evict()
+        except Exception as e:
+            logging.warning(f"写入解析缓存失败: {str(e)}")
+
+    def adopt_sheet(self, file_path, sheet_name, directory, frame_meta):
+        # 将工作进程已写好的列目录移入缓存条目，返回缓存中的目录；失败时返回 None
+        # 解析之后源文件又被修改时不移入，避免旧数据以新文件的签名缓存
+        if frame_meta.get('signature') != file_signature(file_path):
+            return None
+        try:
+            meta = self._writable_meta(file_path)
+            name = self._allocate_dir(meta)
+            target = os.path.join(self._entry_dir(file_path), name)
+            shutil.move(directory, target)
+            sheet_meta = dict(frame_meta, dir=name)
+            old = meta['sheets'].get(sheet_name)
+            meta['sheets'][sheet_name] = sheet_meta
+            self._write_meta(file_path, meta)
+            if old is not None:
+                shutil.rmtree(os.path.join(self._entry_dir(file_path), old['dir']), ignore_errors=True)
+            self.evict()
+            return target
+        except Exception as e:
+            logging.warning(f"写入解析缓存失败: {str(e)}")
+            return None
+
+    def evict(self):
+        if not os.path.isdir(self.cache_dir):
+            return
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            entry_dir = os.path.join(self.cache_dir, name)
+            meta_path = os.path.join(entry_dir, 'meta.json')
+            if os.path.isdir(entry_dir) and os.path.exists(meta_path):
+                entries.append((os.path.getmtime(meta_path), directory_size(entry_dir), entry_dir))
+        total = sum(size for _, size, _ in entries)
+        for _, size, entry_dir in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            shutil.rmtree(entry_dir, ignore_errors=True)
+            total -= size
+
+    def clear(self):
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
@@ -0,0 +1,114 @@
+import numpy as np
+import pandas as pd
+
+from key_normalizer import DEFAULT_RULES, encode_keys, common_kind, expand_codes, keys_as_kind
+
+RANGE_LE = 'le'  # 不大于主表值的最大键（Excel VLOOKUP range_lookup=TRUE）
+RANGE_GE = 'ge'  # 不小于主表值的最小键
+
+
+class RangeMatch:
+    """区间匹配选项。
+
+    direction 为 'le'（取不大于主表值的最大键）或 'ge'（取不小于主表值的最小键）；
+    group_column 为主表中的分组列，lookup_group_column 为查找表中的分组列（省略时与 group_column 同名），
+    设置分组后只在同组的查找表行中查找，例如每个产品取生效日期不晚于订单日期的价格。
+    """
+
+    def __init__(self, direction=RANGE_LE, group_column=None, lookup_group_column=None):
+        if direction not in (RANGE_LE, RANGE_GE):
+            raise ValueError(f"未知的区间匹配方向: {direction}")
+        self.direction = direction
+        self.group_column = group_column
+        self.lookup_group_column = lookup_group_column or group_column
+
+    def signature(self):
+        # 用于匹配结果缓存键
+        return ('range', self.direction, self.group_column, self.lookup_group_column)
+
+
+class SortedKeyIndex:
+    # 查找键按 (分组, 键) 排序后保存，主表值用二分查找定位；同组同键只保留第一次出现的行
+
+    def __init__(self, keys, sorted_codes, groups, positions, kind, group_keys=None, rules=DEFAULT_RULES):
+        self.keys = keys  # 已排序的唯一键（原生类型）
+        self.sorted_codes = sorted_codes  # 每个排序项的 分组编码 * (键数 + 1) + 键的秩，升序
+        self.groups = groups  # 每个排序项所属分组编码，无分组时全为 0
+        self.positions = positions  # 每个排序项对应的查找表行位置
+        self.kind = kind
+        self.group_keys = group_keys  # (唯一分组值, 类型)，分组编码即其中的位置；无分组时为 None
+        self.rules = rules
+
+    @classmethod
+    def build(cls, key_values, group_values=None, rules=DEFAULT_RULES):
+        codes, uniques, kind = encode_keys(key_values, rules)
+        if group_values is not None:
+            group_codes, group_uniques, group_kind = encode_keys(group_values, rules)
+            group_keys = (group_uniques, group_kind)
+        else:
+            group_codes, group_keys = np.zeros(len(codes), dtype=np.int64), None
+
+        # 唯一键排序后的次序作为键的秩，(分组, 秩) 合成一个整数后统一排序和查找
+        key_order = np.argsort(uniques, kind='stable')
+        ranks = np.empty(len(uniques), dtype=np.int64)
+        ranks[key_order] = np.arange(len(uniques))
+        valid = np.flatnonzero((codes >= 0) & (group_codes >= 0))
+        composite = group_codes[valid] * (len(uniques) + 1) + ranks.take(codes[valid])
+        order = np.argsort(composite, kind='stable')
+        composite = composite[order]
+        first = np.r_[True, composite[1:] != composite[:-1]] if len(composite) else np.empty(0, dtype=bool)
+        return cls(uniques[key_order], composite[first], group_codes[valid][order][first], valid[order][first], kind,
+                   group_keys, rules)
+
+    def __len__(self):
+        return len(self.positions)
+
+    def group_codes(self, main_groups):
+        # 主表分组值对应的查找表分组编码，查找表中没有的分组为 -1
+        group_uniques, group_kind = self.group_keys
+        codes, uniques, kind = encode_keys(main_groups, self.rules)
+        target = common_kind(group_kind, kind, self.rules)
+        unique_codes = pd.Index(keys_as_kind(group_uniques, group_kind, target, self.rules)).get_indexer(
+            keys_as_kind(uniques, kind, target, self.rules))
+        return expand_codes(codes, unique_codes)
+
+    def resolve(self, main_values, options, main_groups=None):
+        return self.resolve_encoded(*encode_keys(main_values, self.rules), options, main_groups)
+
+    def resolve_encoded(self, codes, uniques, kind, options, main_groups=None):
+        # 返回主表每一行对应的查找表行位置，未匹配为 -1；主表和查找表各排序/查找一次，O((n + m) log m)
+        group_codes = self.group_codes(main_groups) if self.group_keys is not None else None
+        return self.resolve_ranks(codes, self.unique_ranks(uniques, kind, options), group_codes, options)
+
+    def unique_ranks(self, uniques, kind, options):
+        # 主表唯一值在查找键中的秩：le 为不大于它的最大键，ge 为不小于它的最小键
+        if len(uniques) == 0 or len(self.keys) == 0:
+            return np.full(len(uniques), -1, dtype=np.int64)
+        target = common_kind(self.kind, kind, self.rules)
+        lookup_keys = keys_as_kind(self.keys, self.kind, target, self.rules)
+        main_keys = keys_as_kind(uniques, kind, target, self.rules)
+        if target != self.kind and not np.all(lookup_keys[1:] >= lookup_keys[:-1]):
+            raise ValueError("区间匹配的主表键与查找键类型不一致，无法比较大小")
+        if options.direction == RANGE_LE:
+            return np.searchsorted(lookup_keys, main_keys, side='right') - 1
+        return np.searchsorted(lookup_keys, main_keys, side='left')
+
+    def resolve_ranks(self, codes, unique_ranks, group_codes, options):
+        # 按行在 (分组, 秩) 有序编码中二分查找；group_codes 为每行的分组编码，无分组时为 None
+        missing = np.full(len(codes), -1, dtype=np.int64)
+        if len(unique_ranks) == 0 or len(self.positions) == 0:
+            return missing
+        if group_codes is None:
+            group_codes = np.zeros(len(codes), dtype=np.int64)
+        valid = (codes >= 0) & (group_codes >= 0)
+        ranks = unique_ranks.take(np.maximum(codes, 0))
+        queries = group_codes * (len(self.keys) + 1) + ranks
+        if options.direction == RANGE_LE:
+            found = np.searchsorted(self.sorted_codes, queries, side='right') - 1
+        else:
+            found = np.searchsorted(self.sorted_codes, queries, side='left')
+        inside = (found >= 0) & (found < len(self.sorted_codes))
+        found = np.clip(found, 0, len(self.sorted_codes) - 1)
+        # 落在相邻分组中的结果表示本组没有满足条件的键
+        valid &= inside & (self.groups.take(found) == group_codes)
+        return np.where(valid, self.positions.take(found), missing)
@@ -0,0 +1,311 @@
+import os
+import numpy as np
+import pandas as pd
+
+EXCEL_MAX_ROWS = 1048576  # Excel 单个工作表的最大行数（含表头）
+DEFAULT_NA_REP = 'N/A'  # 查找结果中缺失值的默认显示文本
+
+
+class ExportCancelled(Exception):
+    pass
+
+
+def _report(progress_callback, rows_written, total_rows):
+    # progress_callback(已写入行数, 总行数) 可抛出 ExportCancelled 以中止导出
+    if progress_callback is not None:
+        progress_callback(rows_written, total_rows)
+
+
+def export_csv(df, file_path, chunk_size=100000, progress_callback=None, encoding='utf-8', na_rep=DEFAULT_NA_REP):
+    # 分块写入 CSV，每块单独格式化后追加，内存占用只与块大小相关
+    total_rows = len(df)
+    with open(file_path, 'w', encoding=encoding, newline='', buffering=1024 * 1024) as f:
+        df.iloc[:0].to_csv(f, index=False)
+        for start in range(0, total_rows, chunk_size):
+            df.iloc[start:start + chunk_size].to_csv(f, index=False, header=False, na_rep=na_rep)
+            _report(progress_callback, min(start + chunk_size, total_rows), total_rows)
+    _report(progress_callback, total_rows, total_rows)
+
+
+def _excel_rows(chunk, na_rep=None):
+    # 缺失值写为 na_rep，na_rep 为 None 时写为空单元格（与 to_excel 一致）
+    values = chunk.astype(object).to_numpy()
+    values[pd.isna(values)] = na_rep
+    return values.tolist()
+
+
+def _discard_workbook(workbook):
+    # 只写模式的工作表先把行写入 openpyxl 的临时文件，取消或出错时关闭并删除这些文件，而不是等到进程退出
+    for worksheet in workbook.worksheets:
+        try:
+            worksheet.close()
+            worksheet._writer.cleanup()
+        except Exception:
+            pass
+
+
+def export_xlsx(df, file_path, chunk_size=100000, progress_callback=None, sheet_name='Sheet',
+                max_rows_per_sheet=None, na_rep=DEFAULT_NA_REP):
+    """以 openpyxl 只写模式流式导出 xlsx，超过单表行数上限时自动拆分到多个工作表。
+
+    max_rows_per_sheet 为单表行数上限（含表头），None 表示 EXCEL_MAX_ROWS；
+    na_rep 为缺失值写入的文本，None 表示保留为空单元格。返回写入的工作表数量。
+    """
+    from openpyxl import Workbook
+
+    workbook = Workbook(write_only=True)
+    header = [str(col) for col in df.columns]
+    data_rows_per_sheet = (max_rows_per_sheet or EXCEL_MAX_ROWS) - 1
+    total_rows = len(df)
+    sheet_count = max(1, -(-total_rows // data_rows_per_sheet))
+
+    try:
+        for sheet_index in range(sheet_count):
+            worksheet = workbook.create_sheet(f"{sheet_name}{sheet_index + 1}")
+            worksheet.append(header)
+            sheet_start = sheet_index * data_rows_per_sheet
+            sheet_end = min(sheet_start + data_rows_per_sheet, total_rows)
+            for start in range(sheet_start, sheet_end, chunk_size):
+                end = min(start + chunk_size, sheet_end)
+                for row in _excel_rows(df.iloc[start:end], na_rep):
+                    worksheet.append(row)
+                _report(progress_callback, end, total_rows)
+    except BaseException:
+        _discard_workbook(workbook)
+        raise
+
+    workbook.save(file_path)
+    _report(progress_callback, total_rows, total_rows)
+    return sheet_count
+
+
+def _pdf_font():
+    # 优先使用 reportlab 内置的中文字体，使中文列名和内容可以正常显示
+    from reportlab.pdfbase import pdfmetrics
+    from reportlab.pdfbase.cidfonts import UnicodeCIDFont
+
+    try:
+        pdfmetrics.registerFont(UnicodeCIDFont('STSong-Light'))
+        return 'STSong-Light'
+    except Exception:
+        return 'Helvetica'
+
+
+def _pdf_row_positions(total_rows, max_rows=None, sample=False):
+    # 行数上限：sample 为 True 时在全部行中均匀抽样，否则只取前 max_rows 行
+    if not max_rows or total_rows <= max_rows:
+        return np.arange(total_rows)
+    if sample:
+        return np.unique(np.linspace(0, total_rows - 1, max_rows).astype(np.int64))
+    return np.arange(max_rows)
+
+
+def _pdf_text(chunk, na_rep=''):
+    values = chunk.astype(object).to_numpy()
+    return [[na_rep if pd.isna(value) else str(value) for value in row] for row in values]
+
+
+def _fit_column_widths(df, positions, font, font_size, available_width, sample_size=200, na_rep=''):
+    # 根据表头和抽样行的文字宽度估算列宽，总宽度超过页面时按比例缩放
+    from reportlab.pdfbase.pdfmetrics import stringWidth
+
+    padding = 6
+    sample = positions[np.unique(np.linspace(0, len(positions) - 1, min(sample_size, len(positions))).astype(np.int64))] \
+        if len(positions) else positions
+    rows = _pdf_text(df.iloc[sample], na_rep)
+    widths = []
+    for i, column in enumerate(df.columns):
+        texts = [str(column)] + [row[i] for row in rows]
+        widths.append(max(stringWidth(text, font, font_size) for text in texts) + padding)
+    total_width = sum(widths)
+    if total_width > available_width:
+        widths = [width * available_width / total_width for width in widths]
+    return widths
+
+
+def _fit_text(text, width, font, font_size):
+    # 超出列宽的文字截断并加省略号
+    from reportlab.pdfbase.pdfmetrics import stringWidth
+
+    if len(text) * font_size <= width or stringWidth(text, font, font_size) <= width:
+        return text  # 每个字符最宽为一个字号，足够短的文字无需测量
+    while text and stringWidth(text + '…', font, font_size) > width:
+        text = text[:max(0, min(len(text) - 1, int(len(text) * width / stringWidth(text, font, font_size))))]
+    return text + '…' if text else ''
+
+
+def export_pdf(df, file_path, chunk_size=100000, progress_callback=None, max_rows=None, sample=False,
+               title='VLOOKUP Results', na_rep=DEFAULT_NA_REP):
+    """逐页绘制 PDF 表格，每页重复表头；只在绘制当前页时格式化该页的行。
+
+    max_rows 为行数上限（None 表示不限），sample 为 True 时在全部行中均匀抽样。
+    """
+    from reportlab.lib import colors
+    from reportlab.lib.pagesizes import letter, landscape
+    from reportlab.pdfgen import canvas
+
+    font = _pdf_font()
+    font_size = 8
+    row_height = font_size * 2
+    margin = 36
+    title_height = 30
+    page_width, page_height = landscape(letter)
+
+    positions = _pdf_row_positions(len(df), max_rows, sample)
+    widths = _fit_column_widths(df, positions, font, font_size, page_width - 2 * margin, na_rep=na_rep)
+    table_width = sum(widths)
+    headers = [_fit_text(str(column), width - 4, font, font_size) for column, width in zip(df.columns, widths)]
+    total_rows = len(positions)
+
+    pdf = canvas.Canvas(file_path, pagesize=(page_width, page_height), pageCompression=1)
+    page_start = 0
+    first_page = True
+    while first_page or page_start < total_rows:
+        top = page_height - margin
+        if first_page:
+            pdf.setFont(font, 16)
+            pdf.drawString(margin, top - 16, title)
+            top -= title_height
+        rows_per_page = max(1, int((top - margin) // row_height) - 1)
+        page_positions = positions[page_start:page_start + rows_per_page]
+
+        # 表头
+        pdf.setFillColor(colors.grey)
+        pdf.rect(margin, top - row_height, table_width, row_height, stroke=0, fill=1)
+        pdf.setFillColor(colors.whitesmoke)
+        pdf.setFont(font, font_size)
+        x = margin
+        for header, width in zip(headers, widths):
+            pdf.drawString(x + 2, top - row_height + font_size * 0.6, header)
+            x += width
+
+        # 数据行
+        body_height = row_height * len(page_positions)
+        pdf.setFillColor(colors.beige)
+        pdf.rect(margin, top - row_height - body_height, table_width, body_height, stroke=0, fill=1)
+        pdf.setFillColor(colors.black)
+        y = top - row_height
+        for row in _pdf_text(df.iloc[page_positions], na_rep):
+            y -= row_height
+            x = margin
+            for text, width in zip(row, widths):
+                pdf.drawString(x + 2, y + font_size * 0.6, _fit_text(text, width - 4, font, font_size))
+                x += width
+
+        # 网格线
+        pdf.setStrokeColor(colors.black)
+        pdf.setLineWidth(0.5)
+        bottom = top - row_height - body_height
+        for i in range(len(page_positions) + 2):
+            pdf.line(margin, top - i * row_height, margin + table_width, top - i * row_height)
+        x = margin
+        for width in [0] + widths:
+            x += width
+            pdf.line(x, top, x, bottom)
+
+        pdf.showPage()
+        first_page = False
+        page_start += rows_per_page
+        _report(progress_callback, min(page_start, total_rows), total_rows)
+
+    pdf.save()
+    _report(progress_callback, total_rows, total_rows)
+
+
+class StreamingWriter:
+    """逐块追加写出 csv 或 xlsx，用于结果无法整体放入内存的场景（磁盘分区查找）。
+
+    与 export_dataframe 相同：先写入 .part 临时文件，close 时替换目标文件；出错或取消时 abort 删除临时文件。
+    xlsx 超过单表行数上限时自动写入下一个工作表。
+    """
+
+    def __init__(self, file_path, na_rep=DEFAULT_NA_REP, xlsx_keep_empty=False, sheet_name='Sheet',
+                 max_rows_per_sheet=None, encoding='utf-8'):
+        if file_path.endswith('.pdf'):
+            raise ValueError("逐块写出只支持 csv 和 xlsx 格式")
+        if not file_path.endswith(('.csv', '.xlsx')):
+            file_path = file_path + '.xlsx'
+        self.file_path = file_path
+        self.part_path = file_path + '.part'
+        self.na_rep = na_rep
+        self.rows_written = 0
+        self.header = None
+        if file_path.endswith('.csv'):
+            self.csv_file = open(self.part_path, 'w', encoding=encoding, newline='', buffering=1024 * 1024)
+            self.workbook = None
+        else:
+            from openpyxl import Workbook
+
+            self.csv_file = None
+            self.workbook = Workbook(write_only=True)
+            self.cell_na_rep = None if xlsx_keep_empty else na_rep
+            self.sheet_name = sheet_name
+            self.data_rows_per_sheet = (max_rows_per_sheet or EXCEL_MAX_ROWS) - 1
+            self.worksheet = None
+            self.sheet_rows = 0
+
+    def write(self, chunk):
+        if self.header is None:
+            self.header = [str(col) for col in chunk.columns]
+            if self.csv_file is not None:
+                chunk.iloc[:0].to_csv(self.csv_file, index=False)
+        if self.csv_file is not None:
+            chunk.to_csv(self.csv_file, index=False, header=False, na_rep=self.na_rep)
+        else:
+            rows = _excel_rows(chunk, self.cell_na_rep)
+            start = 0
+            while start < len(rows):
+                if self.worksheet is None or self.sheet_rows >= self.data_rows_per_sheet:
+                    self.worksheet = self.workbook.create_sheet(
+                        f"{self.sheet_name}{len(self.workbook.worksheets) + 1}")
+                    self.worksheet.append(self.header)
+                    self.sheet_rows = 0
+                end = min(len(rows), start + self.data_rows_per_sheet - self.sheet_rows)
+                for row in rows[start:end]:
+                    self.worksheet.append(row)
+                self.sheet_rows += end - start
+                start = end
+        self.rows_written += len(chunk)
+
+    def close(self):
+        if self.csv_file is not None:
+            self.csv_file.close()
+        else:
+            if self.worksheet is None:
+                self.worksheet = self.workbook.create_sheet(f"{self.sheet_name}1")
+                if self.header is not None:
+                    self.worksheet.append(self.header)
+            self.workbook.save(self.part_path)
+        os.replace(self.part_path, self.file_path)
+        return self.file_path
+
+    def abort(self):
+        if self.csv_file is not None:
+            self.csv_file.close()
+        else:
+            _discard_workbook(self.workbook)
+        if os.path.exists(self.part_path):
+            os.remove(self.part_path)
+
+
+def export_dataframe(df, file_path, chunk_size=100000, progress_callback=None, pdf_max_rows=None, pdf_sample=False,
+                     na_rep=DEFAULT_NA_REP, xlsx_keep_empty=False):
+    # 按扩展名选择导出格式，未知扩展名按 xlsx 导出；返回实际写入的文件路径
+    # 缺失值在写出时替换为 na_rep，xlsx_keep_empty 为 True 时 xlsx 中保留为空单元格
+    # 先写入临时文件，完成后再替换目标文件，取消或出错时不会留下不完整的文件
+    if not file_path.endswith(('.csv', '.xlsx', '.pdf')):
+        file_path = file_path + '.xlsx'
+    part_path = file_path + '.part'
+    try:
+        if file_path.endswith('.csv'):
+            export_csv(df, part_path, chunk_size, progress_callback, na_rep=na_rep)
+        elif file_path.endswith('.pdf'):
+            export_pdf(df, part_path, chunk_size, progress_callback, pdf_max_rows, pdf_sample, na_rep=na_rep)
+        else:
+            export_xlsx(df, part_path, chunk_size, progress_callback, na_rep=None if xlsx_keep_empty else na_rep)
+        os.replace(part_path, file_path)
+    except BaseException:
+        if os.path.exists(part_path):
+            os.remove(part_path)
+        raise
+    return file_path
@@ -0,0 +1,62 @@
+import time
+import cProfile
+import logging
+from contextlib import contextmanager, nullcontext
+
+
+class StageTimer:
+    # 记录一次运行中各阶段的耗时和行数，可选地用 cProfile 采集同一次运行的调用统计
+
+    def __init__(self, title, profile=False):
+        self.title = title
+        self.records = []  # (阶段名称, 秒, 行数或 None)
+        self.profiler = cProfile.Profile() if profile else None
+        self.started = time.perf_counter()
+        self.total = None
+
+    @contextmanager
+    def stage(self, name, rows=None):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.records.append((name, time.perf_counter() - started, rows))
+
+    def add(self, name, seconds, rows=None):
+        self.records.append((name, seconds, rows))
+
+    def start_profile(self):
+        # cProfile 只采集调用 enable 的线程，因此需要在执行工作的线程中调用
+        if self.profiler is not None:
+            self.profiler.enable()
+
+    def stop_profile(self):
+        if self.profiler is not None:
+            self.profiler.disable()
+
+    def finish(self):
+        self.stop_profile()
+        self.total = time.perf_counter() - self.started
+        return self
+
+    def save_profile(self, file_path):
+        # 保存为 pstats 格式，可用 python -m pstats 或 snakeviz 等工具离线分析
+        self.profiler.dump_stats(file_path)
+
+    def summary_lines(self):
+        lines = []
+        for name, seconds, rows in self.records:
+            suffix = f", {rows} 行" if rows is not None else ""
+            lines.append(f"{name}: {seconds:.3f} 秒{suffix}")
+        if self.total is not None:
+            lines.append(f"总计: {self.total:.3f} 秒")
+        return lines
+
+    def log(self, level=logging.INFO):
+        for line in self.summary_lines():
+            logging.log(level, f"[{self.title}] {line}")
+
+
+def timed_stage(timer, name, rows=None):
+    # 未传入计时器时返回空上下文，调用方无需判断
+    return timer.stage(name, rows) if timer is not None else nullcontext()
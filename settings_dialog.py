@@ -1,5 +1,6 @@
 from PyQt6.QtWidgets import (QDialog, QVBoxLayout, QHBoxLayout, QLabel, QComboBox, 
-                             QCheckBox, QPushButton, QLineEdit, QDialogButtonBox)
+                             QCheckBox, QPushButton, QLineEdit, QDialogButtonBox, QSpinBox,
+                             QFileDialog)
 from PyQt6.QtCore import QSettings
 
 class SettingsDialog(QDialog):
@@ -51,6 +52,72 @@ class SettingsDialog(QDialog):
         update_source_layout.addWidget(self.update_source_input)
         layout.addLayout(update_source_layout)
 
+        pdf_layout = QHBoxLayout()
+        pdf_layout.addWidget(QLabel("PDF最大行数 (0为不限):"))
+        self.pdf_max_rows_spin = QSpinBox()
+        self.pdf_max_rows_spin.setRange(0, 10000000)
+        self.pdf_max_rows_spin.setValue(self.settings.value("pdf_max_rows", 50000, type=int))
+        pdf_layout.addWidget(self.pdf_max_rows_spin)
+        layout.addLayout(pdf_layout)
+
+        self.pdf_sample_check = QCheckBox("超过PDF最大行数时均匀抽样（否则只导出前面的行）")
+        self.pdf_sample_check.setChecked(self.settings.value("pdf_sample_rows", False, type=bool))
+        layout.addWidget(self.pdf_sample_check)
+
+        na_layout = QHBoxLayout()
+        na_layout.addWidget(QLabel("未匹配单元格显示为:"))
+        self.na_rep_input = QLineEdit(self.settings.value("na_rep", "N/A"))
+        na_layout.addWidget(self.na_rep_input)
+        layout.addLayout(na_layout)
+
+        self.xlsx_keep_empty_check = QCheckBox("导出xlsx时未匹配单元格保留为空")
+        self.xlsx_keep_empty_check.setChecked(self.settings.value("xlsx_keep_empty", False, type=bool))
+        layout.addWidget(self.xlsx_keep_empty_check)
+
+        self.parse_cache_check = QCheckBox("启用解析缓存（再次打开文件时跳过Excel解析）")
+        self.parse_cache_check.setChecked(self.settings.value("parse_cache_enabled", True, type=bool))
+        layout.addWidget(self.parse_cache_check)
+
+        cache_dir_layout = QHBoxLayout()
+        cache_dir_layout.addWidget(QLabel("缓存位置:"))
+        self.parse_cache_dir_input = QLineEdit(self.settings.value("parse_cache_dir", ""))
+        self.parse_cache_dir_input.setPlaceholderText("默认位置")
+        cache_dir_layout.addWidget(self.parse_cache_dir_input)
+        browse_button = QPushButton("浏览...")
+        browse_button.clicked.connect(self.browse_cache_dir)
+        cache_dir_layout.addWidget(browse_button)
+        layout.addLayout(cache_dir_layout)
+
+        cache_size_layout = QHBoxLayout()
+        cache_size_layout.addWidget(QLabel("最大缓存大小 (MB):"))
+        self.parse_cache_size_spin = QSpinBox()
+        self.parse_cache_size_spin.setRange(64, 1024 * 1024)
+        self.parse_cache_size_spin.setValue(self.settings.value("parse_cache_max_mb", 2048, type=int))
+        cache_size_layout.addWidget(self.parse_cache_size_spin)
+        layout.addLayout(cache_size_layout)
+
+        layout.addWidget(QLabel("查找键比较规则:"))
+        self.key_trim_check = QCheckBox("忽略首尾空格")
+        self.key_trim_check.setChecked(self.settings.value("key_trim", True, type=bool))
+        layout.addWidget(self.key_trim_check)
+        self.key_casefold_check = QCheckBox("忽略大小写")
+        self.key_casefold_check.setChecked(self.settings.value("key_casefold", False, type=bool))
+        layout.addWidget(self.key_casefold_check)
+        self.key_fold_width_check = QCheckBox("全角与半角字符视为相同")
+        self.key_fold_width_check.setChecked(self.settings.value("key_fold_width", False, type=bool))
+        layout.addWidget(self.key_fold_width_check)
+        self.key_canonical_numbers_check = QCheckBox("数值相等即匹配（1 与 1.0 视为相同）")
+        self.key_canonical_numbers_check.setChecked(self.settings.value("key_canonical_numbers", True, type=bool))
+        layout.addWidget(self.key_canonical_numbers_check)
+
+        fuzzy_layout = QHBoxLayout()
+        fuzzy_layout.addWidget(QLabel("模糊匹配最低相似度 (%):"))
+        self.fuzzy_threshold_spin = QSpinBox()
+        self.fuzzy_threshold_spin.setRange(1, 100)
+        self.fuzzy_threshold_spin.setValue(self.settings.value("fuzzy_threshold", 80, type=int))
+        fuzzy_layout.addWidget(self.fuzzy_threshold_spin)
+        layout.addLayout(fuzzy_layout)
+
         buttons = QDialogButtonBox(
             QDialogButtonBox.StandardButton.Ok | QDialogButtonBox.StandardButton.Cancel
         )
@@ -60,6 +127,11 @@ class SettingsDialog(QDialog):
         buttons.button(QDialogButtonBox.StandardButton.Cancel).setText("取消")
         layout.addWidget(buttons)
 
+    def browse_cache_dir(self):
+        directory = QFileDialog.getExistingDirectory(self, "选择缓存位置", self.parse_cache_dir_input.text())
+        if directory:
+            self.parse_cache_dir_input.setText(directory)
+
     def accept(self):
         log_level_map = {"调试": "DEBUG", "信息": "INFO", "警告": "WARNING", "错误": "ERROR", "严重": "CRITICAL"}
         self.settings.setValue("log_level", log_level_map[self.log_level_combo.currentText()])
@@ -69,4 +141,16 @@ class SettingsDialog(QDialog):
         
         self.settings.setValue("auto_update_check", self.auto_update_check.isChecked())
         self.settings.setValue("update_source", self.update_source_input.text())
+        self.settings.setValue("pdf_max_rows", self.pdf_max_rows_spin.value())
+        self.settings.setValue("pdf_sample_rows", self.pdf_sample_check.isChecked())
+        self.settings.setValue("na_rep", self.na_rep_input.text())
+        self.settings.setValue("xlsx_keep_empty", self.xlsx_keep_empty_check.isChecked())
+        self.settings.setValue("parse_cache_enabled", self.parse_cache_check.isChecked())
+        self.settings.setValue("parse_cache_dir", self.parse_cache_dir_input.text())
+        self.settings.setValue("parse_cache_max_mb", self.parse_cache_size_spin.value())
+        self.settings.setValue("key_trim", self.key_trim_check.isChecked())
+        self.settings.setValue("key_casefold", self.key_casefold_check.isChecked())
+        self.settings.setValue("key_fold_width", self.key_fold_width_check.isChecked())
+        self.settings.setValue("key_canonical_numbers", self.key_canonical_numbers_check.isChecked())
+        self.settings.setValue("fuzzy_threshold", self.fuzzy_threshold_spin.value())
         super().accept()
\ No newline at end of file
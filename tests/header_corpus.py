@@ -0,0 +1,76 @@
+"""表头检测回归测试用的合成工作表语料。
+
+每个工作表由固定随机种子生成，覆盖标题行、空行、无表头的纯数据、重复或缺失的列名、数字列名、
+日期列、特殊字符和只有一两行的短表等情况；make_corpus 返回 [(工作表名, 行列表)]，write_corpus 写入一个 xlsx 文件。
+"""
+import datetime
+
+import numpy as np
+
+HEADER_WORDS = ['id', 'name', 'date', 'value', 'code', 'type', 'category', 'description',
+                '编号', '姓名', '金额', '部门', '备注', '数量', 'Region', 'Total']
+TEXT_VALUES = ['alpha', 'beta', '张三', '李四', 'N/A', 'x-1', 'a_b', '#REF', 'long text value here', '']
+
+
+def _cell(rng, kind, row):
+    if kind == 'int':
+        return int(rng.integers(-1000, 100000))
+    if kind == 'float':
+        return round(float(rng.normal(100, 50)), int(rng.integers(0, 4)))
+    if kind == 'date':
+        return datetime.datetime(2020, 1, 1) + datetime.timedelta(days=int(rng.integers(0, 2000)))
+    if kind == 'code':
+        return f"K{row:05d}"
+    if kind == 'bool':
+        return bool(rng.integers(0, 2))
+    value = TEXT_VALUES[int(rng.integers(0, len(TEXT_VALUES)))]
+    return value or None
+
+
+def _header(rng, width, style):
+    if style == 'numeric':
+        return [2000 + i for i in range(width)]
+    names = [str(rng.choice(HEADER_WORDS)) if rng.random() < 0.7 else f"col{i}" for i in range(width)]
+    if style == 'gaps':
+        names = [None if rng.random() < 0.3 else name for name in names]
+    elif style == 'duplicates' and width > 1:
+        names[-1] = names[0]
+    return names
+
+
+def make_sheet(rng):
+    width = int(rng.integers(1, 9))
+    kinds = [str(rng.choice(['int', 'float', 'date', 'code', 'text', 'bool'])) for _ in range(width)]
+    data_rows = int(rng.choice([0, 1, 2, 5, 12, 30]))
+    rows = []
+    for _ in range(int(rng.choice([0, 0, 1, 2, 3]))):
+        # 标题行和说明行，可能带空行
+        rows.append([str(rng.choice(['销售报表', 'Report 2024', '单位：元', '***']))] + [None] * int(rng.integers(0, width)))
+        if rng.random() < 0.4:
+            rows.append([])
+    style = str(rng.choice(['plain', 'plain', 'gaps', 'duplicates', 'numeric', 'none']))
+    if style != 'none':
+        rows.append(_header(rng, width, style))
+    missing = float(rng.choice([0, 0.1, 0.4]))
+    for r in range(data_rows):
+        rows.append([None if rng.random() < missing else _cell(rng, kinds[c], r) for c in range(width)])
+    if not rows:
+        rows.append(['only'])
+    return rows
+
+
+def make_corpus(count=120, seed=0):
+    rng = np.random.default_rng(seed)
+    return [(f"s{i:03d}", make_sheet(rng)) for i in range(count)]
+
+
+def write_corpus(corpus, path):
+    from openpyxl import Workbook
+
+    workbook = Workbook(write_only=True)
+    for sheet_name, rows in corpus:
+        worksheet = workbook.create_sheet(sheet_name)
+        for row in rows:
+            worksheet.append(row)
+    workbook.save(path)
+    return path
@@ -0,0 +1,94 @@
+import pandas as pd
+import pytest
+
+from workbook_loader import HEADER_SCAN_ROWS, detect_header_row, parse_sheet, raw_header_row, scan_workbook
+from header_corpus import make_corpus, write_corpus
+
+pytest.importorskip('openpyxl')
+
+
+def legacy_detect_header_row(df, max_rows=10):
+    # 向量化之前的逐行评分实现，作为检测结果的参照
+    scores = []
+    common_header_words = ['id', 'name', 'date', 'time', 'value', 'code', 'type', 'category', 'description']
+
+    for i in range(min(max_rows, len(df))):
+        row = df.iloc[i]
+        score = 0
+
+        if i == 0:
+            score += 2
+        elif i == 1:
+            score += 1.5
+
+        string_ratio = row.apply(lambda x: isinstance(x, str)).mean()
+        score += string_ratio * 2
+
+        non_null_ratio = 1 - row.isnull().mean()
+        score += non_null_ratio
+
+        dtype_consistency = len(set(row.apply(type))) / len(row)
+        score += (1 - dtype_consistency)
+
+        lengths = row.apply(lambda x: len(str(x)) if x is not None else 0)
+        length_consistency = 1 - (lengths.std() / lengths.mean() if lengths.mean() > 0 else 0)
+        score += length_consistency
+        score += 1 / (lengths.mean() + 1)
+
+        special_char_ratio = row.apply(lambda x: sum(not c.isalnum() and not c.isspace() for c in str(x)) / len(str(x)) if x is not None else 0).mean()
+        score -= special_char_ratio
+
+        lower_row = row.astype(str).str.lower()
+        keyword_match = any(lower_row.str.contains(word).any() for word in common_header_words)
+        score += 2 if keyword_match else 0
+
+        if row.dtype.name.startswith('int') or row.dtype.name.startswith('float'):
+            score -= 1
+
+        if not row.isnull().any():
+            score += 0.5
+
+        if row.nunique() == len(row):
+            score += 0.5
+
+        scores.append(score)
+
+    best_row = scores.index(max(scores))
+    return best_row
+
+
+@pytest.fixture(scope='module')
+def corpus_file(tmp_path_factory):
+    corpus = make_corpus()
+    path = write_corpus(corpus, str(tmp_path_factory.mktemp('corpus') / 'corpus.xlsx'))
+    return path, [sheet_name for sheet_name, _ in corpus]
+
+
+def legacy_header(path, sheet_name, nrows=None):
+    # 旧实现：read_excel 默认表头解析后逐行评分，空表视为第 0 行
+    df = pd.read_excel(path, sheet_name=sheet_name, engine='openpyxl', nrows=nrows)
+    return legacy_detect_header_row(df) if len(df) and df.shape[1] else 0
+
+
+def test_detect_header_row_matches_legacy(corpus_file):
+    path, sheet_names = corpus_file
+    for sheet_name in sheet_names:
+        df = pd.read_excel(path, sheet_name=sheet_name, engine='openpyxl')
+        expected = legacy_detect_header_row(df) if len(df) and df.shape[1] else 0
+        assert detect_header_row(df) == expected, sheet_name
+
+
+def test_detect_header_from_preview_matches_legacy(corpus_file):
+    # 预览只有前几行，列类型按这几行推断，因此与只读取同样行数的旧实现比较
+    path, sheet_names = corpus_file
+    scan = scan_workbook(path)
+    for sheet_name in sheet_names:
+        expected = raw_header_row(legacy_header(path, sheet_name, nrows=HEADER_SCAN_ROWS))
+        assert scan[sheet_name]['detected_header'] == expected, sheet_name
+
+
+def test_parse_sheet_detection_matches_legacy(corpus_file):
+    path, sheet_names = corpus_file
+    for sheet_name in sheet_names:
+        _, detected = parse_sheet(path, sheet_name)
+        assert detected == raw_header_row(legacy_header(path, sheet_name)), sheet_name
@@ -0,0 +1,55 @@
+import os
+
+import pandas as pd
+
+from index_cache import IndexCache
+from key_normalizer import KeyRules
+from workbook_loader import file_signature
+
+
+def test_key_follows_recorded_signature(tmp_path):
+    # 键由读取数据之前记录的签名决定，之后文件被修改不会改变已记录数据的键
+    source = tmp_path / 'book.xlsx'
+    source.write_bytes(b'old')
+    cache = IndexCache(str(tmp_path / 'cache'))
+    loaded_signature = file_signature(str(source))
+    key = cache.cache_key(str(source), 'Sheet1', 'id', 0, loaded_signature)
+
+    source.write_bytes(b'changed content')
+    os.utime(source, ns=(loaded_signature['mtime_ns'] + 10 ** 9, loaded_signature['mtime_ns'] + 10 ** 9))
+    assert cache.cache_key(str(source), 'Sheet1', 'id', 0, loaded_signature) == key
+    assert cache.cache_key(str(source), 'Sheet1', 'id', 0, file_signature(str(source))) != key
+
+
+def test_unknown_signature_skips_cache(tmp_path):
+    cache = IndexCache(str(tmp_path / 'cache'))
+    assert cache.cache_key(str(tmp_path / 'missing.xlsx'), 'Sheet1', 'id', 0, None) is None
+    index = cache.get_or_build(None, pd.Series([1, 2, 3]))
+    assert index.resolve(pd.Series([2, 4])).tolist() == [1, -1]
+    assert not os.path.exists(cache.cache_dir)
+
+
+def test_key_depends_on_rules(tmp_path):
+    # 规则不同的索引不能混用：任一规则变化都得到不同的键
+    source = tmp_path / 'book.xlsx'
+    source.write_bytes(b'data')
+    cache = IndexCache(str(tmp_path / 'cache'))
+    signature = file_signature(str(source))
+    keys = {cache.cache_key(str(source), 'Sheet1', 'id', 0, signature, KeyRules(**{name: not value}))
+            for name, value in KeyRules().to_dict().items()}
+    keys.add(cache.cache_key(str(source), 'Sheet1', 'id', 0, signature, KeyRules()))
+    assert len(keys) == 5
+    assert cache.cache_key(str(source), 'Sheet1', 'id', 0, signature) == \
+        cache.cache_key(str(source), 'Sheet1', 'id', 0, signature, KeyRules())
+
+
+def test_cached_index_keeps_rules(tmp_path):
+    source = tmp_path / 'book.xlsx'
+    source.write_bytes(b'data')
+    cache = IndexCache(str(tmp_path / 'cache'))
+    rules = KeyRules(casefold=True)
+    key = cache.cache_key(str(source), 'Sheet1', 'id', 0, file_signature(str(source)), rules)
+    keys = pd.Series(['Alpha', 'beta'])
+    cache.get_or_build(key, keys, rules)
+    index = cache.get(key, expected_rows=2, rules=rules)
+    assert index.resolve(pd.Series(['ALPHA', 'Beta', 'gamma'])).tolist() == [0, 1, -1]
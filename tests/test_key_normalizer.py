@@ -0,0 +1,35 @@
+import pandas as pd
+import pytest
+
+from key_normalizer import KeyRules, encode_keys
+from lookup_engine import vlookup
+
+
+@pytest.mark.parametrize('rule, main_keys, lookup_keys', [
+    ('trim', [' a1 ', 'b2'], ['a1', 'b2']),
+    ('casefold', ['ABC', 'b2'], ['abc', 'b2']),
+    ('fold_width', ['ＡＢ１２', 'b2'], ['AB12', 'b2']),
+    ('canonical_numbers', pd.Series([1, 3], dtype='int64'), pd.Series([1.0, 3.5], dtype='float64')),
+])
+def test_rule_controls_matching(rule, main_keys, lookup_keys):
+    # 每条规则只改变自身：开启时第一行匹配，关闭时不匹配；第二行在两种情况下结果相同
+    main = pd.DataFrame({'id': main_keys})
+    lookup = pd.DataFrame({'id': lookup_keys, 'v': ['hit', 'other']})
+    on = vlookup(main, 'id', [(lookup, 'id')], ['v'], key_rules=KeyRules(**{rule: True}))
+    off = vlookup(main, 'id', [(lookup, 'id')], ['v'], key_rules=KeyRules(**{rule: False}))
+    assert on['v'][0] == 'hit'
+    assert pd.isna(off['v'][0])
+    assert on['v'].iloc[1:].equals(off['v'].iloc[1:])
+
+
+def test_rules_do_not_modify_input():
+    keys = pd.Series([' A ', 'ｂ'], dtype=object)
+    encode_keys(keys, KeyRules(trim=True, casefold=True, fold_width=True))
+    assert keys.tolist() == [' A ', 'ｂ']
+
+
+def test_rules_round_trip_and_signature():
+    rules = KeyRules(trim=False, casefold=True, fold_width=True, canonical_numbers=False)
+    assert KeyRules.from_dict(rules.to_dict()) == rules
+    signatures = {KeyRules(**{name: not value}).signature() for name, value in KeyRules().to_dict().items()}
+    assert len(signatures) == 4 and KeyRules().signature() not in signatures
@@ -0,0 +1,140 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from key_normalizer import KeyRules
+from lookup_engine import LookupIndex, CompositeIndex, LookupCancelled, vlookup
+from fuzzy_match import FuzzyIndex, FuzzyMatch
+from range_match import RangeMatch
+
+
+def values(series):
+    # 缺失值统一为 None，便于与期望列表比较
+    return [None if pd.isna(value) else value for value in series]
+
+
+@pytest.mark.parametrize('lookup_keys', [
+    pd.Series([], dtype=object),
+    pd.Series([None, None], dtype=object),
+    pd.Series(['', '  '], dtype=object),
+])
+def test_empty_or_blank_lookup_returns_missing(lookup_keys):
+    main = pd.DataFrame({'id': [1, 2, None]})
+    lookup = pd.DataFrame({'id': lookup_keys, 'name': pd.Series(['x'] * len(lookup_keys), dtype=object)})
+    result = vlookup(main, 'id', [(lookup, 'id')], ['name'])
+    assert len(result) == 3
+    assert values(result['name']) == [None, None, None]
+
+
+def test_empty_index_match():
+    index = LookupIndex.build(pd.Series([], dtype=object))
+    assert index.resolve(pd.Series(['a', 'b'])).tolist() == [-1, -1]
+
+
+def test_first_match_wins():
+    main = pd.DataFrame({'id': ['a', 'b', 'c']})
+    lookup = pd.DataFrame({'id': ['b', 'a', 'b', 'a'], 'v': [1, 2, 3, 4]})
+    result = vlookup(main, 'id', [(lookup, 'id')], ['v'])
+    assert values(result['v']) == [2, 1, None]
+
+
+def test_mixed_int_float_text_keys():
+    main = pd.DataFrame({'id': pd.Series([1, 2.0, '3', ' 4 ', 5.5], dtype=object)})
+    lookup = pd.DataFrame({'id': pd.Series(['1', 2, 3.0, 4, '5.5'], dtype=object), 'v': list('abcde')})
+    result = vlookup(main, 'id', [(lookup, 'id')], ['v'])
+    assert values(result['v']) == ['a', 'b', 'c', 'd', 'e']
+
+
+def test_numeric_keys_without_canonical_numbers():
+    main = pd.DataFrame({'id': [1.0, 2.0]})
+    lookup = pd.DataFrame({'id': pd.Series(['1', '2.0'], dtype=object), 'v': ['a', 'b']})
+    result = vlookup(main, 'id', [(lookup, 'id')], ['v'], key_rules=KeyRules(canonical_numbers=False))
+    assert values(result['v']) == [None, 'b']
+
+
+def test_first_table_claims_return_column():
+    main = pd.DataFrame({'id': [1, 2]})
+    first = pd.DataFrame({'id': [1], 'v': ['first']})
+    second = pd.DataFrame({'id': [1, 2], 'v': ['second', 'second'], 'w': ['x', 'y']})
+    result = vlookup(main, 'id', [(first, 'id'), (second, 'id')], ['v', 'w'])
+    assert list(result.columns) == ['id', 'v', 'w']
+    assert values(result['v']) == ['first', None]
+    assert values(result['w']) == ['x', 'y']
+
+
+def test_composite_keys_match_merge():
+    rng = np.random.default_rng(0)
+    main = pd.DataFrame({'a': rng.integers(0, 20, 500), 'b': rng.choice(['x', 'y', 'z'], 500)})
+    lookup = pd.DataFrame({'a': rng.integers(0, 20, 200), 'b': rng.choice(['x', 'y', 'z'], 200),
+                           'v': np.arange(200)})
+    result = vlookup(main, ['a', 'b'], [(lookup, ['a', 'b'])], ['v'])
+    expected = main.merge(lookup.drop_duplicates(['a', 'b']), on=['a', 'b'], how='left')
+    assert values(result['v']) == values(expected['v'])
+
+
+def test_composite_keys_with_blank_lookup_column():
+    main = pd.DataFrame({'a': [1, 2], 'b': ['x', 'y']})
+    lookup = pd.DataFrame({'a': [None, None], 'b': ['x', 'y'], 'v': [1, 2]})
+    result = vlookup(main, ['a', 'b'], [(lookup, ['a', 'b'])], ['v'])
+    assert values(result['v']) == [None, None]
+    assert len(CompositeIndex.build([lookup['a'], lookup['b']])) == 0
+
+
+def chunking_tables():
+    rng = np.random.default_rng(1)
+    main = pd.DataFrame({'id': rng.integers(0, 3000, 5000), 'name': [f"item {i}" for i in rng.integers(0, 3000, 5000)],
+                         'grp': rng.integers(0, 3, 5000)})
+    exact = pd.DataFrame({'id': np.arange(0, 3000, 2), 'count': np.arange(1500), 'label': [f"L{i}" for i in range(1500)]})
+    fuzzy = pd.DataFrame({'name': [f"item {i}x" for i in range(0, 3000, 3)], 'score': np.arange(1000) * 0.5})
+    ranged = pd.DataFrame({'id': np.arange(0, 3000, 100), 'grp': np.arange(30) % 3, 'band': np.arange(30)})
+    composite = pd.DataFrame({'id': np.arange(0, 3000, 5), 'grp': np.arange(600) % 3, 'flag': np.arange(600) % 2 == 0})
+    return main, exact, fuzzy, ranged, composite
+
+
+@pytest.mark.parametrize('case', ['exact', 'fuzzy', 'range', 'composite'])
+def test_chunked_lookup_matches_single_chunk(case):
+    main, exact, fuzzy, ranged, composite = chunking_tables()
+    args = {
+        'exact': ('id', [(exact, 'id')], ['count', 'label'], None),
+        'fuzzy': ('name', [(fuzzy, 'name')], ['score'], [FuzzyMatch(threshold=0.6, chunk_size=300)]),
+        'range': ('id', [(ranged, 'id')], ['band'], [RangeMatch(group_column='grp')]),
+        'composite': (['id', 'grp'], [(composite, ['id', 'grp'])], ['flag'], None),
+    }[case]
+    main_column, tables, return_columns, options = args
+    whole = vlookup(main, main_column, tables, return_columns, match_options=options)
+    chunked = vlookup(main, main_column, tables, return_columns, match_options=options, chunk_rows=700)
+    pd.testing.assert_frame_equal(whole, chunked)
+
+
+def test_progress_reported_inside_matching_and_gather():
+    main, exact, fuzzy, _, _ = chunking_tables()
+    calls = []
+    vlookup(main, 'id', [(exact, 'id'), (fuzzy, 'name')], ['count', 'label', 'score'],
+            match_options=[None, FuzzyMatch(threshold=0.6, chunk_size=300)], chunk_rows=500,
+            progress_callback=lambda done, total: calls.append((done, total)))
+    done = [d for d, _ in calls]
+    assert calls[0] == (0, 5000) and calls[-1] == (5000, 5000)
+    assert done == sorted(done)
+    # 唯一键按片匹配、模糊匹配按批、展开和取值按块，各有多次报告
+    assert len(calls) > 30
+
+
+def test_cancel_during_unique_matching():
+    main, exact, _, _, _ = chunking_tables()
+    calls = []
+
+    def cancel_after_encoding(done, total):
+        calls.append(done)
+        if len(calls) == 4:
+            raise LookupCancelled()
+    with pytest.raises(LookupCancelled):
+        vlookup(main, 'id', [(exact, 'id')], ['count'], chunk_rows=500, progress_callback=cancel_after_encoding)
+    assert calls[-1] < 5000
+
+
+def test_fuzzy_match_texts_reports_batches():
+    index = FuzzyIndex.build(pd.Series([f"name {i}" for i in range(50)]))
+    texts = [f"name {i}" for i in range(10)] + [f"nam {i}" for i in range(25)]
+    calls = []
+    index.match_texts(texts, FuzzyMatch(chunk_size=10), lambda done, total: calls.append((done, total)))
+    assert calls == [(10, 35), (20, 35), (30, 35), (35, 35)]
@@ -0,0 +1,62 @@
+import threading
+
+import numpy as np
+import pandas as pd
+
+from key_normalizer import KeyRules
+from lookup_engine import match_cache_key, vlookup
+from match_cache import MatchCache
+
+
+def test_vlookup_stores_under_shared_key():
+    cache = MatchCache()
+    main = pd.DataFrame({'id': [1, 2, 3]})
+    lookup = pd.DataFrame({'id': [2, 3], 'v': ['b', 'c']})
+    vlookup(main, 'id', [(lookup, 'id')], ['v'], match_cache=cache, table_versions=(1, [2]))
+    key = match_cache_key(cache, (1, [2]), 0, 'id', 'id', KeyRules(), None, len(main))
+    positions, scores = cache.get(key)
+    assert positions.tolist() == [-1, 0, 1]
+    assert scores is None
+
+
+def test_cached_result_reused_until_version_discarded():
+    cache = MatchCache()
+    main = pd.DataFrame({'id': [1, 2]})
+    lookup = pd.DataFrame({'id': [1, 2], 'v': ['a', 'b']})
+    vlookup(main, 'id', [(lookup, 'id')], ['v'], match_cache=cache, table_versions=(1, [2]))
+    changed = pd.DataFrame({'id': [2, 1], 'v': ['b', 'a']})
+    # 版本未变时复用缓存的位置（即使传入的数据不同），丢弃版本后重新匹配
+    reused = vlookup(main, 'id', [(changed, 'id')], ['v'], match_cache=cache, table_versions=(1, [2]))
+    assert reused['v'].tolist() == ['b', 'a']
+    cache.discard_version(2)
+    assert len(cache) == 0
+    fresh = vlookup(main, 'id', [(changed, 'id')], ['v'], match_cache=cache, table_versions=(1, [2]))
+    assert fresh['v'].tolist() == ['a', 'b']
+
+
+def test_concurrent_put_and_discard():
+    cache = MatchCache(max_bytes=64 * 1024)
+    errors = []
+
+    def writer(offset):
+        try:
+            for i in range(2000):
+                cache.put((offset, ('id',), i % 50, ('id',), '1000', 'exact', 10), np.arange(10, dtype=np.int64))
+                cache.get((offset, ('id',), (i + 1) % 50, ('id',), '1000', 'exact', 10))
+        except Exception as e:
+            errors.append(e)
+
+    def discarder():
+        try:
+            for i in range(2000):
+                cache.discard_version(i % 50)
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=writer, args=(100 + n,)) for n in range(3)] + [threading.Thread(target=discarder)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert not errors
+    assert cache.total_bytes == sum(positions.nbytes for positions, _ in cache.entries.values())
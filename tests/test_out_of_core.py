@@ -0,0 +1,53 @@
+import io
+
+import numpy as np
+import pandas as pd
+
+from lookup_engine import vlookup
+from out_of_core import TableSource, out_of_core_vlookup
+
+
+def write_csv(tmp_path, name, df):
+    path = str(tmp_path / name)
+    df.to_csv(path, index=False)
+    return path
+
+
+def run_both(tmp_path, main, lookups, return_columns, **kwargs):
+    # 返回 (磁盘分区查找写出的结果, 整表在内存中 vlookup 的结果)，都按 CSV 读回以便比较
+    main_path = write_csv(tmp_path, 'main.csv', main)
+    sources = [(TableSource(write_csv(tmp_path, f"lookup{i}.csv", df)), column) for i, (df, column) in enumerate(lookups)]
+    output_path, rows = out_of_core_vlookup(TableSource(main_path), 'id', sources, return_columns,
+                                            str(tmp_path / 'out.csv'), spill_dir=str(tmp_path / 'spill'), **kwargs)
+    assert rows == len(main)
+    expected = vlookup(pd.read_csv(main_path), 'id', [(pd.read_csv(source.file_path), column)
+                                                      for source, column in sources], return_columns)
+    return pd.read_csv(output_path), pd.read_csv(io.StringIO(expected.to_csv(index=False)))
+
+
+def test_optional_return_columns_match_in_memory(tmp_path):
+    rng = np.random.default_rng(0)
+    main = pd.DataFrame({'id': rng.integers(0, 400, 3000)})
+    first = pd.DataFrame({'id': np.arange(0, 400, 2), 'price': np.arange(200) * 1.5})
+    second = pd.DataFrame({'name': [f"n{i}" for i in range(300)], 'id': np.arange(300), 'price': np.zeros(300)})
+    third = pd.DataFrame({'id': np.arange(100, 400), 'region': [f"r{i % 7}" for i in range(300)], 'name': 'x'})
+    result, expected = run_both(tmp_path, main, [(first, 'id'), (second, 'id'), (third, 'id')],
+                                ['name', 'price', 'region', 'absent'], partitions=5, chunk_rows=700)
+    assert list(result.columns) == ['id', 'price', 'name', 'region']
+    pd.testing.assert_frame_equal(result, expected)
+
+
+def test_sparse_lookup_across_partitions(tmp_path):
+    main = pd.DataFrame({'id': np.arange(1000) % 50})
+    rates = pd.DataFrame({'id': [3, 7], 'rate': [0.5, 0.25]})
+    result, expected = run_both(tmp_path, main, [(rates, 'id')], ['rate'], partitions=8, chunk_rows=128)
+    pd.testing.assert_frame_equal(result, expected)
+    assert result['rate'].notna().sum() == 40
+
+
+def test_lookup_without_wanted_columns_is_skipped(tmp_path):
+    main = pd.DataFrame({'id': [1, 2, 3]})
+    unused = pd.DataFrame({'id': [1], 'other': ['x']})
+    rates = pd.DataFrame({'id': [2], 'rate': [0.5]})
+    result, expected = run_both(tmp_path, main, [(unused, 'id'), (rates, 'id')], ['rate'], partitions=2)
+    pd.testing.assert_frame_equal(result, expected)
@@ -0,0 +1,50 @@
+import datetime
+import glob
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from parallel_parser import parse_sheet_to_directory, parse_sheets_parallel
+from parse_cache import read_frame
+from workbook_loader import file_signature, parse_sheet
+
+pytest.importorskip('openpyxl')
+
+
+@pytest.fixture
+def workbook(tmp_path):
+    from openpyxl import Workbook
+
+    workbook = Workbook()
+    worksheet = workbook.active
+    worksheet.title = 'S'
+    worksheet.append(['id', 'name', 'date', 'mixed'])
+    for i in range(20):
+        worksheet.append([i, f"名{i}" if i % 3 else None, datetime.datetime(2024, 1, 1 + i), i if i % 2 else 'x'])
+    path = str(tmp_path / 'book.xlsx')
+    workbook.save(path)
+    return path
+
+
+def test_worker_output_needs_no_pickle(workbook, tmp_path):
+    directory = str(tmp_path / 'job')
+    frame_meta = parse_sheet_to_directory(workbook, 'S', directory)
+    # 交给主进程的列文件在禁用 pickle 时都能读取
+    for path in glob.glob(os.path.join(directory, '*.npy')):
+        np.load(path, allow_pickle=False)
+    expected, detected = parse_sheet(workbook, 'S')
+    pd.testing.assert_frame_equal(read_frame(directory, frame_meta), expected)
+    assert frame_meta['detected_header'] == detected
+    assert frame_meta['signature'] == file_signature(workbook)
+
+
+def test_parse_sheets_parallel(workbook, tmp_path):
+    results = list(parse_sheets_parallel([(workbook, 'S', None), (workbook, 'missing', None)], str(tmp_path / 'work'),
+                                         workers=2))
+    by_sheet = {sheet_name: (directory, frame_meta, error) for _, sheet_name, directory, frame_meta, error in results}
+    directory, frame_meta, error = by_sheet['S']
+    assert error is None
+    assert len(read_frame(directory, frame_meta)) == 20  # 第一行作为列名
+    assert by_sheet['missing'][1] is None and by_sheet['missing'][2]
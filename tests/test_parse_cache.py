@@ -0,0 +1,97 @@
+import datetime
+import glob
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import parse_cache
+from parse_cache import ParseCache, read_frame, write_frame
+
+
+def sample_raw():
+    return pd.DataFrame({
+        'ints': np.arange(4, dtype=np.int64),
+        'nullable': pd.array([1, None, 3, 4], dtype='Int64'),
+        'flags': pd.array([True, None, False, True], dtype='boolean'),
+        'stamps': pd.date_range('2024-01-01', periods=4, freq='D'),
+        'text': pd.Series(['a', None, '中文', ''], dtype='str'),
+        'object_text': pd.Series(['x', None, np.nan, 'y'], dtype=object),
+        'mixed': pd.Series([1, 'two', datetime.datetime(2024, 1, 2, 3, 4), pd.NaT], dtype=object),
+    })
+
+
+@pytest.fixture
+def source(tmp_path):
+    path = tmp_path / 'book.xlsx'
+    path.write_bytes(b'workbook')
+    return str(path)
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return ParseCache(str(tmp_path / 'cache'))
+
+
+@pytest.mark.parametrize('mmap', [False, True])
+def test_frame_round_trip(tmp_path, mmap):
+    raw = sample_raw()
+    directory = str(tmp_path / 'frame')
+    meta = write_frame(directory, raw)
+    loaded = read_frame(directory, meta, mmap=mmap)
+    pd.testing.assert_frame_equal(loaded.copy(), raw)  # 内存映射的列是 np.memmap，比较前复制为普通数组
+    assert loaded['object_text'][1] is None and np.isnan(loaded['object_text'][2])
+    assert loaded['mixed'][3] is pd.NaT
+    # 所有列文件都能在禁用 pickle 时读取
+    for path in glob.glob(os.path.join(directory, '*.npy')):
+        np.load(path, allow_pickle=False)
+
+
+def test_sheet_round_trip(source, cache):
+    raw = sample_raw()
+    cache.save_sheet(source, 'S', raw, 0)
+    loaded, detected = cache.load_sheet(source, 'S')
+    pd.testing.assert_frame_equal(loaded, raw)
+    assert detected == 0
+    partial, _ = cache.load_sheet(source, 'S', [4, 1])
+    assert list(partial.columns) == ['text', 'nullable']
+    pd.testing.assert_series_equal(partial['nullable'], raw['nullable'])
+
+
+def test_empty_frame_round_trip(tmp_path):
+    raw = sample_raw().iloc[:0]
+    directory = str(tmp_path / 'frame')
+    pd.testing.assert_frame_equal(read_frame(directory, write_frame(directory, raw)), raw)
+
+
+def test_unknown_storage_rejected(tmp_path):
+    directory = str(tmp_path / 'frame')
+    meta = write_frame(directory, pd.DataFrame({'a': ['x']}))
+    meta['columns'][0]['storage'] = 'object'
+    with pytest.raises(ValueError):
+        read_frame(directory, meta)
+
+
+def test_invalidated_when_mtime_changes(source, cache):
+    cache.save_sheet(source, 'S', sample_raw(), 0)
+    stat = os.stat(source)
+    os.utime(source, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+    assert cache.load_sheet(source, 'S') is None
+
+
+def test_invalidated_when_size_changes(source, cache):
+    cache.save_sheet(source, 'S', sample_raw(), 0)
+    stat = os.stat(source)
+    with open(source, 'ab') as f:
+        f.write(b'more')
+    os.utime(source, ns=(stat.st_atime_ns, stat.st_mtime_ns))  # 只有大小变化
+    assert cache.load_sheet(source, 'S') is None
+
+
+def test_invalidated_by_format_version(source, cache, monkeypatch):
+    cache.save_sheet(source, 'S', sample_raw(), 0)
+    assert cache.load_sheet(source, 'S') is not None
+    monkeypatch.setattr(parse_cache, 'CACHE_FORMAT_VERSION', parse_cache.CACHE_FORMAT_VERSION + 1)
+    assert cache.load_sheet(source, 'S') is None
+    assert cache.load_meta(source) is None
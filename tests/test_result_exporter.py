@@ -0,0 +1,109 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import result_exporter
+from result_exporter import ExportCancelled, StreamingWriter, export_dataframe
+
+
+def sample_result(rows=7):
+    return pd.DataFrame({'id': range(rows), 'value': [None if i % 3 == 0 else f"v{i}" for i in range(rows)],
+                         'amount': [np.nan if i % 2 else i * 1.5 for i in range(rows)]})
+
+
+def read_sheets(path):
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(path, read_only=True)
+    try:
+        # 只读模式下行末尾的空单元格不会返回，按表头宽度补齐
+        return {worksheet.title: [list(row) + [None] * (3 - len(row)) for row in worksheet.iter_rows(values_only=True)]
+                for worksheet in workbook.worksheets}
+    finally:
+        workbook.close()
+
+
+@pytest.fixture
+def small_sheets(monkeypatch):
+    pytest.importorskip('openpyxl')
+    monkeypatch.setattr(result_exporter, 'EXCEL_MAX_ROWS', 4)  # 每个工作表 1 行表头 + 3 行数据
+
+
+def test_xlsx_split_at_sheet_limit(tmp_path, small_sheets):
+    path = export_dataframe(sample_result(), str(tmp_path / 'out.xlsx'), chunk_size=2)
+    sheets = read_sheets(path)
+    assert list(sheets) == ['Sheet1', 'Sheet2', 'Sheet3']
+    assert [len(rows) for rows in sheets.values()] == [4, 4, 2]
+    assert all(rows[0] == ['id', 'value', 'amount'] for rows in sheets.values())
+    assert [row[0] for rows in sheets.values() for row in rows[1:]] == list(range(7))
+    assert sheets['Sheet1'][1] == [0, 'N/A', 0]
+
+
+def test_xlsx_keep_empty(tmp_path, small_sheets):
+    path = export_dataframe(sample_result(3), str(tmp_path / 'out.xlsx'), xlsx_keep_empty=True)
+    assert read_sheets(path)['Sheet1'][1:] == [[0, None, 0], [1, 'v1', None], [2, 'v2', 3]]
+
+
+def test_streaming_writer_split_at_sheet_limit(tmp_path, small_sheets):
+    writer = StreamingWriter(str(tmp_path / 'out.xlsx'))
+    for start in (0, 2, 5):
+        writer.write(sample_result().iloc[start:start + {0: 2, 2: 3, 5: 2}[start]])
+    sheets = read_sheets(writer.close())
+    assert [len(rows) for rows in sheets.values()] == [4, 4, 2]
+    assert not os.path.exists(writer.part_path)
+
+
+@pytest.mark.parametrize('na_rep', ['N/A', '-', ''])
+def test_csv_na_rep(tmp_path, na_rep):
+    path = export_dataframe(sample_result(3), str(tmp_path / 'out.csv'), na_rep=na_rep)
+    with open(path, encoding='utf-8') as f:
+        lines = f.read().splitlines()
+    assert lines == ['id,value,amount', f"0,{na_rep},0.0", f"1,v1,{na_rep}", f"2,v2,3.0"]
+
+
+def test_cancelled_export_leaves_no_file(tmp_path):
+    def cancel(rows_written, total_rows):
+        raise ExportCancelled()
+
+    formats = ['csv']
+    try:
+        import openpyxl  # noqa: F401
+        formats.append('xlsx')
+    except ImportError:
+        pass
+    for extension in formats:
+        path = str(tmp_path / f"out.{extension}")
+        with pytest.raises(ExportCancelled):
+            export_dataframe(sample_result(), path, chunk_size=2, progress_callback=cancel)
+        assert os.listdir(tmp_path) == []
+
+
+def test_cancelled_xlsx_removes_temporary_sheets(tmp_path, small_sheets):
+    from openpyxl.worksheet._writer import ALL_TEMP_FILES
+
+    def cancel_on_second_sheet(rows_written, total_rows):
+        if rows_written > 3:
+            raise ExportCancelled()
+
+    before = list(ALL_TEMP_FILES)
+    with pytest.raises(ExportCancelled):
+        export_dataframe(sample_result(), str(tmp_path / 'out.xlsx'), chunk_size=2,
+                         progress_callback=cancel_on_second_sheet)
+    assert ALL_TEMP_FILES == before
+    assert os.listdir(tmp_path) == []
+
+
+def test_cancelled_export_keeps_existing_file(tmp_path):
+    path = tmp_path / 'out.csv'
+    path.write_text('previous', encoding='utf-8')
+
+    def cancel_after_first_chunk(rows_written, total_rows):
+        if rows_written > 2:
+            raise ExportCancelled()
+
+    with pytest.raises(ExportCancelled):
+        export_dataframe(sample_result(), str(path), chunk_size=2, progress_callback=cancel_after_first_chunk)
+    assert path.read_text(encoding='utf-8') == 'previous'
+    assert os.listdir(tmp_path) == ['out.csv']
@@ -0,0 +1,74 @@
+import datetime
+
+import pandas as pd
+
+import workbook_loader
+from workbook_loader import apply_header, header_names_by_row, iter_sheet_rows, parse_sheet
+
+
+def make_raw():
+    # 第一行作为 read_excel 的默认列名，标题行之后是真正的表头和数据
+    return pd.DataFrame({'Report': [None, 'id', 1, 2], 'Unnamed: 1': [None, 'name', 'a', 'b']})
+
+
+def test_apply_header_first_row():
+    view = apply_header(make_raw(), 0)
+    assert list(view.columns) == ['Report', 'Unnamed: 1']
+    assert len(view) == 4
+
+
+def test_apply_header_drops_rows_above_header():
+    view = apply_header(make_raw(), 2)
+    assert list(view.columns) == ['id', 'name']
+    assert view['id'].tolist() == [1, 2]
+    assert view['name'].tolist() == ['a', 'b']
+    assert list(view.index) == [0, 1]
+
+
+def test_apply_header_keeps_raw_unchanged():
+    raw = make_raw()
+    apply_header(raw, 2)
+    assert list(raw.columns) == ['Report', 'Unnamed: 1']
+    assert len(raw) == 4
+
+
+def test_apply_header_past_end():
+    view = apply_header(make_raw(), 10)
+    assert list(view.columns) == ['2', 'b']
+    assert len(view) == 0
+
+
+def test_header_names_by_row_matches_apply_header():
+    raw = make_raw()
+    names = header_names_by_row(raw)
+    for header_row in range(len(raw) + 1):
+        assert names[header_row] == list(apply_header(raw, header_row).columns)
+
+
+def fake_rows(monkeypatch, rows):
+    monkeypatch.setattr(workbook_loader, '_iter_xlsx_rows', lambda file_path, sheet_name: iter(rows))
+
+
+def test_iter_sheet_rows_keeps_inner_blank_rows_only(monkeypatch):
+    blank = (None, '', None)
+    fake_rows(monkeypatch, [('a', 1, None)] + [blank] * 3 + [(None, 2, 'x')] + [blank] * 100000)
+    rows = list(iter_sheet_rows('book.xlsx', 'S'))
+    assert rows == [('a', 1, None), (None, None, None), (None, None, None), (None, None, None), (None, 2, 'x')]
+
+
+def test_parse_sheet_chunking_does_not_change_result(monkeypatch):
+    # 某些块中整列缺失时，拼接后的列类型仍与一次读取整表相同
+    rows = [('id', 'amount', 'name', 'flag', 'date', 'code')]
+    for i in range(30):
+        missing = 10 <= i < 20
+        rows.append((i, None if missing else i * 1.5, None if missing else f"n{i}", None if missing else i % 2 == 0,
+                     None if missing else datetime.datetime(2024, 1, 1) + datetime.timedelta(days=i),
+                     None if missing else i))
+    fake_rows(monkeypatch, rows)
+    expected, detected = parse_sheet('book.xlsx', 'S', chunk_size=1000)
+    for chunk_size in (1, 4, 10):
+        raw, chunk_detected = parse_sheet('book.xlsx', 'S', chunk_size=chunk_size)
+        pd.testing.assert_frame_equal(raw, expected)
+        assert chunk_detected == detected
+    assert expected['code'].dtype == 'float64'
+    assert expected['flag'].dtype == 'float64'
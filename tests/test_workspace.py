@@ -0,0 +1,85 @@
+import datetime
+import json
+import struct
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from workspace import Workspace, WorkspaceError, save_workspace, WORKSPACE_FORMAT_VERSION
+
+
+def sample_frame():
+    return pd.DataFrame({
+        'text': pd.Series(['a', None, '中文', ''], dtype='str'),
+        'object_text': pd.Series(['x', None, np.nan, 'y'], dtype=object),
+        'mixed': pd.Series([1, 'two', datetime.datetime(2024, 1, 2, 3, 4), None], dtype=object),
+        'dates': pd.Series([datetime.date(2024, 5, 6), 2.5, True, pd.NA], dtype=object),
+        'ints': pd.array([1, None, 3, 4], dtype='Int64'),
+        'flags': pd.array([True, None, False, True], dtype='boolean'),
+        'floats': [0.5, np.nan, 2.0, 3.5],
+        'stamps': pd.date_range('2024-01-01', periods=4, freq='h'),
+        'category': pd.Series(['p', 'q', 'p', None], dtype='category'),
+    })
+
+
+def save_result(tmp_path, result):
+    return Workspace(save_workspace(str(tmp_path / 'ws'), {}, {'k': 1}, result))
+
+
+def test_result_round_trip(tmp_path):
+    frame = sample_frame()
+    loaded = save_result(tmp_path, frame).load_result()
+    pd.testing.assert_frame_equal(loaded, frame)
+    assert loaded['object_text'][1] is None and np.isnan(loaded['object_text'][2])
+    assert isinstance(loaded['dates'][0], datetime.date) and loaded['dates'][3] is pd.NA
+
+
+def test_result_row_range(tmp_path):
+    frame = pd.concat([sample_frame()] * 50, ignore_index=True)
+    workspace = save_result(tmp_path, frame)
+    assert workspace.result_rows == 200
+    part = workspace.load_result(37, 91)
+    pd.testing.assert_frame_equal(part, frame.iloc[37:91].reset_index(drop=True))
+    assert len(workspace.load_result(190, 500)) == 10
+
+
+def test_sheet_round_trip(tmp_path):
+    raw = pd.DataFrame({'Unnamed: 0': ['title', 'id', 'k1'], 'Unnamed: 1': [None, 'value', 3]})
+    files = {'/data/a.xlsx': {'S': {'detected_header': 2, 'header_row': 2, 'cleaned': False, 'dimensions': (4, 2),
+                                    'preview': raw, 'raw': raw}}}
+    workspace = Workspace(save_workspace(str(tmp_path / 'ws'), files, {}))
+    loaded, detected = workspace.load_sheet('/data/a.xlsx', 'S')
+    pd.testing.assert_frame_equal(loaded, raw)
+    assert detected == 2
+    assert workspace.load_result() is None
+    assert list(workspace.load_sheet_columns('/data/a.xlsx', 'S', 2, ['value']).columns) == ['value']
+
+
+def rewrite_meta(path, change):
+    with open(path, 'rb') as f:
+        content = f.read()
+    footer = struct.Struct('<Q8s')
+    length, magic = footer.unpack(content[-footer.size:])
+    meta = json.loads(content[-footer.size - length:-footer.size].decode('utf-8'))
+    change(meta)
+    encoded = json.dumps(meta).encode('utf-8')
+    with open(path, 'wb') as f:
+        f.write(content[:-footer.size - length] + encoded + footer.pack(len(encoded), magic))
+
+
+def test_unknown_storage_rejected(tmp_path):
+    path = save_workspace(str(tmp_path / 'ws'), {}, {}, pd.DataFrame({'a': ['x']}))
+
+    def unknown_storage(meta):
+        meta['result']['columns'][0]['storage'] = 'object'
+    rewrite_meta(path, unknown_storage)
+    with pytest.raises(WorkspaceError):
+        Workspace(path).load_result()
+
+
+def test_unknown_version_rejected(tmp_path):
+    path = save_workspace(str(tmp_path / 'ws'), {}, {})
+    rewrite_meta(path, lambda meta: meta.update(version=WORKSPACE_FORMAT_VERSION + 1))
+    with pytest.raises(WorkspaceError):
+        Workspace(path)
@@ -0,0 +1,367 @@
+"""高级VLOOKUP工具的命令行批处理入口，不依赖 Qt，可在没有图形界面的服务器上运行。
+
+用法: python vlookup_cli.py job.json [--output 路径] [--no-cache] [--profile 文件] [--out-of-core] [--memory-mb 大小]
+
+任务文件示例:
+{
+    "main": {"file": "orders/", "sheet": "Sheet1", "column": "产品编号", "header_row": null},
+    "lookups": [
+        {"file": "product_master.xlsx", "sheet": "产品", "column": "编号", "header_row": 2},
+        {"file": "suppliers.xlsx", "column": "供应商名称", "match": {"mode": "fuzzy", "threshold": 0.8}},
+        {"file": "product_ranges.xlsx", "column": "起始编号", "match": {"mode": "range", "direction": "le"}}
+    ],
+    "return_columns": ["产品名称", "单价"],
+    "key_rules": {"trim": true, "casefold": false, "fold_width": false, "canonical_numbers": true},
+    "output": {"path": "results/", "format": "xlsx", "na_rep": "N/A", "keep_empty_cells": false},
+    "out_of_core": {"memory_mb": 1024, "partitions": null, "spill_dir": null}
+}
+
+main.file 可以是单个文件或文件夹（处理其中所有 .xlsx/.xls 文件）；sheet 省略时使用第一个工作表；
+header_row 为表头所在的 Excel 行号（从 1 开始），省略或为 null 时智能检测；key_rules 可省略，默认值如上；
+main.column 和 lookups 中的 column 可以是列名列表，表示按多列组合键精确匹配（两边列数相同）；
+lookups 中的 match 可省略（精确匹配），mode 为 fuzzy 时按字符三元组相似度模糊匹配，threshold 为最低相似度（0~1）；
+mode 为 range 时按区间匹配，direction 为 le（不大于主表值的最大键）或 ge（不小于主表值的最小键），
+group_column 为主表中的分组列，lookup_group_column 为查找表中的分组列（省略时同名）；
+output.na_rep 为未匹配单元格写出的文本，keep_empty_cells 为 true 时 xlsx 中保留为空单元格。
+out_of_core 可省略；给出时（或使用 --out-of-core）按键哈希分区溢写到磁盘后逐个分区查找，用于超出内存的表：
+memory_mb 为内存预算，partitions 为分区数（null 时按文件大小估算），spill_dir 为溢写目录（null 时用系统临时目录）；
+此模式只支持精确匹配，输出只支持 xlsx/csv，主表和查找表也可以是 .csv 文件（header_row 为表头行号，默认 1）。
+退出码: 0 全部成功，1 部分文件失败，2 任务文件无效，130 被中断。
+"""
+import os
+import sys
+import glob
+import json
+import time
+import logging
+import argparse
+import configparser
+
+from workbook_loader import scan_workbook, parse_sheet, apply_header, file_signature
+from lookup_engine import vlookup, key_columns
+from index_cache import IndexCache, DEFAULT_CACHE_DIR
+from parse_cache import ParseCache, DEFAULT_PARSE_CACHE_DIR
+from result_exporter import export_dataframe, DEFAULT_NA_REP
+from run_timing import StageTimer
+from key_normalizer import KeyRules
+from fuzzy_match import FuzzyMatch
+from range_match import RangeMatch, RANGE_LE, RANGE_GE
+from out_of_core import TableSource, out_of_core_vlookup
+
+EXIT_OK = 0
+EXIT_PARTIAL_FAILURE = 1
+EXIT_INVALID_JOB = 2
+EXIT_INTERRUPTED = 130
+
+EXCEL_EXTENSIONS = ('.xlsx', '.xls')
+OUT_OF_CORE_EXTENSIONS = EXCEL_EXTENSIONS + ('.csv',)
+DEFAULT_MEMORY_MB = 1024
+
+
+class JobError(Exception):
+    pass
+
+
+def match_options(spec):
+    # 查找表的匹配方式，None 表示精确匹配
+    match = spec.get('match') or {}
+    mode = match.get('mode', 'exact')
+    if mode == 'exact':
+        return None
+    if mode == 'fuzzy':
+        threshold = float(match.get('threshold', 0.8))
+        if not 0 < threshold <= 1:
+            raise JobError(f"模糊匹配的 threshold 必须在 0 到 1 之间: {threshold}")
+        return FuzzyMatch(threshold)
+    if mode == 'range':
+        direction = match.get('direction', RANGE_LE)
+        if direction not in (RANGE_LE, RANGE_GE):
+            raise JobError(f"区间匹配的 direction 必须是 le 或 ge: {direction}")
+        return RangeMatch(direction, match.get('group_column'), match.get('lookup_group_column'))
+    raise JobError(f"未知的匹配方式: {mode}")
+
+
+class BatchRunner:
+    def __init__(self, job, chunk_size=100000, use_cache=True):
+        self.job = job
+        self.chunk_size = chunk_size
+        self.key_rules = KeyRules.from_dict(job.get('key_rules'))
+        self.match_options = [match_options(spec) for spec in job['lookups']]
+        self.parse_cache = ParseCache(DEFAULT_PARSE_CACHE_DIR) if use_cache else None
+        self.index_cache = IndexCache(DEFAULT_CACHE_DIR) if use_cache else None
+
+    def log_timing(self, stage, started, rows=None):
+        elapsed = time.perf_counter() - started
+        suffix = f", {rows} 行" if rows is not None else ""
+        print(f"  {stage}: {elapsed:.3f} 秒{suffix}")
+        logging.info(f"{stage}: {elapsed:.3f} 秒{suffix}")
+
+    def resolve_sheet(self, spec):
+        # 返回 (工作表名, 表头原始行号, 检测到的表头行号)，扫描结果优先从解析缓存读取
+        file_path = spec['file']
+        scan = self.parse_cache.load_scan(file_path) if self.parse_cache is not None else None
+        if scan is None:
+            scan = scan_workbook(file_path)
+            if self.parse_cache is not None:
+                self.parse_cache.save_scan(file_path, scan)
+        sheet_name = spec.get('sheet') or next(iter(scan))
+        if sheet_name not in scan:
+            raise JobError(f"文件 {file_path} 中没有工作表 {sheet_name}")
+        detected_header = scan[sheet_name]['detected_header']
+        header_row = detected_header if spec.get('header_row') is None else int(spec['header_row']) - 1
+        return sheet_name, header_row, detected_header
+
+    def load_table(self, spec, columns=None):
+        # 读取一个工作表并应用表头，返回 (DataFrame, 工作表名, 表头原始行号, 读取前的文件签名)
+        # columns 为需要的列名，工作表在解析缓存中时只读取这些列
+        file_path = spec['file']
+        started = time.perf_counter()
+        signature = file_signature(file_path)  # 读取之前记录，读取期间文件被修改时索引缓存不会误用新文件的签名
+        sheet_name, header_row, detected_header = self.resolve_sheet(spec)
+
+        df = None
+        if columns is not None and self.parse_cache is not None:
+            df = self.parse_cache.load_sheet_columns(file_path, sheet_name, header_row, columns)
+        if df is None:
+            cached = self.parse_cache.load_sheet(file_path, sheet_name) if self.parse_cache is not None else None
+            if cached is not None:
+                raw, detected_header = cached
+            else:
+                raw, detected_header = parse_sheet(file_path, sheet_name, self.chunk_size,
+                                                   detected_header=detected_header)
+                if self.parse_cache is not None:
+                    self.parse_cache.save_sheet(file_path, sheet_name, raw, detected_header)
+            header_row = detected_header if spec.get('header_row') is None else header_row
+            df = apply_header(raw, header_row)
+            if columns is not None:
+                df = df[[col for col in dict.fromkeys(columns) if col in df.columns]]
+        for column in key_columns(spec['column']):
+            if column not in df.columns:
+                raise JobError(f"{os.path.basename(file_path)} - {sheet_name} 中没有列 {column}")
+        self.log_timing(f"加载 {os.path.basename(file_path)} - {sheet_name}", started, len(df))
+        return df, sheet_name, header_row, signature
+
+    def load_lookup_tables(self):
+        lookup_tables = []
+        indexes = []
+        for spec, options in zip(self.job['lookups'], self.match_options):
+            group_columns = [options.lookup_group_column] if isinstance(options, RangeMatch) and options.group_column else []
+            df, sheet_name, header_row, signature = self.load_table(
+                spec, key_columns(spec['column']) + group_columns + self.job['return_columns'])
+            index = None
+            if self.index_cache is not None and options is None and len(key_columns(spec['column'])) == 1:
+                started = time.perf_counter()
+                key = self.index_cache.cache_key(spec['file'], sheet_name, spec['column'], header_row, signature,
+                                                 self.key_rules)
+                index = self.index_cache.get_or_build(key, df[spec['column']], self.key_rules)
+                self.log_timing(f"索引 {spec['column']}", started, len(index))
+            lookup_tables.append((df, spec['column']))
+            indexes.append(index)
+        return lookup_tables, indexes
+
+    def run_file(self, main_file, lookup_tables, indexes, output_path):
+        print(f"处理 {main_file}")
+        main_spec = dict(self.job['main'], file=main_file)
+        group_columns = [options.group_column for options in self.match_options
+                         if isinstance(options, RangeMatch) and options.group_column]
+        main_df, _, _, _ = self.load_table(main_spec, key_columns(main_spec['column']) + group_columns)
+
+        started = time.perf_counter()
+        timer = StageTimer(f"查找 {os.path.basename(main_file)}")
+        result_df = vlookup(main_df, main_spec['column'], lookup_tables, self.job['return_columns'], indexes=indexes,
+                            timer=timer, key_rules=self.key_rules, match_options=self.match_options,
+                            chunk_rows=self.chunk_size)
+        self.log_timing("查找", started, len(result_df))
+        for line in timer.summary_lines():
+            print(f"    {line}")
+        timer.log()
+
+        started = time.perf_counter()
+        output = self.job['output']
+        output_path = export_dataframe(result_df, output_path, self.chunk_size,
+                                       na_rep=output.get('na_rep', DEFAULT_NA_REP),
+                                       xlsx_keep_empty=bool(output.get('keep_empty_cells', False)))
+        self.log_timing(f"导出 {output_path}", started, len(result_df))
+        return output_path
+
+    def table_source(self, spec):
+        # 磁盘分区模式的输入表；CSV 的 header_row 为表头所在行号（从 1 开始，默认第 1 行）
+        if spec['file'].lower().endswith('.csv'):
+            return TableSource(spec['file'], header_row=int(spec.get('header_row') or 1) - 1)
+        sheet_name, header_row, _ = self.resolve_sheet(spec)
+        return TableSource(spec['file'], sheet_name, header_row)
+
+    def run_file_out_of_core(self, main_file, output_path):
+        # 主表和查找表都按块读取并按键分区溢写到磁盘，内存占用由 out_of_core.memory_mb 限制
+        print(f"处理 {main_file}（磁盘分区）")
+        main_spec = dict(self.job['main'], file=main_file)
+        settings = self.job['out_of_core']
+        output = self.job['output']
+        started = time.perf_counter()
+        timer = StageTimer(f"磁盘分区查找 {os.path.basename(main_file)}")
+        output_path, rows = out_of_core_vlookup(
+            self.table_source(main_spec), main_spec['column'],
+            [(self.table_source(spec), spec['column']) for spec in self.job['lookups']],
+            self.job['return_columns'], output_path,
+            memory_budget=int(settings.get('memory_mb', DEFAULT_MEMORY_MB)) * 1024 * 1024,
+            partitions=settings.get('partitions'), chunk_rows=self.chunk_size, spill_dir=settings.get('spill_dir'),
+            key_rules=self.key_rules, timer=timer, na_rep=output.get('na_rep', DEFAULT_NA_REP),
+            xlsx_keep_empty=bool(output.get('keep_empty_cells', False)))
+        timer.finish()
+        self.log_timing(f"查找并导出 {output_path}", started, rows)
+        for line in timer.summary_lines():
+            print(f"    {line}")
+        timer.log()
+        return output_path
+
+
+def load_job(job_path):
+    try:
+        with open(job_path, 'r', encoding='utf-8') as f:
+            job = json.load(f)
+    except (OSError, ValueError) as e:
+        raise JobError(f"无法读取任务文件 {job_path}: {str(e)}")
+    for key in ('main', 'lookups', 'return_columns'):
+        if key not in job:
+            raise JobError(f"任务文件缺少 {key}")
+    for spec in [job['main']] + list(job['lookups']):
+        if 'file' not in spec or 'column' not in spec:
+            raise JobError("main 和 lookups 中的每一项都需要 file 和 column")
+    if not job['lookups']:
+        raise JobError("至少需要一个查找表")
+    key_count = len(key_columns(job['main']['column']))
+    for spec in job['lookups']:
+        if len(key_columns(spec['column'])) != key_count:
+            raise JobError("每个查找表的查找列数量必须与主表的主列数量相同")
+        if match_options(spec) is not None and key_count > 1:
+            raise JobError("组合键只支持精确匹配")
+    # 相对路径以任务文件所在目录为基准
+    base_dir = os.path.dirname(os.path.abspath(job_path))
+    for spec in [job['main']] + list(job['lookups']):
+        spec['file'] = os.path.join(base_dir, spec['file'])
+    job.setdefault('output', {})
+    if job['output'].get('path'):
+        job['output']['path'] = os.path.join(base_dir, job['output']['path'])
+    return job
+
+
+def check_out_of_core(job):
+    # 磁盘分区模式只支持精确匹配（含组合键），输出只支持可流式写出的 csv/xlsx
+    settings = job['out_of_core']
+    if any(match_options(spec) is not None for spec in job['lookups']):
+        raise JobError("磁盘分区模式只支持精确匹配")
+    if job['output'].get('format', 'xlsx') not in ('xlsx', 'csv'):
+        raise JobError("磁盘分区模式只支持 xlsx 和 csv 输出")
+    if int(settings.get('memory_mb', DEFAULT_MEMORY_MB)) <= 0:
+        raise JobError("out_of_core.memory_mb 必须大于 0")
+    if settings.get('partitions') is not None and int(settings['partitions']) <= 0:
+        raise JobError("out_of_core.partitions 必须大于 0")
+    if settings.get('spill_dir'):
+        settings['spill_dir'] = os.path.abspath(settings['spill_dir'])
+
+
+def main_files(main_path, extensions=EXCEL_EXTENSIONS):
+    if os.path.isdir(main_path):
+        files = sorted(path for path in glob.glob(os.path.join(main_path, '*'))
+                       if path.lower().endswith(extensions) and not os.path.basename(path).startswith('~$'))
+        if not files:
+            raise JobError(f"文件夹 {main_path} 中没有 {'/'.join(extensions)} 文件")
+        return files
+    if not os.path.exists(main_path):
+        raise JobError(f"文件不存在: {main_path}")
+    return [main_path]
+
+
+def output_path_for(main_file, output, multiple):
+    # 处理多个文件或输出路径为文件夹时，按主表文件名生成输出文件名
+    output_format = output.get('format', 'xlsx')
+    path = output.get('path') or os.path.dirname(main_file)
+    if multiple or os.path.isdir(path) or path.endswith(os.sep):
+        os.makedirs(path, exist_ok=True)
+        stem = os.path.splitext(os.path.basename(main_file))[0]
+        return os.path.join(path, f"{stem}_vlookup.{output_format}")
+    if not path.endswith(f".{output_format}") and 'format' in output:
+        path = f"{path}.{output_format}"
+    return path
+
+
+def read_chunk_size():
+    config = configparser.ConfigParser()
+    config.read('config.ini')
+    return max(1, int(config.get('DEFAULT', 'ChunkSize', fallback=100000)))
+
+
+def run_job(args):
+    logging.basicConfig(filename='vlookup_tool.log', level=logging.INFO,
+                        format='%(asctime)s - %(levelname)s - %(message)s')
+    total_started = time.perf_counter()
+    try:
+        job = load_job(args.job)
+        if args.output:
+            job['output']['path'] = args.output
+        if args.format:
+            job['output']['format'] = args.format
+        if args.out_of_core or args.memory_mb is not None:
+            job['out_of_core'] = job.get('out_of_core') or {}
+        if args.memory_mb is not None:
+            job['out_of_core']['memory_mb'] = args.memory_mb
+        out_of_core = job.get('out_of_core') is not None
+        if out_of_core:
+            check_out_of_core(job)
+        files = main_files(job['main']['file'], OUT_OF_CORE_EXTENSIONS if out_of_core else EXCEL_EXTENSIONS)
+        runner = BatchRunner(job, read_chunk_size(), use_cache=not args.no_cache)
+        # 磁盘分区模式下查找表随主表一起分区读取，不预先载入内存
+        lookup_tables, indexes = runner.load_lookup_tables() if not out_of_core else (None, None)
+    except JobError as e:
+        print(f"错误: {str(e)}", file=sys.stderr)
+        return EXIT_INVALID_JOB
+    except KeyboardInterrupt:
+        return EXIT_INTERRUPTED
+    except Exception as e:
+        print(f"错误: 加载查找表失败: {str(e)}", file=sys.stderr)
+        logging.error(f"加载查找表失败: {str(e)}")
+        return EXIT_INVALID_JOB
+
+    failures = 0
+    for main_file in files:
+        try:
+            output_path = output_path_for(main_file, job['output'], len(files) > 1)
+            if out_of_core:
+                runner.run_file_out_of_core(main_file, output_path)
+            else:
+                runner.run_file(main_file, lookup_tables, indexes, output_path)
+        except KeyboardInterrupt:
+            return EXIT_INTERRUPTED
+        except Exception as e:
+            failures += 1
+            print(f"  失败: {str(e)}", file=sys.stderr)
+            logging.error(f"处理 {main_file} 失败: {str(e)}")
+
+    print(f"完成 {len(files) - failures}/{len(files)} 个文件，总耗时 {time.perf_counter() - total_started:.3f} 秒")
+    return EXIT_PARTIAL_FAILURE if failures else EXIT_OK
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="高级VLOOKUP工具命令行批处理")
+    parser.add_argument('job', help="JSON 格式的任务文件")
+    parser.add_argument('--output', help="覆盖任务文件中的输出路径")
+    parser.add_argument('--format', choices=['xlsx', 'csv', 'pdf'], help="覆盖任务文件中的输出格式")
+    parser.add_argument('--no-cache', action='store_true', help="不使用解析缓存和索引缓存")
+    parser.add_argument('--profile', help="用 cProfile 采集整个批处理并保存到该文件")
+    parser.add_argument('--out-of-core', action='store_true', help="按键分区溢写到磁盘，处理超出内存的表")
+    parser.add_argument('--memory-mb', type=int, help="磁盘分区模式的内存预算（MB），同时启用磁盘分区模式")
+    args = parser.parse_args(argv)
+    profile_timer = StageTimer("批处理", profile=True) if args.profile else None
+    try:
+        if profile_timer is not None:
+            profile_timer.start_profile()
+        return run_job(args)
+    finally:
+        if profile_timer is not None:
+            profile_timer.stop_profile()
+            profile_timer.save_profile(args.profile)
+            print(f"性能分析已保存至 {args.profile}")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
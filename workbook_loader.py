@@ -0,0 +1,411 @@
+import os
+import numpy as np
+import pandas as pd
+
+
+class LoadCancelled(Exception):
+    pass
+
+
+def excel_engine(file_path):
+    return 'openpyxl' if file_path.endswith('.xlsx') else 'xlrd'
+
+
+def file_signature(file_path):
+    # 源文件的修改时间和大小，用于判断由它得到的数据（缓存、工作区）是否仍与源文件一致；文件不存在时为 None
+    try:
+        stat = os.stat(file_path)
+    except OSError:
+        return None
+    return {'mtime_ns': stat.st_mtime_ns, 'size': stat.st_size}
+
+
+HEADER_SCAN_ROWS = 10
+
+
+def scan_workbook(file_path, preview_rows=HEADER_SCAN_ROWS + 1, progress_callback=None):
+    # 只读取工作表名称、尺寸和前几行预览，不解析整个工作表；表头检测直接在预览行上完成
+    # progress_callback(percent) 可抛出 LoadCancelled 以中止扫描
+    if excel_engine(file_path) == 'openpyxl':
+        return _scan_xlsx(file_path, preview_rows, progress_callback)
+    return _scan_xls(file_path, preview_rows, progress_callback)
+
+
+def _report(progress_callback, done, total):
+    if progress_callback is not None:
+        progress_callback(int(done / total * 100) if total else 100)
+
+
+def _scan_xlsx(file_path, preview_rows, progress_callback):
+    from openpyxl import load_workbook
+
+    _report(progress_callback, 0, 1)
+    workbook = load_workbook(file_path, read_only=True, data_only=True)
+    try:
+        scan = {}
+        for i, worksheet in enumerate(workbook.worksheets):
+            rows = list(worksheet.iter_rows(max_row=preview_rows, values_only=True))
+            preview = pd.DataFrame(rows)
+            scan[worksheet.title] = {
+                'dimensions': (worksheet.max_row, worksheet.max_column),
+                'preview': preview,
+                'detected_header': detect_header_from_preview(preview)
+            }
+            _report(progress_callback, i + 1, len(workbook.worksheets))
+        return scan
+    finally:
+        workbook.close()
+
+
+def _scan_xls(file_path, preview_rows, progress_callback):
+    import xlrd
+
+    _report(progress_callback, 0, 1)
+    book = xlrd.open_workbook(file_path, on_demand=True)
+    try:
+        scan = {}
+        sheet_names = book.sheet_names()
+        for i, sheet_name in enumerate(sheet_names):
+            sheet = book.sheet_by_name(sheet_name)
+            rows = [tuple(_xls_cell_value(cell, book.datemode) for cell in sheet.row(r))
+                    for r in range(min(preview_rows, sheet.nrows))]
+            preview = pd.DataFrame(rows)
+            scan[sheet_name] = {
+                'dimensions': (sheet.nrows, sheet.ncols),
+                'preview': preview,
+                'detected_header': detect_header_from_preview(preview)
+            }
+            book.unload_sheet(sheet_name)
+            _report(progress_callback, i + 1, len(sheet_names))
+        return scan
+    finally:
+        book.release_resources()
+
+
+def iter_sheet_rows(file_path, sheet_name):
+    # 流式逐行读取工作表的单元格值，去掉末尾的空行（与 read_excel 的行为一致）
+    rows = _iter_xlsx_rows(file_path, sheet_name) if excel_engine(file_path) == 'openpyxl' \
+        else _iter_xls_rows(file_path, sheet_name)
+    # 空行只记录数量和宽度，后面出现非空行时才补出，工作表声明的范围中有大量空行时不会缓存这些行
+    blank_count = 0
+    blank_width = 0
+    for row in rows:
+        if any(value is not None and value != '' for value in row):
+            for _ in range(blank_count):
+                yield (None,) * blank_width
+            blank_count = 0
+            blank_width = 0
+            yield row
+        else:
+            blank_count += 1
+            blank_width = max(blank_width, len(row))
+
+
+def _iter_xlsx_rows(file_path, sheet_name):
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(file_path, read_only=True, data_only=True)
+    try:
+        for row in workbook[sheet_name].iter_rows(values_only=True):
+            yield row
+    finally:
+        workbook.close()
+
+
+def _iter_xls_rows(file_path, sheet_name):
+    import xlrd
+
+    book = xlrd.open_workbook(file_path, on_demand=True)
+    try:
+        sheet = book.sheet_by_name(sheet_name)
+        for r in range(sheet.nrows):
+            yield tuple(_xls_cell_value(cell, book.datemode) for cell in sheet.row(r))
+    finally:
+        book.release_resources()
+
+
+def _xls_cell_value(cell, datemode):
+    import xlrd
+
+    if cell.ctype in (xlrd.XL_CELL_EMPTY, xlrd.XL_CELL_BLANK):
+        return None
+    if cell.ctype == xlrd.XL_CELL_DATE:
+        return xlrd.xldate_as_datetime(cell.value, datemode)
+    if cell.ctype == xlrd.XL_CELL_BOOLEAN:
+        return bool(cell.value)
+    if cell.ctype == xlrd.XL_CELL_NUMBER and float(cell.value).is_integer():
+        return int(cell.value)
+    return cell.value
+
+
+def iter_sheet_chunks(file_path, sheet_name, chunk_size=100000):
+    # 按 chunk_size 行为一块产出原始行（不做表头处理），峰值内存只与块大小相关
+    rows = []
+    for row in iter_sheet_rows(file_path, sheet_name):
+        rows.append(row)
+        if len(rows) >= chunk_size:
+            yield pd.DataFrame(rows)
+            rows = []
+    if rows:
+        yield pd.DataFrame(rows)
+
+
+# read_excel 默认按缺失值处理的文本（与 pandas 默认的 na_values 相同）
+NA_STRINGS = frozenset(['', '#N/A', '#N/A N/A', '#NA', '-1.#IND', '-1.#QNAN', '-NaN', '-nan', '1.#IND', '1.#QNAN',
+                        '<NA>', 'N/A', 'NA', 'NULL', 'NaN', 'None', 'n/a', 'nan', 'null'])
+
+
+def _normalize_missing(frame, missing_bools_as_float=True):
+    # 与 read_excel 一致：文本列中的 None、空字符串和默认缺失值文本视为 NaN，之后重新推断列类型；
+    # 含缺失值的布尔列与 read_excel 一样转为浮点数（分块读取时关闭，拼接后由 _missing_bools_as_float 统一处理）
+    for i in range(frame.shape[1]):
+        dtype = frame.dtypes.iloc[i]
+        if pd.api.types.is_object_dtype(dtype) or pd.api.types.is_string_dtype(dtype):
+            column = frame.iloc[:, i]
+            missing = column.isna() | column.isin(NA_STRINGS)
+            if missing.any():
+                column = column.astype(object).where(~missing, np.nan)
+                if missing_bools_as_float and _all_bools(column[~missing]):
+                    column = column.astype(float)
+                frame.isetitem(i, column)
+    return frame.infer_objects()
+
+
+def _all_bools(values):
+    # 先看第一个值，文本等其他列不必逐个检查
+    return (len(values) > 0 and isinstance(values.iloc[0], (bool, np.bool_))
+            and values.map(lambda x: isinstance(x, (bool, np.bool_))).all())
+
+
+def _missing_bools_as_float(frame):
+    # 只有布尔值和缺失值的对象列转为浮点数
+    for i in range(frame.shape[1]):
+        if pd.api.types.is_object_dtype(frame.dtypes.iloc[i]):
+            column = frame.iloc[:, i]
+            missing = column.isna()
+            if missing.any() and _all_bools(column[~missing]):
+                frame.isetitem(i, column.astype(float))
+    return frame
+
+
+def _header_names(values, width):
+    # 与 read_excel(header=0) 相同的列名规则：空单元格为 Unnamed: i，重复列名追加 .1、.2 ...
+    names = []
+    seen = {}
+    for i in range(width):
+        value = values[i] if i < len(values) else None
+        name = f"Unnamed: {i}" if value is None or (not isinstance(value, str) and pd.isna(value)) else value
+        key = str(name)
+        if key in seen:
+            seen[key] += 1
+            name = f"{key}.{seen[key]}"
+        else:
+            seen[key] = 0
+        names.append(name)
+    return names
+
+
+def raw_header_row(detected):
+    # 检测评分以 read_excel 解析后的数据行为单位：0 表示保留第一行作为表头，i > 0 对应原始第 i + 1 行
+    return 0 if detected == 0 else detected + 1
+
+
+def apply_header(raw, header_row):
+    # 以偏移量方式应用表头：只生成新的列名和行视图，不复制数据行，原始行保持不变
+    # 表头行之上的行（标题、说明等）不属于数据，视图从表头的下一行开始
+    header_row = min(header_row, len(raw))
+    if header_row == 0:
+        view = raw.iloc[0:]
+        view.columns = [str(name) for name in raw.columns]
+    else:
+        view = raw.iloc[header_row:]
+        view.columns = [str(value) for value in raw.iloc[header_row - 1].tolist()]
+        view.index = pd.RangeIndex(len(view))
+    return view
+
+
+def iter_sheet_frames(file_path, sheet_name, header_row, chunk_size=100000):
+    # 流式产出已应用表头的数据块，列名和数据与 parse_sheet + apply_header 的结果一致，峰值内存只与块大小相关
+    chunks = iter_sheet_chunks(file_path, sheet_name, chunk_size)
+    first = next(chunks, None)
+    if first is None:
+        return
+    raw = _normalize_missing(first.iloc[1:].reset_index(drop=True))
+    raw.columns = _header_names(first.iloc[0].tolist(), raw.shape[1])
+    view = apply_header(raw, header_row)
+    names = list(view.columns)
+    if len(view):
+        yield view
+    for chunk in chunks:
+        chunk = _normalize_missing(chunk)
+        chunk.columns = (names + [f"Unnamed: {i}" for i in range(len(names), chunk.shape[1])])[:chunk.shape[1]]
+        yield chunk
+
+
+def sheet_header_names(file_path, sheet_name, header_row):
+    # 只读取到表头行为止，返回与 iter_sheet_frames 相同的列名，用于在读取数据前确定工作表有哪些列
+    chunks = iter_sheet_chunks(file_path, sheet_name, header_row + 1)
+    try:
+        first = next(chunks, None)
+    finally:
+        chunks.close()
+    if first is None:
+        return []
+    raw = _normalize_missing(first.iloc[1:].reset_index(drop=True))
+    raw.columns = _header_names(first.iloc[0].tolist(), raw.shape[1])
+    return list(apply_header(raw, header_row).columns)
+
+
+def header_names_by_row(raw, max_header_row=HEADER_SCAN_ROWS + 1):
+    # 每个可选表头行对应的列名（与 apply_header 相同），保存到解析缓存后无需读取数据即可按列名定位列
+    return [list(apply_header(raw.iloc[:header_row], header_row).columns)
+            for header_row in range(min(max_header_row, len(raw)) + 1)]
+
+
+def detect_header_from_preview(preview, max_rows=HEADER_SCAN_ROWS):
+    # 在少量预读的原始行上检测表头，返回原始行号：第一行作为 read_excel 的默认列名，其余行参与评分
+    if len(preview) <= max_rows:
+        # 预览已覆盖整个工作表时去掉末尾空行，与完整解析时一致
+        non_blank = np.flatnonzero(preview.notna().any(axis=1).to_numpy())
+        preview = preview.iloc[:non_blank[-1] + 1 if len(non_blank) else 0]
+    if len(preview) < 2:
+        return 0
+    body = _normalize_missing(preview.iloc[1:max_rows + 1].reset_index(drop=True))
+    body.columns = _header_names(preview.iloc[0].tolist(), body.shape[1])
+    return raw_header_row(detect_header_row(body, max_rows))
+
+
+def _concat_pieces(pieces):
+    # 拼接一列的各块；空块和全部缺失的块不参与确定列类型，使结果与整表一次推断的类型一致，而不受分块影响
+    pieces = [piece for piece in pieces if len(piece)] or pieces[:1]
+    if len(pieces) == 1:
+        return pieces[0].reset_index(drop=True)
+    typed = [piece for piece in pieces if not piece.isna().all()]
+    dtypes = {piece.dtype for piece in typed}
+    if len(dtypes) == 1 and len(typed) < len(pieces):
+        dtype = dtypes.pop()
+        if dtype.kind in 'iub':
+            dtype = np.dtype(np.float64)  # 整数和布尔列有缺失值时与 read_excel 一样为浮点数
+        pieces = [piece.astype(dtype) for piece in pieces]
+    return pd.concat(pieces, ignore_index=True)
+
+
+def parse_sheet(file_path, sheet_name, chunk_size=100000, progress_callback=None, detected_header=None):
+    # 分块解析单个工作表，返回 (原始行 DataFrame, 检测到的表头原始行号)
+    # 原始行以第一行为列名、其余行为数据，表头选择通过 apply_header 以偏移量方式应用
+    # 已在扫描阶段检测过表头时直接使用 detected_header，否则在读取第一块后检测
+    # progress_callback(已读取行数) 用于报告进度
+    chunks = iter_sheet_chunks(file_path, sheet_name, chunk_size)
+    first = next(chunks, None)
+    if first is None:
+        return pd.DataFrame(), 0
+
+    header_values = first.iloc[0].tolist()
+    # 布尔列的缺失值要在拼接之后才能统一判断，各块先保留为对象列
+    frame = _normalize_missing(first.iloc[1:].reset_index(drop=True), missing_bools_as_float=False)
+    frame.columns = _header_names(header_values, frame.shape[1])
+    if detected_header is None:
+        detected_header = raw_header_row(detect_header_row(_missing_bools_as_float(frame.copy(deep=False)))) \
+            if len(frame) else 0
+    rows_read = len(first)
+    del first
+    if progress_callback is not None:
+        progress_callback(rows_read)
+
+    # 每块按列复制出来后立即释放整块，最后逐列拼接并释放该列的各块，峰值内存约为结果加一列，而不是结果的两倍
+    pieces = []  # 每列的各块 Series
+    total_rows = 0
+    while frame is not None:
+        for i in range(frame.shape[1]):
+            if i == len(pieces):
+                # 比前面的块更宽时，前面的块在新列上补缺失值（与 pd.concat 按列名对齐一致）
+                pieces.append([pd.Series(np.nan, index=range(total_rows))] if total_rows else [])
+            pieces[i].append(frame.iloc[:, i].copy())
+        for column_pieces in pieces[frame.shape[1]:]:
+            column_pieces.append(pd.Series(np.nan, index=range(len(frame))))
+        total_rows += len(frame)
+        frame = next(chunks, None)
+        if frame is not None:
+            rows_read += len(frame)
+            frame = _normalize_missing(frame, missing_bools_as_float=False)
+            if progress_callback is not None:
+                progress_callback(rows_read)
+
+    columns = {}
+    for i in range(len(pieces)):
+        columns[i] = _concat_pieces(pieces[i])
+        pieces[i] = None
+    raw = _missing_bools_as_float(pd.DataFrame(columns, index=pd.RangeIndex(total_rows), copy=False))
+    raw.columns = _header_names(header_values, raw.shape[1])
+    return raw, detected_header
+
+
+COMMON_HEADER_WORDS = ['id', 'name', 'date', 'time', 'value', 'code', 'type', 'category', 'description']
+_HEADER_WORD_PATTERN = '|'.join(COMMON_HEADER_WORDS)
+_SPECIAL_CHAR_PATTERN = r'[^\w\s]|_'  # 既不是字母数字也不是空白的字符，与 str.isalnum/isspace 判断一致
+
+_is_str = np.frompyfunc(lambda x: isinstance(x, str), 1, 1)
+_is_none = np.frompyfunc(lambda x: x is None, 1, 1)
+_type_of = np.frompyfunc(type, 1, 1)
+_to_str = np.frompyfunc(str, 1, 1)
+
+
+def detect_header_row(df, max_rows=10):
+    # 对前 max_rows 行组成的块一次性计算所有评分项，返回得分最高的行
+    rows = min(max_rows, len(df))
+    if rows == 0 or df.shape[1] == 0:
+        return 0
+    row_dtype = df.iloc[0].dtype  # 各行的公共类型相同，与逐行 df.iloc[i] 的取值方式一致
+    block = np.vstack([df.iloc[i].astype(object).to_numpy() for i in range(rows)])
+    width = block.shape[1]
+
+    text = _to_str(block)
+    flat_text = pd.Series(text.ravel(), dtype=object)
+    null_mask = pd.isna(block)
+    none_mask = _is_none(block).astype(bool)
+
+    # 字符串比例、非空比例
+    string_ratio = _is_str(block).astype(bool).mean(axis=1)
+    non_null_ratio = 1 - null_mask.mean(axis=1)
+
+    # 数据类型的一致性
+    types = _type_of(block)
+    dtype_consistency = np.array([len(set(types[i])) for i in range(rows)]) / width
+
+    # 长度的一致性和偏好短字符串
+    lengths = flat_text.str.len().to_numpy(dtype=float).reshape(rows, width)
+    lengths[none_mask] = 0
+    mean_lengths = lengths.mean(axis=1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        std_lengths = lengths.std(axis=1, ddof=1) if width > 1 else np.full(rows, np.nan)
+        length_consistency = 1 - np.where(mean_lengths > 0, std_lengths / np.where(mean_lengths > 0, mean_lengths, 1), 0)
+
+        # 特殊字符或乱码
+        special_counts = flat_text.str.count(_SPECIAL_CHAR_PATTERN).to_numpy(dtype=float).reshape(rows, width)
+        text_lengths = flat_text.str.len().to_numpy(dtype=float).reshape(rows, width)
+        special_ratio = np.where(none_mask | (text_lengths == 0), 0, special_counts / np.where(text_lengths == 0, 1, text_lengths))
+    special_char_ratio = special_ratio.mean(axis=1)
+
+    # 常见的列名关键词
+    keyword_match = flat_text.str.lower().str.contains(_HEADER_WORD_PATTERN).to_numpy(dtype=bool).reshape(rows, width).any(axis=1)
+
+    scores = []
+    for i in range(rows):
+        score = 2 if i == 0 else 1.5 if i == 1 else 0  # 对第一行和第二行给予额外分数
+        score += string_ratio[i] * 2
+        score += non_null_ratio[i]
+        score += (1 - dtype_consistency[i])
+        score += length_consistency[i]
+        score += 1 / (mean_lengths[i] + 1)  # 偏好短字符串
+        score -= special_char_ratio[i]
+        score += 2 if keyword_match[i] else 0
+        if row_dtype.name.startswith('int') or row_dtype.name.startswith('float'):
+            score -= 1  # 连续的数字行可能是数据而不是列名
+        if not null_mask[i].any():
+            score += 0.5  # 所有单元格都不为空
+        if pd.Series(block[i], dtype=object).nunique() == width:
+            score += 0.5  # 列名通常不会重复
+        scores.append(float(score))
+
+    best_row = scores.index(max(scores))
+    return best_row
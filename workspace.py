@@ -0,0 +1,204 @@
+import os
+import json
+import struct
+import numpy as np
+import pandas as pd
+
+from workbook_loader import apply_header, header_names_by_row, file_signature
+from parse_cache import encode_column, decode_column
+
+WORKSPACE_EXTENSION = '.vlws'
+WORKSPACE_FORMAT_VERSION = 1
+_MAGIC = b'VLKWSP01'
+_FOOTER = struct.Struct('<Q8s')  # 元数据长度 + 结尾标记
+_ALIGNMENT = 64
+
+
+class WorkspaceError(Exception):
+    pass
+
+
+def _pad(f):
+    # 每列数据按 64 字节对齐，便于内存映射
+    padding = -f.tell() % _ALIGNMENT
+    if padding:
+        f.write(b'\0' * padding)
+
+
+def _write_frame(f, df):
+    # 与 parse_cache.write_frame 相同的列编码（encode_column），但所有列写入同一个文件，元数据中记录每个部件的位置；
+    # 每个部件按 64 字节对齐原样写入，数值和日期列可直接内存映射
+    columns = []
+    for i in range(df.shape[1]):
+        column = df.iloc[:, i]
+        storage, parts = encode_column(column)
+        info = {'name': str(df.columns[i]), 'dtype': str(column.dtype), 'storage': storage, 'parts': {}}
+        for part, values in parts.items():
+            _pad(f)
+            info['parts'][part] = [f.tell(), values.dtype.str]
+            values.tofile(f)
+        columns.append(info)
+    return {'columns': columns, 'rows': int(df.shape[0])}
+
+
+def _read_part(f, at, dtype, start, count):
+    dtype = np.dtype(dtype)
+    f.seek(at + start * dtype.itemsize)
+    return np.frombuffer(f.read(count * dtype.itemsize), dtype=dtype)
+
+
+def save_workspace(file_path, files, config, result=None, signatures=None):
+    """把已加载的文件、表头选择、查找配置和最近一次结果写入单个工作区文件，返回实际写入的路径。
+
+    files 为 {文件路径: {工作表名: 状态}}，状态包含 detected_header、header_row、cleaned、dimensions、
+    preview（DataFrame）和 raw（已解析的原始行 DataFrame，未解析时为 None）；config 为可 JSON 序列化的查找配置；
+    signatures 为 {文件路径: file_signature}，省略的文件按当前磁盘上的文件记录。
+    文件布局：开头标记，按 64 字节对齐的列数据块，JSON 元数据，元数据长度和结尾标记。
+    """
+    if not file_path.lower().endswith(WORKSPACE_EXTENSION):
+        file_path += WORKSPACE_EXTENSION
+    meta = {'version': WORKSPACE_FORMAT_VERSION, 'config': config, 'files': [], 'result': None}
+    part_path = file_path + '.part'
+    try:
+        with open(part_path, 'wb') as f:
+            f.write(_MAGIC)
+            for source_path, sheets in files.items():
+                sheet_metas = []
+                for sheet_name, state in sheets.items():
+                    sheet_meta = {
+                        'sheet_name': sheet_name,
+                        'detected_header': None if state['detected_header'] is None else int(state['detected_header']),
+                        'header_row': None if state['header_row'] is None else int(state['header_row']),
+                        'cleaned': bool(state['cleaned']),
+                        'dimensions': list(state['dimensions']),
+                        'preview': _write_frame(f, state['preview']),
+                        'raw': None
+                    }
+                    if state['raw'] is not None:
+                        sheet_meta['raw'] = _write_frame(f, state['raw'])
+                        sheet_meta['raw']['header_names'] = header_names_by_row(state['raw'])
+                    sheet_metas.append(sheet_meta)
+                signatures = signatures or {}
+                signature = signatures[source_path] if source_path in signatures else file_signature(source_path)
+                meta['files'].append({'path': source_path, 'signature': signature, 'sheets': sheet_metas})
+            if result is not None:
+                meta['result'] = _write_frame(f, result)
+            encoded = json.dumps(meta, ensure_ascii=False).encode('utf-8')
+            f.write(encoded)
+            f.write(_FOOTER.pack(len(encoded), _MAGIC))
+        os.replace(part_path, file_path)
+    except BaseException:
+        if os.path.exists(part_path):
+            os.remove(part_path)
+        raise
+    return file_path
+
+
+class Workspace:
+    """只读打开的工作区文件。打开时只读取末尾的元数据，列数据在访问时才读取，并且可以只读取一段行：
+    数值和日期列直接内存映射，文本和对象列按行偏移读取后解码为基本类型，不会执行文件中的任何代码。
+
+    load_sheet / header_names / load_sheet_columns 与 ParseCache 的同名方法接口相同，可作为工作表数据来源。
+    """
+
+    def __init__(self, file_path):
+        self.file_path = file_path
+        try:
+            with open(file_path, 'rb') as f:
+                if f.read(len(_MAGIC)) != _MAGIC:
+                    raise WorkspaceError(f"{os.path.basename(file_path)} 不是工作区文件")
+                f.seek(-_FOOTER.size, os.SEEK_END)
+                length, magic = _FOOTER.unpack(f.read(_FOOTER.size))
+                if magic != _MAGIC:
+                    raise WorkspaceError(f"工作区文件 {os.path.basename(file_path)} 不完整")
+                f.seek(-_FOOTER.size - length, os.SEEK_END)
+                meta = json.loads(f.read(length).decode('utf-8'))
+        except (OSError, ValueError, struct.error) as e:
+            raise WorkspaceError(f"无法读取工作区文件 {os.path.basename(file_path)}: {str(e)}")
+        if meta.get('version') != WORKSPACE_FORMAT_VERSION:
+            raise WorkspaceError(f"不支持的工作区文件版本: {meta.get('version')}")
+        self.config = meta['config']
+        self.files = {entry['path']: {sheet['sheet_name']: sheet for sheet in entry['sheets']}
+                      for entry in meta['files']}
+        self.signatures = {entry['path']: entry['signature'] for entry in meta['files']}
+        self.result_meta = meta['result']
+
+    def read_frame(self, meta, columns=None, start=0, stop=None):
+        # columns 为要读取的列位置列表，None 表示全部列；start / stop 为要读取的行范围
+        positions = range(len(meta['columns'])) if columns is None else columns
+        stop = meta['rows'] if stop is None else min(stop, meta['rows'])
+        start = min(start, stop)
+        rows = stop - start
+        data = {}
+        names = []
+        with open(self.file_path, 'rb') as f:
+            for i in positions:
+                info = meta['columns'][i]
+                parts = {}
+                for part, (at, dtype) in info['parts'].items():
+                    if part == 'values' and rows:
+                        # 数值部件直接内存映射，只映射要读取的行
+                        dtype = np.dtype(dtype)
+                        parts[part] = np.memmap(self.file_path, dtype=dtype, mode='r',
+                                                offset=at + start * dtype.itemsize, shape=(rows,))
+                    elif part == 'offsets':
+                        parts[part] = _read_part(f, at, dtype, start, rows + 1)
+                    elif part != 'data':
+                        parts[part] = _read_part(f, at, dtype, start, rows)
+                if 'data' in info['parts']:
+                    offsets = parts['offsets']
+                    parts['data'] = _read_part(f, info['parts']['data'][0] + int(offsets[0]), np.uint8, 0,
+                                               int(offsets[-1] - offsets[0]))
+                try:
+                    data[i] = decode_column(info['storage'], info['dtype'], parts)
+                except ValueError as e:
+                    raise WorkspaceError(f"工作区文件中的列 {info['name']} 无法读取: {str(e)}")
+                names.append(info['name'])
+        df = pd.DataFrame(data, index=pd.RangeIndex(rows), copy=False)
+        df.columns = names
+        return df
+
+    def source_unchanged(self, file_path):
+        # 源文件自保存以来没有变化时，工作区中的数据与源文件一致，可以使用按源文件建立的缓存
+        signature = self.signatures.get(file_path)
+        return signature is not None and signature == file_signature(file_path)
+
+    def sheet_state(self, file_path, sheet_name):
+        return self.files.get(file_path, {}).get(sheet_name)
+
+    def load_preview(self, file_path, sheet_name):
+        return self.read_frame(self.sheet_state(file_path, sheet_name)['preview'])
+
+    def load_sheet(self, file_path, sheet_name, columns=None):
+        # 返回 (原始行, 检测到的表头行)，保存时工作表尚未解析则返回 None
+        state = self.sheet_state(file_path, sheet_name)
+        if state is None or state['raw'] is None:
+            return None
+        return self.read_frame(state['raw'], columns), state['detected_header']
+
+    def header_names(self, file_path, sheet_name, header_row):
+        state = self.sheet_state(file_path, sheet_name)
+        if state is None or state['raw'] is None:
+            return None
+        names = state['raw']['header_names']
+        header_row = min(header_row, state['raw']['rows'])
+        return names[header_row] if header_row < len(names) else None
+
+    def load_sheet_columns(self, file_path, sheet_name, header_row, column_names):
+        # 只读取指定列名对应的列并应用表头，工作表不在工作区中时返回 None
+        names = self.header_names(file_path, sheet_name, header_row)
+        if names is None:
+            return None
+        positions = []
+        for name in column_names:
+            if name in names and names.index(name) not in positions:
+                positions.append(names.index(name))
+        return apply_header(self.load_sheet(file_path, sheet_name, positions)[0], header_row)
+
+    @property
+    def result_rows(self):
+        return self.result_meta['rows'] if self.result_meta is not None else 0
+
+    def load_result(self, start=0, stop=None):
+        # 读取保存的结果（或其中一段行），没有保存结果时返回 None
+        return self.read_frame(self.result_meta, start=start, stop=stop) if self.result_meta is not None else None